@@ -11,17 +11,30 @@ from bitmap_font_tool import set_font_path, draw_text
 from DebounceButton import DebouncedButton
 
 # 引入自定義模組
+import config
 from mqtt_client import MqttManager
 from wifi import connect_wifi, sync_time
+from alarm_ops import apply_ops
+from telemetry import ChangeReporter
+from alarm_sync import AlarmSync
+import http_server as http
+from looplag import LagMonitor
+from metrics import Metrics, CONTENT_TYPE as METRICS_TYPE
+from sensor import DhtService, Q_FAILED
+from dht_async import DhtAsync
+from history import TieredHistory, parse_range
+from clock import clock
 
 # -------- 設定 --------
 set_font_path('./lib/fonts/fusion_bdf.12')
 ALARM_FILE = "alarm.txt"
+ALARM_VV_FILE = "alarm_vv.json"  # 鬧鐘同步的版本向量
 
 # 時間修正：設為 0
 TZ_OFFSET = 0  
 SNOOZE_MIN = 5      # 貪睡時間
 RING_LIMIT_SEC = 15 # 響鈴限制秒數
+BUSY_REPLY_LIMIT = 8 # 指令被丟棄時，同時等待送出的 busy 回覆上限（突發時不為每則都建立協程）
 
 # MQTT 設定
 MY_ID = "M1424001"  
@@ -29,19 +42,43 @@ TOPIC_TEMP = f"{MY_ID}/bedroom/temp"
 TOPIC_HUMI = f"{MY_ID}/bedroom/humi"
 
 # -------- 硬體初始化 --------
-dht_sensor = dht.DHT11(Pin(18))
+dht_sensor = DhtAsync(Pin(18), 11) if config.DHT_ASYNC else dht.DHT11(Pin(18))
 i2c = I2C(0, scl=Pin(7), sda=Pin(5))
 oled = SSD1306_I2C(128, 64, i2c)
 speaker = PWM(Pin(6, Pin.OUT))
 speaker.duty(0)
 
+# 溫濕度由取樣服務依自己的排程讀取，其他地方只讀它的最新濾波值
+dht_service = DhtService(dht_sensor, config.DHT11_POLL_INTERVAL_SEC, config.DHT_RETRIES,
+                         config.DHT_RETRY_DELAY_MS, config.DHT_FILTER_WINDOW, config.DHT_EMA_ALPHA,
+                         config.DHT_MAX_JUMP, config.DHT_HISTORY, config.DHT_STALE_SEC)
+
+# 溫濕度歷史：最近一小時直接用取樣服務的紀錄，更長的範圍看 1 分鐘 / 15 分鐘彙總
+history = TieredHistory(dht_service.history, config.DHT_HISTORY * config.DHT11_POLL_INTERVAL_SEC,
+                        config.HISTORY_MINUTE_SLOTS, config.HISTORY_QUARTER_SLOTS, config.HISTORY_FILE)
+
 # -------- 全域狀態變數 --------
 alarms = []
 is_ringing = False
 MODE = "CLOCK"  
 view_idx = 0    
-current_env = {"temp": "--", "humi": "--", "ip": "..."} 
+current_env = {"temp": "--", "humi": "--", "stale": True, "ip": "..."} 
+state_gen = 0   # 鬧鐘或溫濕度每次變動 +1，作為 /state 的 ETag
 _last_rung_key = None 
+mqtt_mgr = None
+alarm_sync = None       # 啟用鬧鐘同步時為 AlarmSync
+_sync_topics = []       # [(快照主題, 增量主題), ...]，第一組為本機發佈用
+_snapshot_pending = False
+
+# 執行期指標：每個協程各用一個計時器（/metrics）
+metrics = Metrics(config.METRICS_MEM_INTERVAL_MS)
+TASK_HELP = "協程每輪執行時間（不含 await 等待）"
+ui_timer = metrics.timer("task_run_ms", TASK_HELP, "task", "ui_display")
+alarm_timer = metrics.timer("task_run_ms", TASK_HELP, "task", "check_alarm")
+env_timer = metrics.timer("task_run_ms", TASK_HELP, "task", "env")
+button_timer = metrics.timer("task_run_ms", TASK_HELP, "task", "buttons")
+history_timer = metrics.timer("task_run_ms", TASK_HELP, "task", "history_checkpoint")
+i2c_timer = metrics.timer("i2c_flush_ms", "oled.show() 經 I2C 送出畫面的時間")
 
 # 暫存設定值
 temp_setting = {"h":0, "m":0, "repeat":0, "music":0}
@@ -73,8 +110,8 @@ MELODY = {
 # ============================================================
 # 核心邏輯
 # ============================================================
-def taiwan_time(): 
-    return time.localtime(time.time() + TZ_OFFSET)
+# 本地時間每秒只換算一次，畫面 / 鬧鐘 / HTTP / SSE 都讀這份快取
+clock.offset = TZ_OFFSET
 
 def load_alarms():
     global alarms
@@ -90,12 +127,57 @@ def save_alarms():
     with open(ALARM_FILE,"w") as f: f.write(json.dumps(alarms))
 
 def add_alarm(h, m, repeat, music):
-    alarms.append({"h":int(h), "m":int(m), "repeat":int(repeat), "music":int(music), "enabled":True})
+    mutate_alarms([{"op":"add", "h":h, "m":m, "repeat":repeat, "music":music}])
+
+def shared_alarms():
+    """參與同步的鬧鐘（不含 local 項目；local 項目一律排在最後，共用部分的編號與其他裝置一致）"""
+    return [a for a in alarms if not a.get("local")]
+
+def commit_alarms(new_alarms, keep_local=False):
+    """
+    以新清單整批取代（local 項目移到最後），只寫入一次
+    keep_local=True: new_alarms 是遠端同步來的共用鬧鐘，保留本機原有的 local 項目
+    """
+    local = [a for a in (alarms if keep_local else new_alarms) if a.get("local")]
+    alarms[:] = [a for a in new_alarms if not a.get("local")] + local
     save_alarms()
+    notify_alarms()
+
+def notify_alarms():
+    global state_gen
+    state_gen += 1
+    events.publish("alarms", json.dumps({"alarms": alarms}))
+
+def notify_env():
+    global state_gen
+    state_gen += 1
+    events.publish("env", json.dumps(current_env))
+
+def update_env():
+    """依取樣服務的最新濾波值更新 current_env，有變化才通知網頁"""
+    s = dht_service
+    temp = "--" if s.temp is None else "%.1f" % s.temp
+    humi = "--" if s.humi is None else "%.1f" % s.humi
+    stale = s.stale()
+    if current_env["temp"] != temp or current_env["humi"] != humi or current_env["stale"] != stale:
+        current_env["temp"] = temp; current_env["humi"] = humi; current_env["stale"] = stale
+        notify_env()
+
+def mutate_alarms(ops, sync=True):
+    """
+    本機異動鬧鐘（整批套用、寫入一次），並同步給其他裝置；失敗時拋出例外
+    sync=False 只改本機（貪睡、單次鬧鐘響後停用：每台各自響、各自處理）；動到 local 項目的批次也不同步
+    """
+    shared = len(shared_alarms())
+    commit_alarms(apply_ops(alarms, ops))
+    if sync and alarm_sync and not any(op.get("local") or int(op.get("idx", -1)) >= shared for op in ops):
+        delta = alarm_sync.local_change(ops)
+        asyncio.create_task(mqtt_mgr.publish(_sync_topics[0][1], delta, qos=0))
+        schedule_snapshot()
 
 def get_next_alarm_str():
     if not alarms: return "無"
-    now = taiwan_time()
+    now = clock.get()
     current_minutes = now[3] * 60 + now[4]
     min_diff = 999999
     next_a = None
@@ -121,11 +203,12 @@ def oled_write(lines):
             draw_text(oled, text, 0, y)
         except:
             pass # 防止字串過長當機
-    oled.show()
+    with i2c_timer:
+        oled.show()
 
 def show_ui():
     if MODE == "CLOCK":
-        t = taiwan_time()
+        clock.get()
         # 仿照範例檔案的佈局：
         # 第一行：標題
         # 第二行：日期
@@ -133,8 +216,8 @@ def show_ui():
         # 第四行：狀態
         oled_write([
             ("台灣時間", 0),
-            (f"{t[0]}/{t[1]:02d}/{t[2]:02d}", 16),
-            (f"{t[3]:02d}:{t[4]:02d}:{t[5]:02d}", 32),
+            (clock.date_str, 16),
+            (clock.time_str, 32),
             (f"下次: {get_next_alarm_str()}", 48)
         ])
         
@@ -225,7 +308,7 @@ def on_btnA_click(_id, _pin):
         MODE = "VIEW"; view_idx = 0
     elif MODE == "VIEW" and alarms:
         idx = max(0, min(view_idx, len(alarms)-1))
-        alarms[idx]["enabled"] = not alarms[idx]["enabled"]; save_alarms()
+        mutate_alarms([{"op":"toggle", "idx":idx}])
     elif MODE == "SET_TIME":
         cursor_pos = (cursor_pos + 1) % 2
     elif MODE == "RINGING":
@@ -235,7 +318,7 @@ def on_btnA_long(_id, _pin):
     """長按A: 進入設定/刪除"""
     global MODE, temp_setting, cursor_pos, view_idx
     if MODE == "CLOCK":
-        now = taiwan_time()
+        now = clock.get()
         temp_setting = {"h":now[3], "m":now[4], "repeat":0, "music":0}
         cursor_pos = 0; MODE = "SET_TIME"
     elif MODE == "SET_TIME": MODE = "SET_REPEAT"
@@ -247,7 +330,7 @@ def on_btnA_long(_id, _pin):
         MODE = "CLOCK"; print("[System] 鬧鐘已儲存")
     elif MODE == "VIEW" and alarms:
         idx = max(0, min(view_idx, len(alarms)-1))
-        del alarms[idx]; save_alarms()
+        mutate_alarms([{"op":"delete", "idx":idx}])
         if len(alarms) == 0: MODE = "CLOCK"
         else: view_idx = max(0, min(view_idx, len(alarms)-1))
 
@@ -280,8 +363,8 @@ async def ring_alarm(music_index, alarm_obj=None):
     global is_ringing, MODE
     if is_ringing: return
     is_ringing = True; MODE = "RINGING"
-    if alarm_obj and not alarm_obj.get("repeat"):
-        alarm_obj["enabled"] = False; save_alarms()
+    if alarm_obj and not alarm_obj.get("repeat") and alarm_obj in alarms:
+        mutate_alarms([{"op":"update", "idx":alarms.index(alarm_obj), "enabled":False}], sync=False)
     
     melody = MELODY.get(music_index, MELODY[0])
     start_ticks = time.ticks_ms()
@@ -303,20 +386,14 @@ async def ring_alarm(music_index, alarm_obj=None):
         speaker.duty(0); is_ringing = False; MODE = "CLOCK"
         if timeout: do_snooze()
 
-def do_snooze():
-    now = taiwan_time()
-    m = now[4] + SNOOZE_MIN
-    h = now[3]
-    if m >= 60: m -= 60; h = (h + 1) % 24
-    add_alarm(h, m, 0, 0)
+def do_snooze(minutes=SNOOZE_MIN):
+    now = clock.get()
+    total = now[3] * 60 + now[4] + minutes
+    mutate_alarms([{"op":"add", "h":(total // 60) % 24, "m":total % 60, "local":True}], sync=False)
 
-# 2. 修改：實作訊息處理函式，不要只是 pass
-async def mqtt_msg_handler(topic, msg, retained, properties=None):
+# 2. 修改：實作訊息處理函式，不要只是 pass（由路由器解碼後傳入 str）
+async def mqtt_msg_handler(topic_str, msg_str, retained):
     try:
-        # 將 bytes 轉為字串以便閱讀
-        topic_str = topic.decode() if isinstance(topic, bytes) else topic
-        msg_str = msg.decode() if isinstance(msg, bytes) else msg
-        
         print(f"\n[MQTT 收到訊息] 主題: {topic_str}, 內容: {msg_str}")
         
         # (選用) 可以在這裡加入控制邏輯，例如收到 "OPEN" 就開燈
@@ -326,112 +403,361 @@ async def mqtt_msg_handler(topic, msg, retained, properties=None):
     except Exception as e:
         print(f"[MQTT Handler Error] {e}")
 
+async def mqtt_cmd_handler(topic, msg, retained):
+    """
+    指令主題處理（預設 JSON，編碼方式依主題設定）
+    
+    {"id": 請求編號, "reply": 回覆主題, "op": ...}
+        add / update / toggle / delete / replace : 見 alarm_ops.apply_op
+        bulk   {"ops": [...]}  整批套用，只寫入一次
+        list   回傳目前鬧鐘
+        snooze {"min": 分鐘}  停止響鈴並貪睡（只在響鈴中有效，否則回覆 err "not ringing"）
+    回覆 {"id", "ok", "n", ["alarms"], ["err"]} 到 reply 或 MQTT_TOPICS['ack']
+    回覆沿用指令主題的編碼方式（config.MQTT_TOPIC_CODECS）
+    """
+    global is_ringing
+    if retained: return  # 不重播 Broker 保留的舊指令
+    req = {}
+    res = {"ok": True}
+    codec = mqtt_mgr.codec_for(topic)
+    try:
+        obj = codec.decode(msg)[0]
+        if not isinstance(obj, dict): raise ValueError("指令格式錯誤")
+        req = obj
+        op = req.get("op")
+        if op == "list":
+            res["alarms"] = alarms
+        elif op == "snooze":
+            minutes = int(req.get("min", SNOOZE_MIN))
+            if not is_ringing: raise ValueError("not ringing")
+            is_ringing = False
+            do_snooze(minutes)
+        elif op == "bulk":
+            mutate_alarms(req["ops"])
+        else:
+            mutate_alarms([req])
+    except Exception as e:
+        res = {"ok": False, "err": str(e)}
+    if "id" in req: res["id"] = req["id"]
+    res["n"] = len(alarms)
+    reply = req.get("reply") or config.MQTT_TOPICS['ack']
+    await mqtt_mgr.publish(reply, res, qos=0, codec=codec)
+
+_busy_replies = 0   # 尚未送出的 busy 回覆數
+
+def cmd_dropped(topic, msg, retained):
+    """收訊工作池滿載丟棄指令時回覆 {"ok": false, "err": "busy"}，讓送出端知道要重送"""
+    global _busy_replies
+    if retained or topic != config.MQTT_TOPICS['cmd'] or _busy_replies >= BUSY_REPLY_LIMIT: return
+    codec = mqtt_mgr.codec_for(topic)
+    try: req = codec.decode(msg)[0]
+    except Exception: return
+    if not isinstance(req, dict): return
+    res = {"ok": False, "err": "busy"}
+    if "id" in req: res["id"] = req["id"]
+    _busy_replies += 1
+    asyncio.create_task(_send_busy(req.get("reply") or config.MQTT_TOPICS['ack'], res, codec))
+
+async def _send_busy(reply, res, codec):
+    global _busy_replies
+    try: await mqtt_mgr.publish(reply, res, qos=0, codec=codec)
+    finally: _busy_replies -= 1
+
+# ============================================================
+# 多台鬧鐘同步 (retain 快照 + 增量)
+# ============================================================
+def sync_scopes():
+    """群組範圍（若有設定）在前，其次為本機 DEVICE_ID 範圍"""
+    prefix = config.ALARM_SYNC_PREFIX
+    scopes = [f"{prefix}/dev/{config.DEVICE_ID}"]
+    if config.ALARM_SYNC_GROUP:
+        scopes.insert(0, f"{prefix}/grp/{config.ALARM_SYNC_GROUP}")
+    return [(s.encode(), (s + "/delta").encode()) for s in scopes]
+
+def schedule_snapshot():
+    """延遲發佈 retain 快照，合併短時間內的多次異動"""
+    global _snapshot_pending
+    if alarm_sync and not _snapshot_pending:
+        _snapshot_pending = True
+        asyncio.create_task(_publish_snapshot())
+
+async def _publish_snapshot():
+    global _snapshot_pending
+    await asyncio.sleep(config.ALARM_SYNC_SNAPSHOT_DELAY_SEC)
+    _snapshot_pending = False
+    await mqtt_mgr.publish(_sync_topics[0][0], alarm_sync.snapshot(shared_alarms()), qos=1, retain=True)
+
+async def alarm_snapshot_handler(topic, msg, retained):
+    new_alarms, republish = alarm_sync.on_snapshot(shared_alarms(), mqtt_mgr.decode(topic, msg)[0], retained)
+    if new_alarms is not None:
+        commit_alarms(new_alarms, keep_local=True); print("[Sync] 已套用遠端快照")
+    if republish: schedule_snapshot()
+
+async def alarm_delta_handler(topic, msg, retained):
+    new_alarms = alarm_sync.on_delta(shared_alarms(), mqtt_mgr.decode(topic, msg)[0])
+    if new_alarms is not None: commit_alarms(new_alarms, keep_local=True)
+
+async def setup_alarm_sync(mqtt):
+    global alarm_sync, _sync_topics
+    _sync_topics = sync_scopes()
+    alarm_sync = AlarmSync(config.DEVICE_ID, ALARM_VV_FILE)
+    for snap_topic, delta_topic in _sync_topics:
+        for topic, handler in ((snap_topic, alarm_snapshot_handler), (delta_topic, alarm_delta_handler)):
+            mqtt.set_codec(topic, config.ALARM_SYNC_CODEC)
+            mqtt.route(topic, handler)
+            await mqtt.subscribe(topic, qos=1)
+    print(f"[Sync] 鬧鐘同步主題: {_sync_topics[0][0].decode()}")
+
 async def dht_mqtt_task(ssid, password):
-    mqtt = MqttManager(ssid, password)
-    mqtt.external_handler = mqtt_msg_handler
+    global mqtt_mgr
+    mqtt = mqtt_mgr = MqttManager(ssid, password)
     
-    # 連線
-    await mqtt.connect()
+    # 登錄訂閱：原本的溫濕度主題 (確認自己發送的資料)，每次重連後自動重新訂閱
+    mqtt.route(TOPIC_TEMP, mqtt_msg_handler, decode=True)
+    mqtt.route(TOPIC_HUMI, mqtt_msg_handler, decode=True)
+    await mqtt.subscribe(TOPIC_TEMP)
+    await mqtt.subscribe(TOPIC_HUMI)
     
-    if mqtt.is_connected():
-        # 訂閱原本的溫濕度主題 (確認自己發送的資料)
-        await mqtt.subscribe(TOPIC_TEMP)
-        await mqtt.subscribe(TOPIC_HUMI)
-        
-        # 【重要】同時訂閱 config 中設定的「指令主題」，這樣別人才傳得進來
-        import config
-        if 'cmd' in config.MQTT_TOPICS:
-            cmd_topic = config.MQTT_TOPICS['cmd']
-            await mqtt.subscribe(cmd_topic)
-            print(f"[System] 已監聽指令主題: {cmd_topic}")
+    # 【重要】同時訂閱 config 中設定的「指令主題」，這樣別人才傳得進來
+    if 'cmd' in config.MQTT_TOPICS:
+        cmd_topic = config.MQTT_TOPICS['cmd']
+        mqtt.route(cmd_topic, mqtt_cmd_handler)
+        mqtt.workers.on_drop = cmd_dropped
+        await mqtt.subscribe(cmd_topic)
+        print(f"[System] 已監聽指令主題: {cmd_topic}")
+    
+    # 鬧鐘同步：連線後 Broker 會送來 retain 的最新快照
+    if config.ALARM_SYNC_ENABLED:
+        await setup_alarm_sync(mqtt)
+    
+    # 連線與重連交給監督協程（指數退避）
+    asyncio.create_task(mqtt.run())
+    
+    publish_hist = metrics.histogram("mqtt_publish_ms", "MQTT 發佈耗時（QoS 1 含等待 PUBACK）")
+    mqtt.observe_publish = lambda us: metrics.observe(publish_hist, us)
+    metrics.value("mqtt_queue_depth", "離線發佈佇列長度", lambda: len(mqtt.queue))
+    if config.METRICS_MQTT_TOPIC:
+        asyncio.create_task(metrics_mqtt_task(mqtt))
+    
+    # 例外回報：數值變化超過死區或心跳到期才發佈
+    reporter = ChangeReporter(config.TELEMETRY_DEADBAND, config.TELEMETRY_HEARTBEAT_SEC)
+    retain = config.TELEMETRY_RETAIN
+    decimals = config.TELEMETRY_DECIMALS
 
+    # 只負責發佈；畫面 / 網頁 / 歷史由 env_task 更新，發佈卡住（斷線等待重連）時不受影響。
+    # 讀取失敗時不重送舊值；卡住期間錯過的取樣不補，下一次取樣發佈最新值
     while True:
+        await dht_service.updated.wait()
         try:
-            dht_sensor.measure()
-            t, h = dht_sensor.temperature(), dht_sensor.humidity()
-            global current_env
-            current_env["temp"] = str(t); current_env["humi"] = str(h)
-            
-            if mqtt.is_connected():
-                # 發布溫濕度
-                await mqtt.publish(TOPIC_TEMP, str(t), qos=0)
-                await mqtt.publish(TOPIC_HUMI, str(h), qos=0)
+            if dht_service.flags & Q_FAILED:
+                continue
+            t, h = dht_service.temp, dht_service.humi
+            if decimals:
+                t, h = round(t, decimals), round(h, decimals)
             else:
-                print("[System] MQTT 斷線，嘗試重連...")
-                await mqtt.connect()
-                # 重連後重新訂閱
-                if mqtt.is_connected():
-                    await mqtt.subscribe(TOPIC_TEMP)
-                    import config
-                    if 'cmd' in config.MQTT_TOPICS:
-                        await mqtt.subscribe(config.MQTT_TOPICS['cmd'])
+                t, h = int(round(t)), int(round(h))     # 濾波值是浮點數，整數格式與舊訂閱端相容
+            now = time.time()
+            
+            # 發布溫濕度（斷線時自動進入離線佇列，重連後補發）
+            for field, topic, value in (("temp", TOPIC_TEMP, t), ("humi", TOPIC_HUMI, h)):
+                if reporter.should_report(field, value, now):
+                    if await mqtt.publish(topic, value, qos=0, retain=retain):
+                        reporter.mark(field, value, now)
                         
         except Exception as e:
             print(f"[DHT Task Error] {e}")
-            
-        await asyncio.sleep(10)
+
+async def env_task():
+    """每次取樣後更新 OLED / 網頁狀態與歷史彙總（與 MQTT 發佈分開，不受連線狀態影響）"""
+    while True:
+        await dht_service.updated.wait()
+        try:
+            with env_timer:
+                update_env()
+                if not dht_service.flags & Q_FAILED:
+                    history.add(time.time(), dht_service.temp, dht_service.humi)
+        except Exception as e:
+            print(f"[Env Task Error] {e}")
+
+async def history_task():
+    """定期把新結束的彙總時段寫入檢查點檔"""
+    while True:
+        await asyncio.sleep(config.HISTORY_CHECKPOINT_SEC)
+        try:
+            with history_timer:
+                history.checkpoint()
+        except OSError as e:
+            print(f"[History] 檢查點寫入失敗: {e}")
 
 async def check_alarm_task():
     global _last_rung_key
     while True:
-        if MODE == "CLOCK":
-            now = taiwan_time()
-            key = (now[3], now[4])
-            if key != _last_rung_key:
-                for a in alarms:
-                    if a.get("enabled") and a["h"] == now[3] and a["m"] == now[4]:
-                        _last_rung_key = key
-                        asyncio.create_task(ring_alarm(a["music"], a))
-                        break
-        await asyncio.sleep(1)
+        await clock.second.wait()
+        with alarm_timer:
+            if MODE == "CLOCK":
+                now = clock.t
+                key = (now[3], now[4])
+                if key != _last_rung_key:
+                    for a in alarms:
+                        if a.get("enabled") and a["h"] == now[3] and a["m"] == now[4]:
+                            _last_rung_key = key
+                            asyncio.create_task(ring_alarm(a["music"], a))
+                            break
+
+async def sse_clock_task():
+    """有 /events 連線時，每秒推送一次時間"""
+    while True:
+        await clock.second.wait()
+        if events.clients:
+            events.publish("time", time_strings()[1])
 
 async def ui_display_task():
     while True:
-        try: show_ui()
-        except: pass
+        with ui_timer:
+            try: show_ui()
+            except: pass
         await asyncio.sleep_ms(200)
 
+# ============================================================
+# HTTP 路由
+# ============================================================
+INDEX_FILE = "web/index.html"
+
+async def http_env(req, writer):
+    await http.reply(req, writer, 200, json.dumps(current_env))
+
+_time_cache = [None, "", ""]    # [clock.now, /time 與 SSE 的 JSON, /state 的 X-Clock]
+
+def time_strings():
+    """返回: 上面的快取，秒數改變時才重新格式化"""
+    t = clock.get()
+    c = _time_cache
+    if c[0] != clock.now:
+        c[0] = clock.now
+        c[1] = json.dumps({"y":t[0],"M":t[1],"d":t[2],"h":t[3],"m":t[4],"s":t[5]})
+        c[2] = "{},{},{},{},{},{}".format(*t[:6])
+    return c
+
+async def http_time(req, writer):
+    await http.reply(req, writer, 200, time_strings()[1])
+
+async def http_alarms(req, writer):
+    await http.reply(req, writer, 200, json.dumps({"alarms": alarms}))
+
+# 批次異動：POST /alarms/batch 內容為 {"ops":[...]} 或 [...]（格式同 alarm_ops.apply_op），
+# PUT /alarms 內容為整份排程 {"alarms":[...]}；整批套用、只寫入一次，回傳新的世代號
+async def _http_apply(req, writer, ops_of):
+    try: mutate_alarms(ops_of(json.loads(req.body)))
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        return await http.reply(req, writer, 400, json.dumps({"ok": False, "error": str(e)}))
+    await http.reply(req, writer, 200, json.dumps({"ok": True, "gen": state_gen, "count": len(alarms)}))
+
+async def http_batch(req, writer):
+    await _http_apply(req, writer, lambda doc: doc["ops"] if isinstance(doc, dict) else doc)
+
+async def http_put_alarms(req, writer):
+    await _http_apply(req, writer, lambda doc: [{"op": "replace", "alarms": doc["alarms"]}])
+
+def _export_parts(gen, items):
+    yield '{"gen":%d,"alarms":[' % gen
+    for i, a in enumerate(items):
+        yield ("," if i else "") + json.dumps(a)
+    yield "]}"
+
+async def http_export(req, writer):
+    """逐筆序列化串流送出，不在記憶體組出整份 JSON"""
+    await http.send_chunked(req, writer, _export_parts(state_gen, alarms[:]),
+                            headers={"Content-Disposition": 'attachment; filename="alarms.json"'})
+
+# /state：鬧鐘 + 溫濕度合併成一份，內容只在世代號改變時重新序列化；
+# 時間每秒都變，放在 X-Clock 標頭（304 也會附上），內容才能被快取
+state_body = http.CachedBody(lambda: json.dumps({"gen": state_gen, "env": current_env, "alarms": alarms}))
+
+async def http_state(req, writer):
+    await state_body.reply(req, writer, state_gen, {"X-Clock": time_strings()[2]})
+
+async def http_add(req, writer):
+    q = req.query
+    try: add_alarm(q["h"], q["m"], q["repeat"], q["music"])
+    except (KeyError, ValueError): return await http.reply(req, writer, 400, "Error")
+    await http.reply(req, writer, 200, "OK")
+
+def _http_idx_op(op):
+    async def handler(req, writer):
+        try: mutate_alarms([{"op":op, "idx":int(req.query["id"])}])
+        except (KeyError, ValueError): return await http.reply(req, writer, 400, "Error")
+        await http.reply(req, writer, 200, "OK")
+    return handler
+
+async def http_metrics(req, writer):
+    await http.send_chunked(req, writer, metrics.prometheus(), METRICS_TYPE)
+
+# /history?range=1h|24h|30d[&format=bin]：依範圍選擇 raw / 1m / 15m 層，逐列串流送出；
+# 數值為 0.1 單位的整數，二進位格式每列為 X-Format 標頭所示的 struct（little-endian）
+async def http_history(req, writer):
+    q = req.query
+    try: seconds = parse_range(q.get("range", "1h"))
+    except ValueError as e:
+        return await http.reply(req, writer, 400, json.dumps({"ok": False, "error": str(e)}))
+    now = time.time()
+    if q.get("format") == "bin":
+        name, step, fmt, fields = history.bin_format(seconds)
+        await http.send_chunked(req, writer, history.bin_parts(seconds, now), "application/octet-stream",
+                                {"X-Tier": name, "X-Step": str(step), "X-Format": fmt, "X-Fields": ",".join(fields)})
+    else:
+        await http.send_chunked(req, writer, history.json_parts(seconds, now))
+
+async def metrics_mqtt_task(mqtt):
+    """定期把指標摘要發佈到 METRICS_MQTT_TOPIC（以 METRICS_MQTT_CODEC 編碼）"""
+    mqtt.set_codec(config.METRICS_MQTT_TOPIC, config.METRICS_MQTT_CODEC)
+    while True:
+        await asyncio.sleep(config.METRICS_MQTT_INTERVAL_SEC)
+        await mqtt.publish(config.METRICS_MQTT_TOPIC, metrics.summary(), qos=0)
+
+index_page = http.StaticFile(INDEX_FILE, "text/html; charset=utf-8", config.HTTP_FILE_CHUNK)
+
+events = http.EventHub(config.HTTP_SSE_MAX_CLIENTS, config.HTTP_SSE_PING_SEC)
+routes = http.Router()
+routes.add("/", index_page.handler)
+routes.add("/index.html", index_page.handler)
+routes.add("/env", http_env)
+routes.add("/time", http_time)
+routes.add("/alarms", http_alarms)
+routes.add("/alarms", http_put_alarms, ("PUT",))
+routes.add("/alarms/batch", http_batch, ("POST",))
+routes.add("/alarms/export", http_export)
+routes.add("/state", http_state)
+routes.add("/metrics", http_metrics)
+routes.add("/history", http_history)
+routes.add("/add", http_add)
+routes.add("/switch", _http_idx_op("toggle"))
+routes.add("/delete", _http_idx_op("delete"))
+routes.add("/events", events.stream, admit=False)   # 長連線，由 EventHub 自行限制數量
+
+# 保護鬧鐘 / 按鈕 / 音樂的時序：限制同時處理的請求數，迴圈延遲超過預算時暫停接單
+loop_lag = LagMonitor(config.LOOP_LAG_INTERVAL_MS, config.LOOP_LAG_BUDGET_MS)
+routes.max_body = config.HTTP_MAX_BODY
+admission = http.Admission(config.HTTP_MAX_ACTIVE, config.HTTP_MAX_WAITING, config.HTTP_QUEUE_WAIT_SEC, loop_lag)
+
+loop_lag.observe = metrics.on_lag
+routes.observe = metrics.observer("http_handler_ms", "HTTP handler 執行時間（含等待送出）", "path")
+metrics.value("loop_lag_smoothed_ms", "平滑後的迴圈延遲（Admission 判斷過載用）", lambda: loop_lag.lag_ms)
+metrics.value("http_requests_total", "已處理的 HTTP 請求數", lambda: routes.requests, "counter")
+metrics.value("http_open_connections", "目前開啟的 HTTP 連線數", lambda: routes.open)
+dht_read_hist = metrics.histogram("dht_read_ms", "每次 DHT 讀取佔用事件迴圈的時間")
+dht_service.observe = lambda us: metrics.observe(dht_read_hist, us)
+metrics.value("dht_reads_total", "呼叫 measure() 的次數", lambda: dht_service.reads, "counter")
+metrics.value("dht_failed_total", "重試用盡的取樣次數", lambda: dht_service.failed, "counter")
+metrics.value("dht_outliers_total", "判定為突波的取樣次數", lambda: dht_service.outliers, "counter")
+metrics.value("history_records_written_total", "寫入檢查點的彙總記錄數", lambda: history.records_written, "counter")
+metrics.value("http_rejected_total", "Admission 拒絕的請求數", lambda: admission.rejected + admission.shed, "counter")
+
 async def handle_client(reader, writer):
     try:
-        raw = await asyncio.wait_for(reader.read(1024), 5)
-        if not raw: return
-        req = raw.decode()
-        res = ""
-        
-        if "/env" in req: res = json.dumps(current_env)
-        elif "/time" in req:
-            t = taiwan_time()
-            res = json.dumps({"y":t[0],"M":t[1],"d":t[2],"h":t[3],"m":t[4],"s":t[5]})
-        elif "/alarms" in req: res = json.dumps({"alarms": alarms})
-        elif "/add?" in req:
-            try:
-                q = req.split("/add?")[1].split(" ")[0]
-                d = {kv.split("=")[0]: kv.split("=")[1] for kv in q.split("&")}
-                add_alarm(d["h"], d["m"], d["repeat"], d["music"])
-                res = "OK"
-            except: res = "Error"
-        elif "/switch?id=" in req:
-            try:
-                idx = int(req.split("id=")[1].split(" ")[0])
-                if 0 <= idx < len(alarms):
-                    alarms[idx]["enabled"] = not alarms[idx]["enabled"]
-                    save_alarms(); res = "OK"
-            except: res = "Error"
-        elif "/delete?id=" in req:
-            try:
-                idx = int(req.split("id=")[1].split(" ")[0])
-                del alarms[idx]; save_alarms(); res = "OK"
-            except: res = "Error"
-        else:
-            try:
-                with open("web/index.html") as f:
-                    writer.write("HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n")
-                    for line in f: writer.write(line)
-                    await writer.drain(); return
-            except: pass
-        writer.write("HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n" + res)
-        await writer.drain()
-    except: pass
+        await routes.serve(reader, writer, config.HTTP_IDLE_TIMEOUT_SEC, config.HTTP_MAX_REQUESTS,
+                           config.HTTP_HEADER_TIMEOUT_SEC, config.HTTP_WRITE_TIMEOUT_SEC,
+                           config.HTTP_MAX_CONNECTIONS, admission)
+    except Exception as e: print("HTTP 錯誤:", e)
     finally: 
         try: await writer.aclose()
         except: pass
@@ -452,18 +778,30 @@ async def main():
     
     await sync_time()
     load_alarms()
+    notify_alarms(); notify_env()
+    try: print(f"[History] 還原 {history.restore()} 筆彙總")
+    except OSError as e: print(f"[History] 還原失敗: {e}")
     
+    asyncio.create_task(clock.run())
+    asyncio.create_task(dht_service.run())   # 時間校正後才開始，紀錄的時間戳記才正確
+    asyncio.create_task(env_task())
     asyncio.create_task(dht_mqtt_task(ssid, pw))
+    asyncio.create_task(history_task())
     asyncio.create_task(check_alarm_task())
     asyncio.create_task(ui_display_task())
-    await asyncio.start_server(handle_client, "0.0.0.0", 80)
+    asyncio.create_task(sse_clock_task())
+    asyncio.create_task(loop_lag.run())
+    asyncio.create_task(metrics.run())
+    await asyncio.start_server(handle_client, "0.0.0.0", config.HTTP_PORT)
     
     # 【關鍵修改】按鈕腳位 16, 21
     btnA = DebouncedButton(16, on_click=on_btnA_click, on_long=on_btnA_long)
     btnB = DebouncedButton(21, on_click=on_btnB_click, on_long=on_btnB_long)
     
     while True:
-        btnA.update(); btnB.update(); await asyncio.sleep_ms(20)
+        with button_timer:
+            btnA.update(); btnB.update()
+        await asyncio.sleep_ms(20)
 
 try: asyncio.run(main())
 finally: speaker.duty(0)
\ No newline at end of file
@@ -0,0 +1,80 @@
+"""
+alarm_ops.py - 鬧鐘清單的批次異動
+所有異動先套用在副本上，全部成功才回傳新清單（任一失敗則整批不生效）
+"""
+
+MUSIC_COUNT = 4   # 對應 alarm_clock.MUSIC_NAME
+
+
+def make_alarm(h, m, repeat=0, music=0, enabled=True):
+    """
+    建立並驗證一筆鬧鐘
+
+    返回: dict；數值超出範圍時拋出 ValueError
+    """
+    h, m, repeat, music = int(h), int(m), int(repeat), int(music)
+    if not (0 <= h < 24 and 0 <= m < 60):
+        raise ValueError("時間超出範圍")
+    if not 0 <= music < MUSIC_COUNT:
+        raise ValueError("音樂編號超出範圍")
+    return {"h": h, "m": m, "repeat": 1 if repeat else 0, "music": music, "enabled": bool(enabled)}
+
+
+def _index(work, op):
+    idx = int(op["idx"])
+    if not 0 <= idx < len(work):
+        raise ValueError("鬧鐘編號不存在: {}".format(idx))
+    return idx
+
+
+def apply_op(work, op):
+    """
+    在 work 清單上套用一個異動（原地修改）
+
+    支援的 op:
+        add     {"h","m","repeat","music"}
+        update  {"idx", 任意欄位}
+        toggle  {"idx"}
+        delete  {"idx"}
+        replace {"alarms": [...]}  整份替換
+    idx 以套用當下的清單為準（批次中先刪除會影響後續編號）
+    add 帶 "local": True 時建立只屬於本機、不參與同步的鬧鐘（貪睡），update 會保留這個標記
+    """
+    if not isinstance(op, dict):
+        raise ValueError("異動必須是物件: {}".format(op))
+    kind = op.get("op")
+    if kind == "add":
+        a = make_alarm(op["h"], op["m"], op.get("repeat", 0), op.get("music", 0))
+        if op.get("local"):
+            a["local"] = True
+        work.append(a)
+    elif kind == "update":
+        idx = _index(work, op)
+        a = work[idx]
+        work[idx] = make_alarm(op.get("h", a["h"]), op.get("m", a["m"]),
+                               op.get("repeat", a["repeat"]), op.get("music", a["music"]),
+                               op.get("enabled", a["enabled"]))
+        if a.get("local"):
+            work[idx]["local"] = True
+    elif kind == "toggle":
+        idx = _index(work, op)
+        work[idx]["enabled"] = not work[idx]["enabled"]
+    elif kind == "delete":
+        del work[_index(work, op)]
+    elif kind == "replace":
+        work[:] = [make_alarm(a["h"], a["m"], a.get("repeat", 0), a.get("music", 0),
+                              a.get("enabled", True)) for a in op["alarms"]]
+    else:
+        raise ValueError("未知的操作: {}".format(kind))
+
+
+def apply_ops(alarms, ops):
+    """
+    將一批異動套用到 alarms 的副本
+
+    返回: 新的鬧鐘清單；任一異動失敗時拋出例外，原清單不受影響
+    """
+    work = [dict(a) for a in alarms]
+    for op in ops:
+        apply_op(work, op)
+    return work
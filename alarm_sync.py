@@ -0,0 +1,160 @@
+"""
+alarm_sync.py - 多台鬧鐘的鬧鐘設定同步
+以版本向量（{裝置 ID: 計數}）判斷新舊，快照以 retain 發佈供新開機裝置取得，
+平時只傳送增量（delta）
+
+訊息格式:
+    快照  {"by": 來源裝置, "vv": 版本向量, "src": 內容來源版本, "alarms": [...]}
+    增量  {"by": 來源裝置, "base": 套用前版本向量, "vv": 套用後版本向量, "ops": [...]}
+
+衝突（版本向量互不涵蓋）時，比較兩邊內容的來源版本（src）：計數總和較大者勝，
+相同再比較排序後的版本向量；合併後的版本向量取兩者逐項最大值。
+取最大值與合併都與順序無關，因此不論收到快照的先後，所有裝置都會得到相同結果；
+只有勝出分支的作者裝置會重新發佈合併後的快照，避免整個群組同時發佈
+"""
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+from alarm_ops import apply_ops
+
+EQUAL = 0
+NEWER = 1        # 對方較新（涵蓋本地）
+OLDER = 2        # 本地較新
+CONCURRENT = 3   # 互不涵蓋，需解衝突
+
+
+def compare(a, b):
+    """比較版本向量 a 相對於 b 的關係"""
+    a_gt = b_gt = False
+    for k in a:
+        if a[k] > b.get(k, 0):
+            a_gt = True
+    for k in b:
+        if b[k] > a.get(k, 0):
+            b_gt = True
+    if a_gt and b_gt:
+        return CONCURRENT
+    if a_gt:
+        return NEWER
+    if b_gt:
+        return OLDER
+    return EQUAL
+
+
+def _rank(vv):
+    """衝突時的決勝順序，只依版本向量內容決定（與由哪台裝置計算無關）"""
+    return (sum(vv.values()), sorted(vv.items()))
+
+
+def merge(a, b):
+    out = dict(a)
+    for k, v in b.items():
+        if v > out.get(k, 0):
+            out[k] = v
+    return out
+
+
+class AlarmSync:
+    def __init__(self, device_id, path=None):
+        """
+        參數:
+            device_id: 本機裝置 ID（版本向量的鍵）
+            path: 版本向量的保存檔案，None 表示不保存
+        """
+        self.device_id = device_id
+        self.path = path
+        self.vv = {}
+        self.src = {}         # 目前鬧鐘內容所屬的分支版本
+        self.applied = 0      # 套用的遠端快照/增量數
+        self.ignored = 0      # 過期或重複而略過的數量
+        self.conflicts = 0
+        self._load()
+
+    def _load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path) as f:
+                state = json.loads(f.read())
+            self.vv, self.src = state["vv"], state["src"]
+        except (OSError, ValueError, KeyError):
+            self.vv, self.src = {}, {}
+
+    def _save(self):
+        if self.path:
+            with open(self.path, 'w') as f:
+                f.write(json.dumps({"vv": self.vv, "src": self.src}))
+
+    def snapshot(self, alarms):
+        return {"by": self.device_id, "vv": self.vv, "src": self.src, "alarms": alarms}
+
+    def local_change(self, ops):
+        """
+        本機異動後呼叫，遞增自己的計數
+
+        返回: 要發佈的增量訊息
+        """
+        base = dict(self.vv)
+        self.vv[self.device_id] = self.vv.get(self.device_id, 0) + 1
+        self.src = dict(self.vv)
+        self._save()
+        return {"by": self.device_id, "base": base, "vv": dict(self.vv), "ops": ops}
+
+    def on_delta(self, alarms, delta):
+        """
+        處理遠端增量；只有基準版本與本地完全相同時才套用
+
+        返回: 新的鬧鐘清單，或 None（略過，等待快照修正）
+        """
+        if delta.get("by") == self.device_id or compare(delta["base"], self.vv) != EQUAL:
+            self.ignored += 1
+            return None
+        new_alarms = apply_ops(alarms, delta["ops"])
+        self.vv = dict(delta["vv"])
+        self.src = dict(self.vv)
+        self._save()
+        self.applied += 1
+        return new_alarms
+
+    def on_snapshot(self, alarms, snap, retained=False):
+        """
+        處理遠端快照
+
+        參數:
+            retained: 是否為 Broker 保留的快照（訂閱時收到）
+        返回: (新的鬧鐘清單或 None, 是否需要重新發佈本機快照)
+        """
+        theirs = snap["vv"]
+        rel = compare(theirs, self.vv)
+        if rel == EQUAL:
+            self.ignored += 1
+            return None, False
+        if rel == OLDER:
+            # Broker 保留的快照比較舊 → 由本機快照覆蓋；傳遞中的舊快照則直接略過
+            self.ignored += 1
+            return None, retained
+        # 先驗證快照內容（失敗時拋出例外），通過後才更新版本向量：
+        # 否則之後同版本的有效快照會被當成已處理而略過
+        new_alarms = apply_ops([], [{"op": "replace", "alarms": snap["alarms"]}])
+        if rel == NEWER:
+            self.vv = dict(theirs)
+            self.src = dict(snap.get("src", theirs))
+            self._save()
+            self.applied += 1
+            return new_alarms, False
+
+        self.conflicts += 1
+        me = self.device_id
+        author = self.vv.get(me, 0) > theirs.get(me, 0)   # 本機是否為本地分支的作者
+        their_src = snap.get("src", theirs)
+        self.vv = merge(self.vv, theirs)
+        if _rank(their_src) > _rank(self.src):
+            self.src = dict(their_src)
+            self._save()
+            self.applied += 1
+            return new_alarms, False
+        self._save()
+        return None, author
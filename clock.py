@@ -0,0 +1,71 @@
+"""
+clock.py - 每秒快取一次的本地時間
+time.localtime() 每次呼叫都會配置新的 tuple；畫面、鬧鐘檢查、HTTP、SSE 都讀這裡的快取，
+同一秒內不論讀幾次都只換算一次。tick 協程在秒數改變時更新快取，並觸發每秒事件；
+全系統共用模組層級的 clock（alarm_clock 設定時區並啟動 run()，wifi.get_current_time 也讀它）
+"""
+
+import time
+
+try:
+    import uasyncio as asyncio
+    sleep_ms = asyncio.sleep_ms
+except ImportError:
+    # 電腦端 CPython（tools/clock_bench.py）
+    import asyncio
+
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+WEEKDAYS = ("一", "二", "三", "四", "五", "六", "日")
+
+
+class Clock:
+    """
+    參數:
+        offset: 與 time.time() 相差的秒數（時區修正）
+        tick_ms: tick 協程檢查秒數改變的間隔（決定事件最多晚多久觸發）
+    """
+
+    def __init__(self, offset=0, tick_ms=100):
+        self.offset = offset
+        self.tick_ms = tick_ms
+        self.now = None             # 快取對應的 time.time()（整數秒）
+        self.t = None               # localtime tuple
+        self.date_str = ""          # "2026/01/01"
+        self.time_str = ""          # "08:00:00"
+        self.weekday_str = ""       # "一" ~ "日"
+        # 脈衝事件：set() 喚醒所有等待者後立即 clear()，等待者不需自行清除
+        self.second = asyncio.Event()
+        self.localtime_calls = 0
+
+    def get(self):
+        """
+        返回: 目前的 localtime tuple（同一秒內為同一個物件）
+        """
+        if time.time() != self.now:
+            self._refresh()
+        return self.t
+
+    def _refresh(self):
+        now = int(time.time())
+        if now == self.now:
+            return False
+        t = time.localtime(now + self.offset)
+        self.localtime_calls += 1
+        self.now = now
+        self.t = t
+        self.date_str = "{:04d}/{:02d}/{:02d}".format(t[0], t[1], t[2])
+        self.time_str = "{:02d}:{:02d}:{:02d}".format(t[3], t[4], t[5])
+        self.weekday_str = WEEKDAYS[t[6]]
+        self.second.set()
+        self.second.clear()
+        return True
+
+    async def run(self):
+        while True:
+            self._refresh()
+            await sleep_ms(self.tick_ms)
+
+
+clock = Clock()
@@ -0,0 +1,217 @@
+"""
+codec.py - MQTT 訊息編解碼
+可依主題選擇編碼方式；本模組同時可在 MicroPython 與電腦端 CPython 使用，
+後端直接 import 本檔即可解碼裝置送出的訊息
+
+編碼方式:
+    raw     十進位字串（相容既有訂閱者，例如 b'23'）
+    json    JSON；envelope=True 時包成 {"v","dev","seq","ts","d"}
+    cbor    CBOR 陣列 [v, dev, seq, ts, d]
+    struct  固定欄位二進位（僅限遙測數值，見 SCHEMAS）
+"""
+
+import struct
+import time
+
+try:
+    import ujson as json
+except ImportError:
+    import json
+
+SCHEMA_VERSION = 1
+
+# MicroPython (ESP32) 的 epoch 是 2000-01-01，統一換算成 Unix 時間
+_EPOCH_OFFSET = 946684800 if time.gmtime(0)[0] == 2000 else 0
+
+
+def unix_time():
+    return int(time.time()) + _EPOCH_OFFSET
+
+
+# ==================== raw / json ====================
+
+class RawCodec:
+    name = 'raw'
+
+    def encode(self, body, dev='', seq=0, ts=0):
+        return body if isinstance(body, bytes) else str(body).encode()
+
+    def decode(self, data):
+        return bytes(data).decode(), {}
+
+
+class JsonCodec:
+    name = 'json'
+
+    def __init__(self, envelope=False):
+        self.envelope = envelope
+
+    def encode(self, body, dev='', seq=0, ts=0):
+        if self.envelope:
+            body = {"v": SCHEMA_VERSION, "dev": dev, "seq": seq, "ts": ts, "d": body}
+        return json.dumps(body).encode()
+
+    def decode(self, data):
+        obj = json.loads(data)
+        if isinstance(obj, dict) and "v" in obj and "d" in obj:
+            return obj["d"], {"v": obj["v"], "dev": obj.get("dev"), "seq": obj.get("seq"), "ts": obj.get("ts")}
+        return obj, {}
+
+
+# ==================== CBOR（RFC 8949 子集） ====================
+
+def _cbor_head(major, n):
+    major <<= 5
+    if n < 24:
+        return bytes((major | n,))
+    if n < 0x100:
+        return struct.pack('>BB', major | 24, n)
+    if n < 0x10000:
+        return struct.pack('>BH', major | 25, n)
+    if n < 0x100000000:
+        return struct.pack('>BI', major | 26, n)
+    return struct.pack('>BQ', major | 27, n)
+
+
+def cbor_dumps(obj):
+    """編碼 None/bool/int/float/str/bytes/list/tuple/dict"""
+    if obj is None:
+        return b'\xf6'
+    if obj is True:
+        return b'\xf5'
+    if obj is False:
+        return b'\xf4'
+    if isinstance(obj, int):
+        return _cbor_head(0, obj) if obj >= 0 else _cbor_head(1, -1 - obj)
+    if isinstance(obj, float):
+        return b'\xfb' + struct.pack('>d', obj)
+    if isinstance(obj, str):
+        obj = obj.encode()
+        return _cbor_head(3, len(obj)) + obj
+    if isinstance(obj, (bytes, bytearray)):
+        return _cbor_head(2, len(obj)) + bytes(obj)
+    if isinstance(obj, (list, tuple)):
+        return _cbor_head(4, len(obj)) + b''.join(cbor_dumps(x) for x in obj)
+    if isinstance(obj, dict):
+        return _cbor_head(5, len(obj)) + b''.join(cbor_dumps(k) + cbor_dumps(v) for k, v in obj.items())
+    raise TypeError("CBOR 不支援的型別: {}".format(type(obj)))
+
+
+def _cbor_load(data, pos):
+    ib = data[pos]
+    major, info = ib >> 5, ib & 0x1F
+    pos += 1
+    if major == 7:
+        if info == 20:
+            return False, pos
+        if info == 21:
+            return True, pos
+        if info == 22:
+            return None, pos
+        if info == 26:
+            return struct.unpack_from('>f', data, pos)[0], pos + 4
+        if info == 27:
+            return struct.unpack_from('>d', data, pos)[0], pos + 8
+        raise ValueError("CBOR 不支援的簡單值: {}".format(info))
+    if info < 24:
+        n = info
+    elif info == 24:
+        n = data[pos]; pos += 1
+    elif info == 25:
+        n = struct.unpack_from('>H', data, pos)[0]; pos += 2
+    elif info == 26:
+        n = struct.unpack_from('>I', data, pos)[0]; pos += 4
+    elif info == 27:
+        n = struct.unpack_from('>Q', data, pos)[0]; pos += 8
+    else:
+        raise ValueError("CBOR 不支援不定長度")
+    if major == 0:
+        return n, pos
+    if major == 1:
+        return -1 - n, pos
+    if major == 2:
+        return bytes(data[pos:pos + n]), pos + n
+    if major == 3:
+        return bytes(data[pos:pos + n]).decode(), pos + n
+    if major == 4:
+        out = []
+        for _ in range(n):
+            item, pos = _cbor_load(data, pos)
+            out.append(item)
+        return out, pos
+    if major == 5:
+        out = {}
+        for _ in range(n):
+            k, pos = _cbor_load(data, pos)
+            out[k], pos = _cbor_load(data, pos)
+        return out, pos
+    raise ValueError("CBOR 不支援的型別: {}".format(major))
+
+
+def cbor_loads(data):
+    return _cbor_load(data, 0)[0]
+
+
+class CborCodec:
+    name = 'cbor'
+
+    def encode(self, body, dev='', seq=0, ts=0):
+        return cbor_dumps([SCHEMA_VERSION, dev, seq, ts, body])
+
+    def decode(self, data):
+        v, dev, seq, ts, body = cbor_loads(data)
+        return body, {"v": v, "dev": dev, "seq": seq, "ts": ts}
+
+
+# ==================== 固定欄位 struct ====================
+
+# 標頭：版本, schema 編號, 裝置 ID(8 bytes), 序號, Unix 時間
+_HEAD_FMT = '>BB8sII'
+_HEAD_SIZE = struct.calcsize(_HEAD_FMT)
+
+# schema 編號 → (欄位名稱, 格式, 縮放倍數)；數值以整數 ×縮放 傳送
+SCHEMAS = {
+    1: (('value',), '>h', 10),               # 單一數值（溫度或濕度）
+    2: (('temp', 'humi'), '>hH', 10),        # 溫濕度
+}
+
+
+class StructCodec:
+    name = 'struct'
+
+    def encode(self, body, dev='', seq=0, ts=0):
+        if isinstance(body, dict):
+            sid = 2
+            values = [body[k] for k in SCHEMAS[sid][0]]
+        else:
+            sid = 1
+            values = [body]
+        fields, fmt, scale = SCHEMAS[sid]
+        dev = dev.encode() if isinstance(dev, str) else dev
+        return (struct.pack(_HEAD_FMT, SCHEMA_VERSION, sid, dev[:8], seq & 0xFFFFFFFF, ts)
+                + struct.pack(fmt, *[int(round(v * scale)) for v in values]))
+
+    def decode(self, data):
+        v, sid, dev, seq, ts = struct.unpack_from(_HEAD_FMT, data)
+        fields, fmt, scale = SCHEMAS[sid]
+        values = struct.unpack_from(fmt, data, _HEAD_SIZE)
+        meta = {"v": v, "dev": dev.rstrip(b'\x00').decode(), "seq": seq, "ts": ts}
+        if sid == 1:
+            return values[0] / scale, meta
+        return {k: x / scale for k, x in zip(fields, values)}, meta
+
+
+CODECS = {
+    'raw': RawCodec(),
+    'json': JsonCodec(),
+    'json_env': JsonCodec(envelope=True),
+    'cbor': CborCodec(),
+    'struct': StructCodec(),
+}
+
+
+def get_codec(name):
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError("未知的編碼方式: {}".format(name))
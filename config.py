@@ -42,6 +42,31 @@ OLED_HEIGHT = 64
 # DHT11 量測間隔
 DHT11_POLL_INTERVAL_SEC = 2
 
+# DHT 讀取方式：True 用 dht_async（腳位中斷記錄波形，不阻塞事件迴圈），False 用內建 dht 模組
+# 尚未在實機上以邏輯分析儀或擷取波形（tools/dht_check.py --capture）驗證，預設關閉
+DHT_ASYNC = False
+
+# DHT 取樣服務（sensor.py）：有限次重試、中位數剔除突波 + EMA 平滑
+DHT_RETRIES = 2                  # 讀取失敗時的重試次數
+DHT_RETRY_DELAY_MS = 1100        # 重試前等待（DHT11 兩次讀取至少相隔 1 秒）
+DHT_FILTER_WINDOW = 5            # 中位數視窗筆數
+DHT_EMA_ALPHA = 0.3              # EMA 係數（越大越跟得上變化，越小越平滑）
+DHT_MAX_JUMP = (5, 15)           # (°C, %) 與中位數相差超過此值視為突波
+DHT_HISTORY = 1800               # 環形緩衝區筆數（每 2 秒一筆約 1 小時，即 /history 的 raw 層）
+DHT_STALE_SEC = 30               # 超過此秒數沒有成功讀取，網頁標示為過期
+
+# 溫濕度歷史（history.py）：raw 之外再保留 1 分鐘與 15 分鐘的 min / avg / max
+HISTORY_MINUTE_SLOTS = 1440      # 1 分鐘層筆數（1 天）
+HISTORY_QUARTER_SLOTS = 2880     # 15 分鐘層筆數（30 天）
+HISTORY_FILE = 'history.bin'     # 檢查點環形檔（固定大小，約 86 KB）；None 不寫入 Flash
+HISTORY_CHECKPOINT_SEC = 600     # 檢查點間隔（斷電最多遺失這段時間的彙總）
+
+# 溫濕度遙測：變化超過死區才發佈，最長靜默時間到了送心跳
+TELEMETRY_DEADBAND = {'temp': 1, 'humi': 2}   # 各欄位死區（°C / %）
+TELEMETRY_HEARTBEAT_SEC = 300                 # 最長靜默秒數
+TELEMETRY_DECIMALS = 0                        # 發佈的小數位數；0 送整數字串（"23"，與 DHT11 原始讀值相同）
+TELEMETRY_RETAIN = False                      # True 時以 retain 發佈，新訂閱者立即取得最新值（Broker 會長期保存最後一筆）
+
 # OLED 更新間隔
 OLED_UPDATE_INTERVAL_SEC = 1
 
@@ -70,18 +95,84 @@ MQTT_BROKER = 'broker.emqx.io'
 # MQTT_BROKER = 'test.mosquitto.org'
 MQTT_PORT = 1883
 
+# MQTT TLS（使用 mqtt_as 的 ssl / ssl_params）
+MQTT_TLS = False
+MQTT_TLS_PORT = 8883
+MQTT_TLS_CA_FILE = None                  # CA 憑證（DER），例如 'ca.der'
+MQTT_TLS_FINGERPRINT = None              # 伺服器憑證 SHA-256 指紋（hex），設定後取代 CA 驗證
+
 # MQTT Topic 配置
 MQTT_TOPICS = {
     'cmd': b'nuu/csie/iot1133/cmd01',           # 接收指令
+    'ack': b'nuu/csie/iot1133/ack01',           # 指令回覆（未指定 reply 時）
     'temp_humi': b'nuu/csie/iot1133/TempHumi',  # 發佈溫濕度
     'subscribe': b'nuu/csie/iot1133/#',         # 訂閱所有
 }
 
+# MQTT 訊息編碼（raw / json / json_env / cbor / struct，見 codec.py）
+# 發佈非 str/bytes 的內容時，依主題選擇編碼；指令主題的回覆沿用請求主題的編碼
+MQTT_CODEC_DEFAULT = 'raw'
+MQTT_TOPIC_CODECS = {
+    b'nuu/csie/iot1133/cmd01': 'json',
+}
+
+# 多台鬧鐘同步（retain 快照 + 增量，見 alarm_sync.py）
+ALARM_SYNC_ENABLED = False
+ALARM_SYNC_PREFIX = 'nuu/csie/iot1133/alarmset'  # 主題: {prefix}/dev/{DEVICE_ID}、{prefix}/grp/{群組}
+ALARM_SYNC_GROUP = None                  # 群組名稱（例如 'dorm3f'），None 表示只用裝置範圍
+ALARM_SYNC_SNAPSHOT_DELAY_SEC = 5        # 異動後延遲發佈快照，合併連續異動
+ALARM_SYNC_CODEC = 'json'
+
 # MQTT 重連設定
 MQTT_RECONNECT_INITIAL_DELAY_SEC = 2     # 初始重連延遲
 MQTT_RECONNECT_MAX_DELAY_SEC = 60        # 最大重連延遲
 MQTT_RECONNECT_BACKOFF_FACTOR = 1.5      # 指數退避因子
 
+# MQTT 離線發佈佇列
+MQTT_QUEUE_SIZE = 64                     # RAM 環形緩衝區筆數
+MQTT_QUEUE_POLICY = 'drop_oldest'        # 滿載策略：'drop_oldest' 或 'drop_newest'
+MQTT_QUEUE_SPILL_FILE = None             # Flash 溢出檔（例如 'mqtt_queue.bin'），None 表示不使用
+MQTT_QUEUE_SPILL_SLOTS = 256             # Flash 溢出檔槽位數
+MQTT_QUEUE_SLOT_SIZE = 128               # 每個槽位大小（bytes）
+MQTT_DRAIN_BATCH = 8                     # 重連後每批補發筆數
+MQTT_DRAIN_INTERVAL_MS = 200             # 每批之間的間隔
+
+# MQTT QoS 1 發佈視窗
+MQTT_PUB_WINDOW = 4                      # 同時等待 PUBACK 的訊息上限（逾時重送交給 mqtt_as 的 response_time）
+
+# MQTT 收訊處理工作池
+MQTT_HANDLER_WORKERS = 2                 # 處理協程數量
+MQTT_HANDLER_QUEUE_SIZE = 32             # 待處理訊息總容量
+MQTT_HANDLER_POLICY = 'drop_oldest'      # 滿載策略：'drop_oldest' 或 'drop_newest'
+MQTT_HANDLER_WAIT_MS = 100               # 佇列滿載時接收迴圈最多等待的時間（背壓），0 表示立即丟棄
+
+# ==================== HTTP 伺服器 ====================
+
+HTTP_PORT = 80
+HTTP_IDLE_TIMEOUT_SEC = 5                # keep-alive 連線閒置多久後關閉
+HTTP_MAX_REQUESTS = 100                  # 單一連線最多處理的請求數
+HTTP_SSE_MAX_CLIENTS = 4                 # /events 同時連線上限（每條占用一個 socket）
+HTTP_SSE_PING_SEC = 15                   # 無事件時送出註解行的間隔
+HTTP_FILE_CHUNK = 1024                   # 靜態檔案傳送緩衝區大小（bytes）
+HTTP_MAX_BODY = 49152                    # 請求內容上限（批次匯入約 500 筆鬧鐘）
+HTTP_HEADER_TIMEOUT_SEC = 3              # 收到請求列後，讀完標頭與內容的期限
+HTTP_WRITE_TIMEOUT_SEC = 5               # 每次送出資料的期限（對方不讀取時中斷）
+HTTP_MAX_CONNECTIONS = 8                 # 同時開啟的連線上限（lwIP socket 有限）
+HTTP_MAX_ACTIVE = 2                      # 同時執行的請求數上限
+HTTP_MAX_WAITING = 4                     # 排隊等待的請求數上限，超過回 503
+HTTP_QUEUE_WAIT_SEC = 2                  # 排隊最長等待秒數
+
+# 事件迴圈延遲預算：超過時 HTTP 暫停接單，保護鬧鐘與按鈕時序
+LOOP_LAG_INTERVAL_MS = 50
+LOOP_LAG_BUDGET_MS = 50
+
+# ==================== 執行期指標（/metrics） ====================
+
+METRICS_MEM_INTERVAL_MS = 2000          # gc.mem_free / mem_alloc 取樣間隔（會走訪整個堆積，不宜太頻繁）
+METRICS_MQTT_TOPIC = None               # 例如 b'nuu/csie/iot1133/metrics01'；None 不發佈
+METRICS_MQTT_INTERVAL_SEC = 60          # 發佈指標摘要的間隔
+METRICS_MQTT_CODEC = 'json'             # 指標摘要（dict）的編碼方式（raw 無法編碼 dict）
+
 # ==================== 字體配置 ====================
 
 FONT_PATH = './lib/fonts/fusion_bdf.12'
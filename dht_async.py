@@ -0,0 +1,154 @@
+"""
+dht_async.py - 不阻塞事件迴圈的 DHT11 / DHT22 讀取
+內建的 dht 模組以關中斷的忙碌迴圈讀取整個波形（起始訊號 18 ms + 資料約 5 ms），期間所有協程都停住；
+這裡改為：起始訊號用 await 等待，資料期間以腳位中斷（上升與下降緣）把 ticks_us 時間戳記寫入預先配置的
+array，最後一個邊緣到達時以 ThreadSafeFlag 喚醒讀取協程，在迴圈中解碼
+ESP32 的 RMT 在 MicroPython 只提供發送，因此採用腳位中斷
+"""
+
+from array import array
+import time
+
+try:
+    import uasyncio as asyncio
+    from time import ticks_us, ticks_diff
+    sleep_ms = asyncio.sleep_ms
+    wait_for_ms = asyncio.wait_for_ms
+    ThreadSafeFlag = asyncio.ThreadSafeFlag
+except ImportError:
+    # 電腦端 CPython（tools/dht_check.py）
+    import asyncio
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+    def wait_for_ms(aw, ms):
+        return asyncio.wait_for(aw, ms / 1000)
+
+    class ThreadSafeFlag:
+        """uasyncio.ThreadSafeFlag 的替身：wait() 返回時自動清除"""
+
+        def __init__(self):
+            self._ev = asyncio.Event()
+
+        def set(self):
+            self._ev.set()
+
+        async def wait(self):
+            await self._ev.wait()
+            self._ev.clear()
+
+ETIMEDOUT = 110
+EIO = 5
+
+# 釋放資料線（上升）、感測器回應 80 µs 低 + 80 µs 高、40 位元各一組下降 / 上升、結束時回到高電位
+EDGES = 85
+FRAME_MS = 8            # 等待資料的上限（40 位元最長約 5 ms）
+START_MS = {11: 18, 22: 1}      # 起始訊號拉低的時間
+
+
+def decode_pulses(edges, n=None, threshold_us=48):
+    """
+    由邊緣時間戳記解出 5 個位元組
+
+    參數:
+        edges: ticks_us 時間戳記（依到達順序，可為 array）
+        n: 有效的筆數，預設為 len(edges)
+        threshold_us: 高電位超過此長度為 1（規格：0 為 26-28 µs，1 為 70 µs）
+
+    返回: bytes（濕度整數、濕度小數、溫度整數、溫度小數、檢查碼）
+
+    資料從尾端往回對齊：最後 81 個邊緣是 40 組（上升、下降）加上結束時的上升，
+    因此漏掉開頭的回應邊緣也不影響；邊緣不足拋出 OSError(ETIMEDOUT)，檢查碼錯誤拋出 OSError(EIO)
+    """
+    if n is None:
+        n = len(edges)
+    if n < 81:
+        raise OSError(ETIMEDOUT)
+    buf = bytearray(5)
+    base = n - 81
+    for k in range(40):
+        i = base + 2 * k
+        if ticks_diff(edges[i + 1], edges[i]) > threshold_us:
+            buf[k >> 3] |= 0x80 >> (k & 7)
+    if (buf[0] + buf[1] + buf[2] + buf[3]) & 0xFF != buf[4]:
+        raise OSError(EIO)
+    return bytes(buf)
+
+
+def convert(buf, kind=11):
+    """
+    返回: (溫度 °C, 濕度 %)
+    """
+    if kind == 11:
+        t = buf[2] + (buf[3] & 0x7F) / 10
+        return (-t if buf[3] & 0x80 else t), buf[0] + buf[1] / 10
+    t = (((buf[2] & 0x7F) << 8) | buf[3]) / 10
+    return (-t if buf[2] & 0x80 else t), ((buf[0] << 8) | buf[1]) / 10
+
+
+class DhtAsync:
+    """
+    與 dht.DHT11 相同的 temperature() / humidity()，但 measure() 是協程
+
+    參數:
+        pin: machine.Pin（資料線，需上拉）
+        kind: 11 或 22
+    """
+
+    def __init__(self, pin, kind=11):
+        self.pin = pin
+        self.kind = kind
+        self.edges = array('L', [0] * EDGES)
+        self._n = 0
+        self._flag = ThreadSafeFlag()
+        self._temp = None
+        self._humi = None
+        self.stall_us = 0       # 最近一次 measure() 在迴圈中同步執行的時間（不含中斷）
+
+    def _irq(self, pin):
+        # 硬體中斷：不可配置記憶體，只記時間戳記
+        n = self._n
+        if n < EDGES:
+            self.edges[n] = ticks_us()
+            self._n = n + 1
+            if n + 1 == EDGES:
+                self._flag.set()
+
+    async def measure(self):
+        pin = self.pin
+        t0 = ticks_us()
+        pin.init(pin.OUT, value=0)
+        stall = ticks_diff(ticks_us(), t0)
+        await sleep_ms(START_MS[self.kind])
+
+        t0 = ticks_us()
+        self._n = 0
+        pin.irq(self._irq, pin.IRQ_RISING | pin.IRQ_FALLING, hard=True)
+        pin.init(pin.IN, pin.PULL_UP)          # 釋放資料線，感測器約 20-40 µs 後回應
+        stall += ticks_diff(ticks_us(), t0)
+        timed_out = False
+        try:
+            await wait_for_ms(self._flag.wait(), FRAME_MS)
+        except asyncio.TimeoutError:
+            timed_out = True    # 邊緣不足時由 decode_pulses 判斷
+        pin.irq(None)
+        if timed_out and self._n == EDGES:
+            await self._flag.wait()     # 最後一個邊緣恰好在逾時後才到：清掉旗標，免得下次讀取直接返回
+        t0 = ticks_us()
+        try:
+            self._temp, self._humi = convert(decode_pulses(self.edges, self._n), self.kind)
+        finally:
+            self.stall_us = stall + ticks_diff(ticks_us(), t0)
+
+    def temperature(self):
+        return self._temp
+
+    def humidity(self):
+        return self._humi
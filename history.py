@@ -0,0 +1,311 @@
+"""
+history.py - 溫濕度分層歷史紀錄
+raw（最近一小時，即 sensor.SensorHistory）、1 分鐘與 15 分鐘的 min / avg / max 彙總，
+全部存在預先配置的 array；彙總層定期寫入 Flash 環形檔，重開機後還原
+溫濕度一律以 0.1 為單位的整數保存與輸出
+"""
+
+import struct
+from array import array
+
+FIELDS = ("ts", "tmin", "tavg", "tmax", "hmin", "havg", "hmax")
+RAW_FIELDS = ("ts", "temp", "humi", "flags")
+ROW_FMT = "<L6h"        # 二進位輸出：彙總層每列 16 bytes
+RAW_ROW_FMT = "<LhhB"   # 二進位輸出：raw 每列 9 bytes
+
+# 檢查點記錄：序號, 時段開始時間, 6 個彙總值
+# 每層在檔案中有自己的區段，以序號最大者為最新，不另存中繼資料（避免反覆覆寫同一個 Flash 區塊）
+_REC_FMT = "<LL6h"
+_REC_SIZE = struct.calcsize(_REC_FMT)
+_READ_RECS = 64         # 還原時每次讀取的記錄數
+
+_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+
+def parse_range(s):
+    """
+    "90m" / "24h" / "30d" → 秒數；格式錯誤拋出 ValueError
+    """
+    if not s or s[-1] not in _UNITS:
+        raise ValueError("range 格式應為 <數字><m|h|d>: {}".format(s))
+    n = int(s[:-1])
+    if n <= 0:
+        raise ValueError("range 必須大於 0")
+    return n * _UNITS[s[-1]]
+
+
+class Tier:
+    """
+    固定時段的彙總層：環形 array 保存已結束的時段，另有一個進行中的累加器
+
+    參數:
+        name: 層級名稱（輸出用，例如 "1m"）
+        step: 時段長度（秒）
+        capacity: 保留的時段數
+    """
+
+    def __init__(self, name, step, capacity):
+        self.name = name
+        self.step = step
+        self.capacity = capacity
+        self.ts = array("L", [0] * capacity)
+        self.vals = array("h", [0] * (capacity * 6))
+        self._head = 0          # 下一筆寫入的位置
+        self._count = 0
+        self.unsaved = 0        # 最新幾筆尚未寫入檢查點
+
+        # 進行中時段的累加器（整數，0.1 單位）
+        self._start = None
+        self._n = 0
+        self._tsum = self._tmin = self._tmax = 0
+        self._hsum = self._hmin = self._hmax = 0
+
+        # Flash 區段（由 TieredHistory 設定）
+        self.offset = 0
+        self._seq = 0
+        self._fpos = 0
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def span(self):
+        return self.step * self.capacity
+
+    def add(self, ts, t10, h10):
+        start = ts - ts % self.step
+        if start != self._start:
+            self._close()
+            self._start = start
+            self._n = 0
+        if not self._n:
+            self._tsum = self._tmin = self._tmax = t10
+            self._hsum = self._hmin = self._hmax = h10
+        else:
+            self._tsum += t10
+            self._hsum += h10
+            if t10 < self._tmin: self._tmin = t10
+            if t10 > self._tmax: self._tmax = t10
+            if h10 < self._hmin: self._hmin = h10
+            if h10 > self._hmax: self._hmax = h10
+        self._n += 1
+
+    def _current(self):
+        n = self._n
+        return (self._tmin, (self._tsum + n // 2) // n, self._tmax,
+                self._hmin, (self._hsum + n // 2) // n, self._hmax)
+
+    def _close(self):
+        if self._n:
+            self.push(self._start, self._current())
+            if self.unsaved < self.capacity:
+                self.unsaved += 1
+
+    def push(self, ts, vals):
+        i = self._head
+        self.ts[i] = ts
+        base = i * 6
+        for k in range(6):
+            self.vals[base + k] = vals[k]
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def rows(self, since=0, partial=True):
+        """
+        由舊到新產生 (ts, tmin, tavg, tmax, hmin, havg, hmax)
+
+        參數:
+            since: 只輸出時段開始時間 >= since 的列
+            partial: 是否附上進行中的時段
+        """
+        start = (self._head - self._count) % self.capacity
+        for k in range(self._count):
+            i = (start + k) % self.capacity
+            if self.ts[i] >= since:
+                b = i * 6
+                v = self.vals
+                yield self.ts[i], v[b], v[b + 1], v[b + 2], v[b + 3], v[b + 4], v[b + 5]
+        if partial and self._n and self._start >= since:
+            yield (self._start,) + self._current()
+
+    def _latest(self, back):
+        """返回倒數第 back 筆（1 = 最新）的 (ts, vals 起始位置)"""
+        i = (self._head - back) % self.capacity
+        return self.ts[i], i * 6
+
+
+class TieredHistory:
+    """
+    參數:
+        raw: sensor.SensorHistory（最近一小時的原始取樣）
+        raw_span: raw 涵蓋的秒數（決定 range 多短時改用 raw）
+        minute_slots / quarter_slots: 1 分鐘 / 15 分鐘層的時段數
+        path: 檢查點檔案，None 表示不寫入 Flash
+    """
+
+    def __init__(self, raw, raw_span=3600, minute_slots=1440, quarter_slots=2880, path=None):
+        self.raw = raw
+        self.raw_span = raw_span
+        self.tiers = (Tier("1m", 60, minute_slots), Tier("15m", 900, quarter_slots))
+        self.path = path
+        offset = 0
+        for t in self.tiers:
+            t.offset = offset
+            offset += t.capacity * _REC_SIZE
+        self.file_size = offset
+
+        # === 統計 ===
+        self.checkpoints = 0
+        self.records_written = 0
+        self.restored = 0
+
+    def add(self, ts, temp, humi):
+        """加入一筆成功的取樣（°C / %）"""
+        t10 = int(round(temp * 10))
+        h10 = int(round(humi * 10))
+        for t in self.tiers:
+            t.add(ts, t10, h10)
+
+    def pick(self, seconds):
+        """
+        返回: 能涵蓋 seconds 的最細層級（None 表示 raw）
+        """
+        if seconds <= self.raw_span:
+            return None
+        for t in self.tiers:
+            if seconds <= t.span:
+                return t
+        return self.tiers[-1]
+
+    def nbytes(self):
+        """各 array 佔用的位元組數（不含物件標頭）"""
+        n = self.raw.nbytes()
+        for t in self.tiers:
+            n += t.capacity * (t.ts.itemsize + 6 * t.vals.itemsize)
+        return n
+
+    # ==================== 輸出 ====================
+
+    def json_parts(self, seconds, now):
+        """逐列產生 JSON 片段（可直接交給 http_server.send_chunked）"""
+        tier = self.pick(seconds)
+        since = now - seconds
+        fields = RAW_FIELDS if tier is None else FIELDS
+        yield '{"tier":"%s","step":%d,"scale":0.1,"fields":["%s"],"rows":[' % (
+            "raw" if tier is None else tier.name, 0 if tier is None else tier.step, '","'.join(fields))
+        rows = self.raw.rows(since) if tier is None else tier.rows(since)
+        sep = ""
+        for r in rows:
+            yield sep + "[" + ",".join(str(x) for x in r) + "]"
+            sep = ","
+        yield "]}"
+
+    def bin_parts(self, seconds, now):
+        """逐列產生二進位片段（格式見 bin_format）"""
+        tier = self.pick(seconds)
+        since = now - seconds
+        if tier is None:
+            for r in self.raw.rows(since):
+                yield struct.pack(RAW_ROW_FMT, *r)
+        else:
+            for r in tier.rows(since):
+                yield struct.pack(ROW_FMT, *r)
+
+    def bin_format(self, seconds):
+        """返回: (層級名稱, 時段秒數, struct 格式, 欄位)，放在二進位回應的標頭"""
+        tier = self.pick(seconds)
+        if tier is None:
+            return "raw", 0, RAW_ROW_FMT, RAW_FIELDS
+        return tier.name, tier.step, ROW_FMT, FIELDS
+
+    # ==================== 檢查點 ====================
+
+    def checkpoint(self):
+        """
+        把各層尚未保存的時段寫入 Flash（只寫新增的記錄）
+
+        返回: 寫入的記錄數
+        """
+        if not self.path:
+            return 0
+        written = 0
+        try:
+            f = open(self.path, "r+b")
+        except OSError:
+            self._create()
+            f = open(self.path, "r+b")
+        with f:
+            for t in self.tiers:
+                for back in range(t.unsaved, 0, -1):
+                    ts, b = t._latest(back)
+                    v = t.vals
+                    t._seq += 1
+                    f.seek(t.offset + t._fpos * _REC_SIZE)
+                    f.write(struct.pack(_REC_FMT, t._seq, ts, v[b], v[b + 1], v[b + 2], v[b + 3], v[b + 4], v[b + 5]))
+                    t._fpos = (t._fpos + 1) % t.capacity
+                    written += 1
+                t.unsaved = 0
+        self.checkpoints += 1
+        self.records_written += written
+        return written
+
+    def _create(self):
+        # 一次配置好整個檔案，之後只在原位覆寫，檔案大小不再變動
+        blank = bytes(_REC_SIZE * _READ_RECS)
+        with open(self.path, "wb") as f:
+            left = self.file_size
+            while left > 0:
+                f.write(blank if left >= len(blank) else blank[:left])
+                left -= len(blank)
+
+    def restore(self):
+        """
+        開機時從檢查點還原各層（由舊到新依序放回）
+
+        返回: 還原的記錄數
+        """
+        if not self.path:
+            return 0
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return 0
+        buf = bytearray(_REC_SIZE * _READ_RECS)
+        total = 0
+        with f:
+            for t in self.tiers:
+                # 第一次掃描：找出序號最大（最新）的槽位
+                best, best_pos = 0, 0
+                for pos, seq, _ in self._scan(f, t, buf):
+                    if seq > best:
+                        best, best_pos = seq, pos
+                if not best:
+                    continue
+                # 第二次：從最新的下一格讀到區段尾，再從頭讀到最新，即為由舊到新
+                start = best_pos + 1
+                for first, last in ((start, t.capacity), (0, start)):
+                    for _, seq, rec in self._scan(f, t, buf, first, last):
+                        if seq:
+                            t.push(rec[1], rec[2:])
+                            total += 1
+                t._seq = best
+                t._fpos = start % t.capacity
+        self.restored = total
+        return total
+
+    def _scan(self, f, tier, buf, first=0, last=None):
+        """依序產生區段內槽位 first..last-1 的 (位置, 序號, 記錄)"""
+        last = tier.capacity if last is None else last
+        f.seek(tier.offset + first * _REC_SIZE)
+        mv = memoryview(buf)
+        pos = first
+        while pos < last:
+            n = min(_READ_RECS, last - pos)
+            got = f.readinto(mv[:n * _REC_SIZE])
+            if not got:
+                return
+            for k in range(got // _REC_SIZE):
+                rec = struct.unpack_from(_REC_FMT, buf, k * _REC_SIZE)
+                yield pos + k, rec[0], rec
+            pos += n
@@ -0,0 +1,610 @@
+"""
+http_server.py - 精簡 HTTP/1.1 伺服器工具
+逐行讀取請求列與標頭（不受 TCP 分段影響），以 dict 路由表分派
+"""
+
+import os
+import random
+
+try:
+    import uasyncio as asyncio
+    from time import ticks_us, ticks_diff
+except ImportError:
+    import asyncio
+    import time
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+STATUS = {
+    200: "OK",
+    204: "No Content",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    431: "Request Header Fields Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+MAX_LINE = 1024       # 請求列 / 單一標頭最大長度
+MAX_HEADERS = 32      # 標頭數量上限
+MAX_BODY = 8192       # 請求內容上限
+
+
+class HttpError(Exception):
+    def __init__(self, status, msg=None):
+        super().__init__(msg or STATUS.get(status, ""))
+        self.status = status
+
+
+class Request:
+    def __init__(self, method, path, query, version, headers, body):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.version = version
+        self.headers = headers
+        self.body = body
+        # HTTP/1.1 預設保持連線，HTTP/1.0 需明確要求
+        conn = headers.get('connection', '').lower()
+        self.keep_alive = conn == 'keep-alive' or (version == 'HTTP/1.1' and conn != 'close')
+
+
+def unquote(s):
+    """URL 解碼（%XX 與 +）"""
+    if '%' not in s and '+' not in s:
+        return s
+    s = s.replace('+', ' ')
+    parts = s.split('%')
+    out = bytearray(parts[0].encode())
+    for p in parts[1:]:
+        try:
+            out.append(int(p[:2], 16))
+            out.extend(p[2:].encode())
+        except ValueError:
+            out.extend(b'%' + p.encode())
+    try:
+        return out.decode()
+    except UnicodeError:
+        raise HttpError(400)
+
+
+def parse_query(qs):
+    """a=1&b=2 → {"a": "1", "b": "2"}"""
+    d = {}
+    if qs:
+        for kv in qs.split('&'):
+            if not kv:
+                continue
+            k, _, v = kv.partition('=')
+            d[unquote(k)] = unquote(v)
+    return d
+
+
+class LineReader:
+    """
+    有長度上限的逐行讀取：stream.readline() 會把整行讀進記憶體才返回，
+    這裡以固定大小分段讀取，超過上限仍未見到換行就中止；
+    讀過頭的位元組留給下一次 readline() / readexactly()（同一連線的下一個請求）
+    """
+
+    def __init__(self, reader, chunk=256):
+        self._r = reader
+        self._chunk = chunk
+        self._buf = b''
+
+    async def readline(self, limit=MAX_LINE):
+        """
+        返回: 含換行的一行；EOF 時返回剩餘的位元組（可能為空或不含換行）
+        超過 limit 位元組仍沒有換行時拋出 HttpError(431)
+        """
+        buf = self._buf
+        i = buf.find(b'\n')
+        while i < 0:
+            if len(buf) >= limit:
+                raise HttpError(431)
+            data = await self._r.read(self._chunk)
+            if not data:
+                self._buf = b''
+                return buf
+            buf += data
+            i = buf.find(b'\n', len(buf) - len(data))     # 只搜尋新讀入的部分
+        if i >= limit:
+            raise HttpError(431)
+        self._buf = buf[i + 1:]
+        return buf[:i + 1]
+
+    async def readexactly(self, n):
+        buf = self._buf
+        if len(buf) >= n:
+            self._buf = buf[n:]
+            return buf[:n]
+        self._buf = b''
+        return buf + await self._r.readexactly(n - len(buf))
+
+
+async def read_request(reader, max_body=MAX_BODY, line=None):
+    """
+    讀取並解析一個請求
+
+    參數:
+        reader: LineReader（同一連線沿用同一個，才不會遺失讀過頭的位元組）
+        line: 已讀取的請求列（呼叫端先等到第一行才開始計算標頭期限時使用）
+
+    返回: Request，連線已關閉（EOF）時回傳 None；格式錯誤時拋出 HttpError
+    """
+    if line is None:
+        line = await reader.readline()
+    if not line:
+        return None
+    if not line.endswith(b'\n'):
+        raise HttpError(400)
+    try:
+        method, target, version = line.decode().split()
+    except (ValueError, UnicodeError):
+        raise HttpError(400)
+
+    headers = {}
+    while True:
+        h = await reader.readline()
+        if not h or not h.endswith(b'\n'):
+            raise HttpError(400)
+        if h in (b'\r\n', b'\n'):
+            break
+        if len(headers) >= MAX_HEADERS:
+            raise HttpError(431)
+        try:
+            name, sep, value = h.decode().partition(':')
+        except UnicodeError:
+            raise HttpError(400)
+        if not sep:
+            raise HttpError(400)
+        headers[name.strip().lower()] = value.strip()
+
+    body = b''
+    length = headers.get('content-length')
+    if length:
+        try:
+            length = int(length)
+        except ValueError:
+            raise HttpError(400)
+        if length > max_body:
+            raise HttpError(413)
+        body = await reader.readexactly(length)
+
+    path, _, qs = target.partition('?')
+    return Request(method, path, parse_query(qs), version, headers, body)
+
+
+def response_head(status, content_type=None, length=None, headers=None, close=False):
+    """組出狀態列與標頭（含 Content-Length），返回 bytes"""
+    head = "HTTP/1.1 {} {}\r\n".format(status, STATUS.get(status, ""))
+    if close:
+        head += "Connection: close\r\n"
+    if content_type:
+        head += "Content-Type: " + content_type + "\r\n"
+    if length is not None:
+        head += "Content-Length: {}\r\n".format(length)
+    if headers:
+        for k, v in headers.items():
+            head += k + ": " + v + "\r\n"
+    return (head + "\r\n").encode()
+
+
+async def send(writer, status, body=b'', content_type="application/json", headers=None, close=False):
+    """送出完整回應"""
+    if isinstance(body, str):
+        body = body.encode()
+    writer.write(response_head(status, content_type if body else None, len(body), headers, close))
+    if body:
+        writer.write(body)
+    await writer.drain()
+
+
+async def reply(req, writer, status, body=b'', content_type="application/json", headers=None):
+    """回應 req，依 req.keep_alive 決定是否附上 Connection: close"""
+    if req.method == "HEAD":
+        if isinstance(body, str):
+            body = body.encode()
+        writer.write(response_head(status, content_type, len(body), headers, not req.keep_alive))
+        return await writer.drain()
+    await send(writer, status, body, content_type, headers, not req.keep_alive)
+
+
+async def send_chunked(req, writer, parts, content_type="application/json", headers=None, chunk=512):
+    """
+    串流送出回應，不需事先組出完整內容；HTTP/1.1 以 Transfer-Encoding: chunked 分塊，
+    HTTP/1.0 則以關閉連線結束
+
+    參數:
+        parts: 可迭代的 str / bytes 片段
+        chunk: 累積到此位元組數才送出一塊（減少 drain 次數）
+    """
+    h = {}
+    chunked = req.version != "HTTP/1.0"
+    if chunked:
+        h["Transfer-Encoding"] = "chunked"
+    else:
+        req.keep_alive = False
+    if headers:
+        h.update(headers)
+    writer.write(response_head(200, content_type, None, h, not req.keep_alive))
+    if req.method == "HEAD":
+        return await writer.drain()
+    pending = []
+    size = 0
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        pending.append(part)
+        size += len(part)
+        if size >= chunk:
+            await _write_chunk(writer, b"".join(pending), chunked)
+            pending = []
+            size = 0
+    if pending:
+        await _write_chunk(writer, b"".join(pending), chunked)
+    if chunked:
+        writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+async def _write_chunk(writer, data, chunked):
+    if chunked:
+        writer.write("{:x}\r\n".format(len(data)).encode())
+        writer.write(data)
+        writer.write(b"\r\n")
+    else:
+        writer.write(data)
+    await writer.drain()
+
+
+class Admission:
+    """
+    同時執行的請求數上限：滿載時最多 max_waiting 個請求排隊等待 wait_sec 秒，
+    其餘直接拒絕；事件迴圈延遲超過預算時也拒絕新請求（回 503）
+
+    參數:
+        max_active: 同時執行的 handler 上限
+        max_waiting: 排隊上限
+        wait_sec: 排隊最長等待秒數
+        lag: looplag.LagMonitor（可省略）
+    """
+
+    def __init__(self, max_active=2, max_waiting=4, wait_sec=2, lag=None):
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.wait_sec = wait_sec
+        self.lag = lag
+        self.active = 0
+        self.waiting = 0
+        self.peak = 0           # 同時執行數的最大值
+        self.rejected = 0       # 滿載或排隊逾時而拒絕
+        self.shed = 0           # 迴圈延遲超過預算而拒絕
+        self._free = asyncio.Event()
+
+    async def acquire(self):
+        """返回: True 取得執行權（之後必須 release），False 應回 503"""
+        if self.lag is not None and self.lag.overloaded:
+            self.shed += 1
+            return False
+        if self.active >= self.max_active or self.waiting:
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                return False
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._wait_slot(), self.wait_sec)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return False
+            finally:
+                self.waiting -= 1
+        else:
+            self.active += 1
+        if self.active > self.peak:
+            self.peak = self.active
+        return True
+
+    async def _wait_slot(self):
+        while self.active >= self.max_active:
+            self._free.clear()
+            await self._free.wait()
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._free.set()
+
+
+class _DeadlineWriter:
+    """替 writer.drain() 加上期限，避免不讀取回應的客戶端占住 handler"""
+
+    def __init__(self, writer, timeout):
+        self._w = writer
+        self._timeout = timeout
+
+    def write(self, data):
+        self._w.write(data)
+
+    async def drain(self):
+        await asyncio.wait_for(self._w.drain(), self._timeout)
+
+
+class Router:
+    """路由表 {path: {method: handler}}，handler 簽章為 async handler(req, writer)"""
+
+    def __init__(self):
+        self.routes = {}
+        self.unmetered = set()  # 不受 Admission 限制的路徑（長時間連線，自行限制數量）
+        self.open = 0           # 目前開啟的連線數
+        self.peak_open = 0      # 同時開啟連線數的最大值
+        self.connections = 0    # 已接受的連線數
+        self.requests = 0       # 已處理的請求數
+        self.refused = 0        # 連線數滿載而拒絕
+        self.timeouts = 0       # 標頭或寫出逾時而中斷
+        self.max_body = MAX_BODY
+        self.observe = None     # 可選：observe(path, 微秒)，記錄 handler 耗時（不含長連線路徑）
+
+    def add(self, path, handler, methods=("GET",), admit=True):
+        """
+        參數:
+            admit: False 表示此路徑不經過 Admission（例如 SSE 長連線）
+        """
+        table = self.routes.setdefault(path, {})
+        for m in methods:
+            table[m] = handler
+        if not admit:
+            self.unmetered.add(path)
+
+    def find(self, req):
+        """
+        返回: handler；找不到路徑拋出 HttpError(404)，方法不符拋出 HttpError(405)
+        """
+        table = self.routes.get(req.path)
+        if table is None:
+            raise HttpError(404)
+        handler = table.get(req.method)
+        if handler is None and req.method == "HEAD":
+            handler = table.get("GET")
+        if handler is None:
+            raise HttpError(405)
+        return handler
+
+    async def serve(self, reader, writer, idle_timeout=5, max_requests=100,
+                    header_timeout=None, write_timeout=None, max_connections=None, admission=None):
+        """
+        處理一條連線上的請求（keep-alive），直到對方關閉、逾時或達到請求上限；
+        不負責關閉 writer
+
+        參數:
+            idle_timeout: 等待下一個請求第一行的秒數
+            max_requests: 單一連線最多處理的請求數
+            header_timeout: 收到第一行後，讀完標頭與內容的期限（None 同 idle_timeout）
+            write_timeout: 每次 drain 的期限（None 不限）
+            max_connections: 同時開啟的連線上限，超過直接回 503
+            admission: Admission，限制同時執行的 handler 數
+        """
+        if max_connections and self.open >= max_connections:
+            self.refused += 1
+            return await send(writer, 503, "Busy", "text/plain", {"Retry-After": "2"}, close=True)
+        self.open += 1
+        self.connections += 1
+        if self.open > self.peak_open:
+            self.peak_open = self.open
+        if write_timeout:
+            writer = _DeadlineWriter(writer, write_timeout)
+        try:
+            await self._serve(reader, writer, idle_timeout, max_requests,
+                              header_timeout or idle_timeout, admission)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+        finally:
+            self.open -= 1
+
+    async def _run(self, handler, req, writer):
+        if self.observe is None or req.path in self.unmetered:
+            return await handler(req, writer)
+        t0 = ticks_us()
+        try:
+            await handler(req, writer)
+        finally:
+            self.observe(req.path, ticks_diff(ticks_us(), t0))
+
+    async def _serve(self, reader, writer, idle_timeout, max_requests, header_timeout, admission):
+        reader = LineReader(reader)
+        served = 0
+        while served < max_requests:
+            try:
+                line = await asyncio.wait_for(reader.readline(), idle_timeout)
+            except asyncio.TimeoutError:
+                return
+            except HttpError as e:
+                return await send(writer, e.status, str(e), "text/plain", close=True)
+            try:
+                req = await asyncio.wait_for(read_request(reader, self.max_body, line), header_timeout)
+            except HttpError as e:
+                # 請求格式錯誤時無法確定下一個請求的起點 → 回應後關閉
+                return await send(writer, e.status, str(e), "text/plain", close=True)
+            if req is None:
+                return
+            served += 1
+            self.requests += 1
+            if served >= max_requests:
+                req.keep_alive = False
+            try:
+                handler = self.find(req)
+            except HttpError as e:
+                await reply(req, writer, e.status, str(e), "text/plain")
+            else:
+                if admission is None or req.path in self.unmetered:
+                    await self._run(handler, req, writer)
+                elif await admission.acquire():
+                    try:
+                        await self._run(handler, req, writer)
+                    finally:
+                        admission.release()
+                else:
+                    req.keep_alive = False
+                    await reply(req, writer, 503, "Busy", "text/plain", {"Retry-After": "2"})
+            if not req.keep_alive:
+                return
+
+
+class EventHub:
+    """
+    Server-Sent Events 推播：每種事件只保留最新一筆，連線較慢的客戶端會直接
+    拿到最新狀態（不會累積待送佇列）
+    """
+
+    def __init__(self, max_clients=4, ping_sec=15):
+        self.max_clients = max_clients
+        self.ping_sec = ping_sec
+        self.latest = {}        # 事件名稱 → (序號, 資料字串)
+        self.seq = 0
+        self.sent = 0           # 已送出的事件數
+        self._waiters = []      # 每個連線一個 Event
+
+    @property
+    def clients(self):
+        return len(self._waiters)
+
+    def publish(self, name, data):
+        """更新事件 name 的最新資料（字串），並喚醒所有連線"""
+        self.seq += 1
+        self.latest[name] = (self.seq, data)
+        for ev in self._waiters:
+            ev.set()
+
+    async def stream(self, req, writer):
+        """路由 handler：保持連線並持續推送事件，連線中斷時返回"""
+        req.keep_alive = False
+        if len(self._waiters) >= self.max_clients:
+            return await send(writer, 503, "Too many event streams", "text/plain", close=True)
+        writer.write(response_head(200, "text/event-stream", headers={"Cache-Control": "no-cache"}, close=True))
+        ev = asyncio.Event()
+        self._waiters.append(ev)
+        seen = 0
+        try:
+            while True:
+                ev.clear()
+                for name, (seq, data) in self.latest.items():
+                    if seq > seen:
+                        writer.write("event: {}\ndata: {}\n\n".format(name, data).encode())
+                        self.sent += 1
+                seen = self.seq
+                await writer.drain()
+                try:
+                    await asyncio.wait_for(ev.wait(), self.ping_sec)
+                except asyncio.TimeoutError:
+                    writer.write(b": ping\n\n")    # 註解行，讓中間設備與客戶端知道連線仍在
+        except OSError:
+            pass
+        finally:
+            self._waiters.remove(ev)
+
+
+class CachedBody:
+    """
+    依世代號快取序列化後的回應內容，並以世代號作為 ETag；
+    客戶端帶 If-None-Match 且相符時回 304（不送內容）
+
+    參數:
+        build: 無參數函式，返回回應內容（str 或 bytes）
+    """
+
+    def __init__(self, build, content_type="application/json"):
+        self.build = build
+        self.content_type = content_type
+        self.boot = "{:04x}".format(random.getrandbits(16))   # 重開機後世代號歸零，加上開機識別避免誤判
+        self.gen = None
+        self.etag = None
+        self.body = None
+        self.builds = 0
+        self.not_modified = 0
+
+    def get(self, gen):
+        """返回 (etag, body)；gen 與快取不同時才重新產生"""
+        if gen != self.gen:
+            body = self.build()
+            self.body = body.encode() if isinstance(body, str) else body
+            self.etag = '"{}-{}"'.format(self.boot, gen)
+            self.gen = gen
+            self.builds += 1
+        return self.etag, self.body
+
+    async def reply(self, req, writer, gen, headers=None):
+        etag, body = self.get(gen)
+        h = {"ETag": etag, "Cache-Control": "no-cache"}
+        if headers:
+            h.update(headers)
+        if req.headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            writer.write(response_head(304, headers=h, close=not req.keep_alive))
+            return await writer.drain()
+        await reply(req, writer, 200, body, self.content_type, h)
+
+
+class StaticFile:
+    """
+    靜態檔案：有 path + ".gz"（由 tools/build_assets.py 產生）且客戶端接受 gzip 時
+    送壓縮版；以預先配置的緩衝區 readinto 分塊傳送，附 Content-Length / ETag /
+    Cache-Control，ETag 相符時回 304
+
+    參數:
+        path: 檔案路徑
+        content_type: Content-Type
+        chunk: 緩衝區大小（bytes）
+    """
+
+    def __init__(self, path, content_type, chunk=1024):
+        self.path = path
+        self.content_type = content_type
+        self.buf = bytearray(chunk)
+        self.mv = memoryview(self.buf)
+        self.sent = 0           # 已送出的內容位元組
+        self.not_modified = 0
+
+    def _pick(self, req):
+        """返回 (實際檔案, 是否為 gzip, 大小, ETag)；檔案不存在時拋出 OSError"""
+        if 'gzip' in req.headers.get('accept-encoding', ''):
+            try:
+                st = os.stat(self.path + ".gz")
+                return self.path + ".gz", True, st[6], '"gz-{:x}-{:x}"'.format(st[6], st[8])
+            except OSError:
+                pass
+        st = os.stat(self.path)
+        return self.path, False, st[6], '"{:x}-{:x}"'.format(st[6], st[8])
+
+    async def handler(self, req, writer):
+        try:
+            path, gz, size, etag = self._pick(req)
+        except OSError:
+            return await reply(req, writer, 404, "Not Found", "text/plain")
+        # 同一份網址可能依 Accept-Encoding 回應不同內容，需加 Vary
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        if req.headers.get("if-none-match") == etag:
+            self.not_modified += 1
+            writer.write(response_head(304, headers=headers, close=not req.keep_alive))
+            return await writer.drain()
+        if gz:
+            headers["Content-Encoding"] = "gzip"
+        writer.write(response_head(200, self.content_type, size, headers, not req.keep_alive))
+        if req.method == "HEAD":
+            return await writer.drain()
+        buf, mv = self.buf, self.mv
+        with open(path, "rb") as f:
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                writer.write(mv[:n])     # write 會複製資料，緩衝區可立即重用
+                await writer.drain()
+                self.sent += n
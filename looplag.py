@@ -0,0 +1,61 @@
+"""
+looplag.py - 事件迴圈延遲量測
+定期 sleep 固定時間，量測實際醒來比預期晚多少（代表其他協程占住迴圈的時間），
+超過預算時讓 HTTP 等非即時工作暫停接單，保護鬧鐘、按鈕與音樂的時序
+"""
+
+import time
+
+try:
+    import uasyncio as asyncio
+    from time import ticks_ms, ticks_diff
+    sleep_ms = asyncio.sleep_ms
+except ImportError:
+    # 電腦端 CPython（tools/ 的模擬與壓力測試）
+    import asyncio
+
+    def ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+
+class LagMonitor:
+    """
+    參數:
+        interval_ms: 量測間隔
+        budget_ms: 延遲預算，超過即視為過載
+    """
+
+    def __init__(self, interval_ms=50, budget_ms=50):
+        self.interval_ms = interval_ms
+        self.budget_ms = budget_ms
+        self.lag_ms = 0          # 平滑後的延遲（上升立即反映，下降緩慢）
+        self.max_ms = 0          # 開機以來最大延遲
+        self.over_budget = 0     # 超過預算的次數
+        self.observe = None      # 可選：observe(lag_ms)，每次取樣呼叫（metrics 直方圖）
+
+    @property
+    def overloaded(self):
+        return self.lag_ms > self.budget_ms
+
+    def record(self, lag):
+        if lag < 0:
+            lag = 0
+        self.lag_ms = lag if lag > self.lag_ms else (self.lag_ms * 3 + lag) // 4
+        if lag > self.max_ms:
+            self.max_ms = lag
+        if lag > self.budget_ms:
+            self.over_budget += 1
+        if self.observe:
+            self.observe(lag)
+
+    async def run(self):
+        while True:
+            start = ticks_ms()
+            await sleep_ms(self.interval_ms)
+            self.record(ticks_diff(ticks_ms(), start) - self.interval_ms)
@@ -0,0 +1,268 @@
+"""
+metrics.py - 執行期指標（迴圈延遲、任務耗時、堆積記憶體、GC、MQTT、I2C）
+固定大小的直方圖，以 Prometheus 文字格式輸出；記錄時只做整數運算，不配置記憶體
+"""
+
+import gc
+import time
+
+try:
+    import uasyncio as asyncio
+    from time import ticks_us, ticks_ms, ticks_diff
+except ImportError:
+    # 電腦端 CPython（tools/ 的量測）
+    import asyncio
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_ms():
+        return int(time.perf_counter() * 1000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+# 直方圖桶上界（微秒），對外以毫秒表示
+BUCKETS_US = (500, 1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 500000, 1000000)
+
+PREFIX = "clock_"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+class Histogram:
+    """
+    固定桶數的直方圖；觀測值單位為微秒（int）
+    總和拆成毫秒 + 餘數微秒，長時間運行也維持小整數（MicroPython 超過 2^30 會改用大整數並配置記憶體）
+    """
+
+    def __init__(self, bounds=BUCKETS_US):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # 最後一格為 +Inf
+        self.count = 0
+        self.sum_ms = 0
+        self._sum_us = 0
+        self.max_us = 0
+
+    def observe(self, us):
+        i = 0
+        for b in self.bounds:
+            if us <= b:
+                break
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self._sum_us += us
+        if self._sum_us >= 1000:
+            self.sum_ms += self._sum_us // 1000
+            self._sum_us %= 1000
+        if us > self.max_us:
+            self.max_us = us
+
+    def quantile(self, q):
+        """
+        返回: 第 q 分位數所在桶的上界（微秒，不超過最大值）
+        """
+        if not self.count:
+            return 0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return min(self.bounds[i], self.max_us) if i < len(self.bounds) else self.max_us
+        return self.max_us
+
+
+class Timer:
+    """
+    以 with 計時並寫入直方圖（每個協程各用一個，不可重入）
+
+        with ui_timer:
+            show_ui()
+    """
+
+    def __init__(self, hist):
+        self.hist = hist
+        self.t0 = 0
+
+    def __enter__(self):
+        self.t0 = ticks_us()
+        return self
+
+    def __exit__(self, *exc):
+        self.hist.observe(ticks_diff(ticks_us(), self.t0))
+        return False
+
+
+def _fmt_ms(ms, us=0):
+    return "%d.%03d" % (ms + us // 1000, us % 1000)
+
+
+class Metrics:
+    """
+    指標登錄表：直方圖在啟動時建立（標籤集合固定），數值型指標在輸出時才讀取
+
+    熱路徑不另外計時自身成本：啟動時校準一次記錄的耗時，輸出時以「記錄次數 × 單次成本
+    + 記憶體取樣實耗」估算指標占用的時間
+
+    參數:
+        mem_interval_ms: 取樣 gc.mem_free / mem_alloc 的間隔
+            （兩者都要走訪整個配置表，不宜每次迴圈呼叫）
+    """
+
+    def __init__(self, mem_interval_ms=2000):
+        self.mem_interval_ms = mem_interval_ms
+        self.hists = {}          # 名稱 → (說明, 標籤名稱, {標籤值: Histogram})
+        self.values = []         # [(名稱, 說明, 類型, 讀值函式)]
+        self.started = ticks_ms()
+        self._spent_ms = 0       # 記憶體取樣實際花費的時間
+        self._spent_us = 0
+        self.record_us = 0       # 一次 Timer 記錄的成本（calibrate 量測）
+
+        # 記憶體與 GC（MicroPython 沒有 GC 事件可掛，以 mem_alloc 下降推斷發生過回收）
+        self.mem_free = 0
+        self.mem_alloc = 0
+        self.mem_free_min = 0
+        self.gc_observed = 0
+        self._lag_window = 0     # 本次記憶體取樣區間內的最大迴圈延遲
+        self.lag = self.histogram("loop_lag_ms", "事件迴圈延遲")
+        self.gc_pause = self.histogram("gc_pause_ms", "發生回收的取樣區間內最大迴圈延遲（GC 暫停上限估計）")
+
+        self.value("heap_free_bytes", "gc.mem_free()", lambda: self.mem_free)
+        self.value("heap_alloc_bytes", "gc.mem_alloc()", lambda: self.mem_alloc)
+        self.value("heap_free_min_bytes", "開機以來最少可用記憶體", lambda: self.mem_free_min)
+        self.value("gc_collections_observed_total", "觀察到的 GC 次數（下限）", lambda: self.gc_observed, "counter")
+        self.value("uptime_seconds", "開機秒數", lambda: ticks_diff(ticks_ms(), self.started) // 1000)
+        self.value("metrics_overhead_ratio", "指標本身耗時占運行時間的比例（估計）", self.overhead_ratio)
+        self.calibrate()
+
+    # ==================== 登錄 ====================
+
+    def histogram(self, name, help, label=None, value=None):
+        """
+        建立（或取得）直方圖
+
+        參數:
+            label / value: 標籤名稱與值，例如 ("task", "ui_display")
+        """
+        entry = self.hists.get(name)
+        if entry is None:
+            entry = self.hists[name] = (help, label, {})
+        h = entry[2].get(value)
+        if h is None:
+            h = entry[2][value] = Histogram()
+        return h
+
+    def timer(self, name, help, label=None, value=None):
+        return Timer(self.histogram(name, help, label, value))
+
+    def value(self, name, help, read, kind="gauge"):
+        """登錄輸出時才讀取的數值（gauge / counter）"""
+        self.values.append((name, help, kind, read))
+
+    # ==================== 記錄 ====================
+
+    def spent(self, us):
+        self._spent_us += us
+        if self._spent_us >= 1000:
+            self._spent_ms += self._spent_us // 1000
+            self._spent_us %= 1000
+
+    def observe(self, hist, us):
+        hist.observe(us)
+
+    def observer(self, name, help, label):
+        """
+        返回: observe(標籤值, 微秒) 函式，供 Router / MqttManager 等模組掛勾
+        （標籤值應來自固定集合，例如已登錄的路由路徑）
+        """
+        def observe(value, us):
+            self.observe(self.histogram(name, help, label, value), us)
+        return observe
+
+    def on_lag(self, lag_ms):
+        """LagMonitor.observe 掛勾：每次迴圈延遲取樣"""
+        self.lag.observe(lag_ms * 1000)
+        if lag_ms > self._lag_window:
+            self._lag_window = lag_ms
+
+    def sample_memory(self):
+        t = ticks_us()
+        alloc = gc.mem_alloc()
+        free = gc.mem_free()
+        if alloc < self.mem_alloc:
+            self.gc_observed += 1
+            self.gc_pause.observe(self._lag_window * 1000)
+        self._lag_window = 0
+        self.mem_alloc = alloc
+        self.mem_free = free
+        if free < self.mem_free_min or not self.mem_free_min:
+            self.mem_free_min = free
+        self.spent(ticks_diff(ticks_us(), t))
+
+    async def run(self):
+        if not hasattr(gc, "mem_alloc"):
+            return              # CPython 沒有 MicroPython 的堆積統計
+        while True:
+            self.sample_memory()
+            await asyncio.sleep_ms(self.mem_interval_ms)
+
+    def calibrate(self, n=200):
+        """量測一次 Timer 記錄（進出 + observe）的平均耗時"""
+        t = Timer(Histogram())
+        t0 = ticks_us()
+        for _ in range(n):
+            with t:
+                pass
+        self.record_us = ticks_diff(ticks_us(), t0) / n
+
+    def records(self):
+        return sum(h.count for entry in self.hists.values() for h in entry[2].values())
+
+    def overhead_ratio(self):
+        up = ticks_diff(ticks_ms(), self.started)
+        spent = self.records() * self.record_us / 1000 + self._spent_ms + self._spent_us / 1000
+        return spent / up if up > 0 else 0
+
+    # ==================== 輸出 ====================
+
+    def prometheus(self):
+        """
+        逐段產生 Prometheus 文字格式（可直接交給 http_server.send_chunked）
+        """
+        for name, help, kind, read in self.values:
+            n = PREFIX + name
+            v = read()
+            yield "# HELP %s %s\n# TYPE %s %s\n%s %s\n" % (
+                n, help, n, kind, n, ("%.6f" % v) if isinstance(v, float) else v)
+        for name, (help, label, series) in self.hists.items():
+            n = PREFIX + name
+            yield "# HELP %s %s\n# TYPE %s histogram\n" % (n, help, n)
+            for value, h in series.items():
+                lbl = '%s="%s",' % (label, value) if label else ""
+                out = []
+                seen = 0
+                for i, c in enumerate(h.counts):
+                    seen += c
+                    le = "%g" % (h.bounds[i] / 1000) if i < len(h.bounds) else "+Inf"
+                    out.append('%s_bucket{%sle="%s"} %d\n' % (n, lbl, le, seen))
+                lbl = "{" + lbl[:-1] + "}" if lbl else ""
+                out.append("%s_sum%s %s\n%s_count%s %d\n" % (n, lbl, _fmt_ms(h.sum_ms, h._sum_us), n, lbl, h.count))
+                yield "".join(out)
+
+    def summary(self):
+        """
+        精簡摘要（MQTT 發佈用）
+
+        返回: {"heap": [free, alloc, free_min], "gc": 次數, "overhead": 比例,
+               "名稱[:標籤]": [count, p50_ms, p99_ms, max_ms], ...}
+        """
+        out = {"heap": [self.mem_free, self.mem_alloc, self.mem_free_min],
+               "gc": self.gc_observed,
+               "overhead": round(self.overhead_ratio(), 5)}
+        for name, (_, label, series) in self.hists.items():
+            for value, h in series.items():
+                if h.count:
+                    key = name + ":" + value if label else name
+                    out[key] = [h.count, h.quantile(0.5) / 1000, h.quantile(0.99) / 1000, h.max_us / 1000]
+        return out
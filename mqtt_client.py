@@ -3,8 +3,17 @@ communication/mqtt_client.py - MQTT 客戶端管理（修正版 v1.1.2）
 基於 mqtt_as 庫
 """
 
+import gc
+import time
+import random
+import hashlib
+import binascii
 import uasyncio
 from mqtt_as import MQTTClient, config as mqtt_config
+from mqtt_queue import PublishQueue
+from mqtt_router import TopicRouter
+from mqtt_workers import WorkerPool
+from codec import get_codec, unix_time
 
 
 class MqttManager:
@@ -13,55 +22,211 @@ class MqttManager:
         self.password = password
         self.broker = broker
         
-        # 1. 新增這個變數來存放外部函式
+        # 1. 新增這個變數來存放外部函式（未被路由器匹配的訊息才會交給它）
         self.external_handler = None
         
+        # 主題路由器：依過濾器分派收到的訊息
+        self.router = TopicRouter()
+        
         # MQTT 配置
         mqtt_config['ssid'] = ssid
         mqtt_config['wifi_pw'] = password
         mqtt_config['server'] = broker
         mqtt_config['subs_cb'] = self.on_message
         mqtt_config['connect_coro'] = self.on_connected
+        mqtt_config['wifi_coro'] = self.on_conn_state
         
         # (解決衝突關鍵) 使用隨機或唯一的 Client ID
         import config
         mqtt_config['client_id'] = config.DEVICE_ID
+        
+        # TLS：憑證只在初始化時讀取一次，之後每次重連沿用記憶體中的 ssl_params
+        self._pin = None
+        self._pinned = None         # 本次連線的指紋比對結果：None 尚未比對（每次重連前清除），只有 True 才接收訊息
+        if config.MQTT_TLS:
+            self._setup_tls(config)
 
         self._connected = False
         self._connected_event = uasyncio.Event()
+        self._lost_event = uasyncio.Event()
+
+        # 依主題選擇編碼方式
+        self.device_id = config.DEVICE_ID
+        self._codec_default = get_codec(config.MQTT_CODEC_DEFAULT)
+        self._codecs = {t: get_codec(n) for t, n in config.MQTT_TOPIC_CODECS.items()}
+        self._seq = 0
+
+        # 訂閱登錄表 {topic(bytes): qos}，每次連線成功後一次性重新訂閱
+        self._subs = {}
+
+        # 重連退避參數與統計
+        self._backoff_initial = config.MQTT_RECONNECT_INITIAL_DELAY_SEC
+        self._backoff_max = config.MQTT_RECONNECT_MAX_DELAY_SEC
+        self._backoff_factor = config.MQTT_RECONNECT_BACKOFF_FACTOR
+        self.connect_attempts = 0
+        self.reconnects = 0
+        self.last_connect_ms = 0
+        self.last_connect_heap = 0
+        self.pin_failures = 0
+        self.unverified_dropped = 0
+
+        # 離線發佈佇列：斷線期間暫存，重連後分批補發
+        self.queue = PublishQueue(
+            config.MQTT_QUEUE_SIZE,
+            config.MQTT_QUEUE_POLICY,
+            config.MQTT_QUEUE_SPILL_FILE,
+            config.MQTT_QUEUE_SPILL_SLOTS,
+            config.MQTT_QUEUE_SLOT_SIZE,
+        )
+        self._drain_batch = config.MQTT_DRAIN_BATCH
+        self._drain_interval_ms = config.MQTT_DRAIN_INTERVAL_MS
+        self._draining = False
+        self.drained = 0
+        
+        # QoS 1 發佈視窗：同時等待 PUBACK 的訊息上限
+        self._window = config.MQTT_PUB_WINDOW
+        self._window_free = uasyncio.Event()
+        self._inflight = {}      # 追蹤編號 → (topic, 送出時間)
+        self._tag = 0
+        self.pub_completed = 0
+        self.pub_failed = 0
+        self.max_inflight = 0
+        self.observe_publish = None   # 可選：observe_publish(微秒)，成功發佈的耗時（metrics 直方圖）
+        
+        # 收訊工作池：處理器在獨立協程中執行，不阻塞 mqtt_as 接收迴圈
+        self.workers = WorkerPool(
+            self.router,
+            config.MQTT_HANDLER_WORKERS,
+            config.MQTT_HANDLER_QUEUE_SIZE,
+            config.MQTT_HANDLER_POLICY,
+        )
+        self._handler_wait_ms = config.MQTT_HANDLER_WAIT_MS
         self.client = MQTTClient(mqtt_config)
         print("[MQTT] 客戶端已初始化")
     
     
-    async def connect(self):
+    def _setup_tls(self, config):
+        """
+        設定 mqtt_as 的 TLS 參數
+        
+        MQTT_TLS_FINGERPRINT 有設定時採用憑證指紋釘選（不載入 CA 鏈，省下解析時間與記憶體），
+        否則以 MQTT_TLS_CA_FILE（DER 格式）驗證伺服器憑證
+        """
+        import ssl
+        params = {'server_hostname': self.broker}
+        if config.MQTT_TLS_FINGERPRINT:
+            self._pin = binascii.unhexlify(config.MQTT_TLS_FINGERPRINT.replace(':', ''))
+            params['cert_reqs'] = ssl.CERT_NONE
+        elif config.MQTT_TLS_CA_FILE:
+            with open(config.MQTT_TLS_CA_FILE, 'rb') as f:
+                params['cadata'] = f.read()
+            params['cert_reqs'] = ssl.CERT_REQUIRED
+        mqtt_config['ssl'] = True
+        mqtt_config['ssl_params'] = params
+        mqtt_config['port'] = config.MQTT_TLS_PORT
+    
+    
+    def _check_pin(self, client):
+        """比對伺服器憑證的 SHA-256 指紋"""
+        if self._pin is None:
+            return True
+        try:
+            # mqtt_as 未公開 socket，直接取用 TLS 包裝後的 _sock
+            der = client._sock.getpeercert(True)
+            return hashlib.sha256(der).digest() == self._pin
+        except Exception as e:
+            print(f"[MQTT] 無法取得伺服器憑證: {e}")
+            return False
+    
+    
+    def _verify_peer(self, client):
+        """
+        比對指紋並設定 _pinned；不符時計數（呼叫端負責中斷連線）
+        
+        返回: True 通過（或未設定指紋），False 不符
+        """
+        self._pinned = self._check_pin(client)
+        if not self._pinned:
+            self.pin_failures += 1
+            print("[MQTT] 伺服器憑證指紋不符，中斷連線")
+        return self._pinned
+    
+    
+    async def connect(self, timeout_sec=10):
         """
-        連線到 MQTT Broker
+        連線到 MQTT Broker（單次嘗試）
+        
+        參數:
+            timeout_sec: 等待 connect_coro 完成的超時時間（秒）
         
         返回: True 連線成功，False 連線失敗
         """
         try:
             print(f"[MQTT] 嘗試連線到 {self.broker}...")
+            self.connect_attempts += 1
+            gc.collect()
+            heap_before = gc.mem_free()
+            start = time.ticks_ms()
+            self._pinned = None
             
-            # 連線到 MQTT
+            # 連線到 MQTT（含 TLS 握手）
             await self.client.connect()
+            # connect() 返回時 mqtt_as 的收訊 task 已建立，下一次 await 就可能派送訊息：
+            # 在讓出控制權之前比對指紋（connect_coro 已先比對過則沿用結果）
+            if self._pinned is None:
+                self._verify_peer(self.client)
+            if not self._pinned:
+                await self.client.disconnect()
+                return False
+            self.last_connect_heap = heap_before - gc.mem_free()
             
-            # 等待 connected_coro 完成
-            await uasyncio.sleep(2)
+            # 等待 connect_coro 完成（重新訂閱後才算連線成功）
+            if not await self.wait_connected(timeout_sec):
+                return False
             
-            if self._connected:
-                print(f"[MQTT] 已連線到 {self.broker}")
-                return True
-            else:
-                print("[MQTT] 連線初始化完成，但狀態不確定")
-                return True
+            self.last_connect_ms = time.ticks_diff(time.ticks_ms(), start)
+            print(f"[MQTT] 已連線到 {self.broker} ({self.last_connect_ms} ms)")
+            return True
         
         except Exception as e:
             print(f"[MQTT] 連線失敗: {e}")
-            import traceback
-            traceback.print_exc()
             return False
     
     
+    async def run(self):
+        """
+        重連監督協程（請以 create_task 啟動）
+        
+        連線失敗時以帶抖動的指數退避重試：
+        延遲從 MQTT_RECONNECT_INITIAL_DELAY_SEC 起，每次乘上
+        MQTT_RECONNECT_BACKOFF_FACTOR，上限 MQTT_RECONNECT_MAX_DELAY_SEC，
+        實際等待時間在 [0.5, 1.5) 倍之間隨機，避免多台裝置同時湧入 Broker。
+        連線中斷時由本協程接手，停止 mqtt_as 內建的固定間隔重連。
+        """
+        self.workers.start()
+        delay = self._backoff_initial
+        while True:
+            if self._connected:
+                self._lost_event.clear()
+                await self._lost_event.wait()
+                # 關閉 mqtt_as 內建的重連迴圈，改用退避策略
+                try:
+                    await self.client.disconnect()
+                except Exception:
+                    pass
+                self.reconnects += 1
+                delay = self._backoff_initial
+            
+            if await self.connect():
+                delay = self._backoff_initial
+                continue
+            
+            wait = delay * (0.5 + random.getrandbits(8) / 256)
+            print(f"[MQTT] {wait:.1f} 秒後重試")
+            await uasyncio.sleep(wait)
+            delay = min(delay * self._backoff_factor, self._backoff_max)
+    
+    
     async def wait_connected(self, timeout_sec=30):
         """
         等待 MQTT 已連線
@@ -79,49 +244,247 @@ class MqttManager:
             return False
     
     
-    async def publish(self, topic, message, qos=0):
+    def set_codec(self, topic, name):
+        """
+        指定主題的編碼方式（raw / json / json_env / cbor / struct）
+        """
+        if isinstance(topic, str):
+            topic = topic.encode()
+        self._codecs[topic] = get_codec(name)
+    
+    
+    def codec_for(self, topic):
+        if isinstance(topic, str):
+            topic = topic.encode()
+        return self._codecs.get(topic, self._codec_default)
+    
+    
+    def encode(self, topic, body, codec=None):
+        """
+        依主題編碼內容，附上裝置 ID、序號與時間戳
+        
+        返回: bytes
+        """
+        self._seq += 1
+        return (codec or self.codec_for(topic)).encode(body, self.device_id, self._seq, unix_time())
+    
+    
+    def decode(self, topic, payload):
+        """
+        依主題解碼內容
+        
+        返回: (body, meta)，meta 為 {v, dev, seq, ts}（raw/純 JSON 時為空 dict）
+        """
+        return self.codec_for(topic).decode(payload)
+    
+    
+    async def publish(self, topic, message, qos=0, retain=False, codec=None):
         """
         發佈 MQTT 訊息
         
+        斷線中或佇列尚有待補發訊息時，改為放入離線佇列（維持發佈順序）
+        
         參數:
             topic: 主題（str 或 bytes）
-            message: 訊息內容（str 或 bytes）
+            message: 訊息內容；str/bytes 原樣送出，其他型別依主題的編碼方式編碼
             qos: QoS 級別（0 或 1）
+            retain: 是否保留訊息
+            codec: 指定編碼器（覆寫主題設定）
         
-        返回: True 發佈成功，False 失敗
+        返回: True 已發佈或已排入佇列，False 失敗（佇列滿載被丟棄）
         """
+        # 確保 topic 和 message 是正確的格式
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if isinstance(message, str):
+            message = message.encode()
+        elif not isinstance(message, bytes):
+            message = self.encode(topic, message, codec)
+        
+        if not self._connected or len(self.queue) or self._draining:
+            return self._enqueue(topic, message, qos, retain)
+        
         try:
-            # 確保 topic 和 message 是正確的格式
-            if isinstance(topic, str):
-                topic = topic.encode()
-            if isinstance(message, str):
-                message = message.encode()
-            
-            await self.client.publish(topic, message, qos=qos)
-            print(f"[MQTT] 已發佈: {topic.decode() if isinstance(topic, bytes) else topic}")
+            start = time.ticks_us()
+            await self.client.publish(topic, message, retain, qos)
+            if self.observe_publish:
+                self.observe_publish(time.ticks_diff(time.ticks_us(), start))
+            print(f"[MQTT] 已發佈: {topic.decode()}")
             return True
         
         except Exception as e:
             print(f"[MQTT] 發佈失敗: {e}")
+            return self._enqueue(topic, message, qos, retain)
+    
+    
+    def publish_nowait(self, topic, message, qos=1, retain=False, codec=None):
+        """
+        在 QoS 1 視窗內發佈，不等待 PUBACK
+        
+        視窗已滿時，回傳的 Task 會先等待空位；PUBACK 逾時由 mqtt_as 以 DUP 重送
+        （依其 response_time 判定連線中斷並重連），發佈拋出例外時放回離線佇列
+        
+        返回: Task，await 後得到 True（已確認）或 False（已轉入佇列或丟棄）
+        """
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if isinstance(message, str):
+            message = message.encode()
+        elif not isinstance(message, bytes):
+            message = self.encode(topic, message, codec)
+        return uasyncio.create_task(self._windowed_publish(topic, message, qos, retain))
+    
+    
+    async def publish_many(self, items, qos=1):
+        """
+        批次發佈並填滿 QoS 1 視窗
+        
+        參數:
+            items: [(topic, message), ...] 或 [(topic, message, qos, retain), ...]
+        
+        返回: 與 items 對應的結果 list（True / False）
+        """
+        tasks = []
+        for item in items:
+            if len(item) == 2:
+                tasks.append(self.publish_nowait(item[0], item[1], qos))
+            else:
+                tasks.append(self.publish_nowait(item[0], item[1], item[2], item[3]))
+        return await uasyncio.gather(*tasks)
+    
+    
+    async def _windowed_publish(self, topic, message, qos, retain, requeue=True):
+        """
+        參數:
+            requeue: 失敗時是否放回離線佇列（補發佇列中的訊息時為 False，訊息仍留在佇列開頭）
+        """
+        while len(self._inflight) >= self._window:
+            self._window_free.clear()
+            await self._window_free.wait()
+        if not self._connected:
+            if requeue:
+                self._enqueue(topic, message, qos, retain)
+            return False
+        
+        self._tag += 1
+        tag = self._tag
+        self._inflight[tag] = (topic, time.ticks_ms())
+        if len(self._inflight) > self.max_inflight:
+            self.max_inflight = len(self._inflight)
+        try:
+            # 不以 wait_for 取消：mqtt_as 發佈途中持有客戶端鎖，中途取消會留下寫到一半的封包
+            await self.client.publish(topic, message, retain, qos)
+            self.pub_completed += 1
+            if self.observe_publish:
+                self.observe_publish(time.ticks_diff(time.ticks_ms(), self._inflight[tag][1]) * 1000)
+            return True
+        except Exception as e:
+            self.pub_failed += 1
+            print(f"[MQTT] 發佈失敗: {topic.decode()} {e}")
+            if requeue:
+                self._enqueue(topic, message, qos, retain)
             return False
+        finally:
+            del self._inflight[tag]
+            self._window_free.set()
+    
+    
+    def pub_stats(self):
+        """
+        取得 QoS 1 視窗統計
+        
+        返回: dict（window, inflight, max_inflight, completed, failed）
+        """
+        return {
+            'window': self._window,
+            'inflight': len(self._inflight),
+            'max_inflight': self.max_inflight,
+            'completed': self.pub_completed,
+            'failed': self.pub_failed,
+        }
+    
+    
+    def _enqueue(self, topic, message, qos, retain):
+        ok = self.queue.push(topic, message, qos, retain)
+        if not ok:
+            print(f"[MQTT] 佇列已滿，丟棄: {topic.decode()}")
+        if self._connected:
+            self._start_drain()
+        return ok
+    
+    
+    def _start_drain(self):
+        if not self._draining and len(self.queue):
+            self._draining = True
+            uasyncio.create_task(self._drain())
+    
+    
+    async def _drain(self):
+        """
+        重連後分批補發佇列中的訊息（每批 MQTT_DRAIN_BATCH 筆，批次間休息）
+        
+        每批先只讀取不出列，透過 QoS 1 視窗並行發佈，確認後才從開頭依序出列；
+        遇到第一筆失敗即停止，它與之後的訊息留在原位等下次重連（維持先進先出，
+        Flash 溢出區的訊息在確認前重開機也不會遺失；之後已確認的訊息可能重送一次）
+        """
+        try:
+            while self._connected and len(self.queue):
+                batch = self.queue.peek_many(self._drain_batch)
+                results = await uasyncio.gather(*[
+                    uasyncio.create_task(self._windowed_publish(t, m, q, r, False)) for t, m, q, r in batch])
+                done = 0
+                for item, ok in zip(batch, results):
+                    if not ok:
+                        break
+                    # 發佈期間 DROP_OLDEST 可能已擠掉開頭，只出列仍在開頭的同一筆
+                    if self.queue.peek() == item:
+                        self.queue.pop()
+                    done += 1
+                self.drained += done
+                if done < len(batch):
+                    break
+                await uasyncio.sleep_ms(self._drain_interval_ms)
+            print(f"[MQTT] 佇列補發結束，剩餘 {len(self.queue)} 筆")
+        except Exception as e:
+            print(f"[MQTT] 佇列補發失敗: {e}")
+        finally:
+            self._draining = False
+    
+    
+    def queue_stats(self):
+        """
+        取得離線佇列統計
+        
+        返回: dict（depth, ram_depth, flash_depth, high_water, overflow, drained）
+        """
+        stats = self.queue.stats()
+        stats['drained'] = self.drained
+        return stats
     
     
     async def subscribe(self, topic, qos=0, callback=None):
         """
         訂閱 MQTT 主題
         
+        主題會記錄在訂閱登錄表中，每次（重新）連線後自動重新訂閱；
+        尚未連線時只登錄，等連線成功再訂閱
+        
         參數:
             topic: 主題（str 或 bytes）
             qos: QoS 級別（0 或 1）
             callback: 訂閱回調函數（可選）
         
-        返回: True 訂閱成功，False 失敗
+        返回: True 訂閱成功（或已登錄），False 失敗
         """
+        # 確保 topic 是正確的格式
+        if isinstance(topic, str):
+            topic = topic.encode()
+        self._subs[topic] = qos
+        
+        if not self._connected:
+            return True
+        
         try:
-            # 確保 topic 是正確的格式
-            if isinstance(topic, str):
-                topic = topic.encode()
-            
             await self.client.subscribe(topic, qos=qos)
             print(f"[MQTT] 已訂閱: {topic.decode() if isinstance(topic, bytes) else topic}")
             return True
@@ -145,26 +508,72 @@ class MqttManager:
     
     async def on_connected(self, client):
         """
-        MQTT 連線成功回調
+        MQTT 連線成功回調：一次性重新訂閱登錄表中的所有主題
         """
+        if self._pinned is None:
+            # mqtt_as 自行重連時不會經過 connect()，在這裡補做比對
+            if not self._verify_peer(client):
+                await client.disconnect()
+        if not self._pinned:
+            return
+        
+        for topic, qos in self._subs.items():
+            try:
+                await client.subscribe(topic, qos)
+            except Exception as e:
+                print(f"[MQTT] 重新訂閱失敗 {topic.decode()}: {e}")
+        
         self._connected = True
         self._connected_event.set()
-        print("[MQTT] 已連線成功")
+        print(f"[MQTT] 已連線成功，已訂閱 {len(self._subs)} 個主題")
+        self._start_drain()
     
     
-    async def on_message(self, topic, msg, retained, properties=None):
+    async def on_conn_state(self, state):
         """
-        MQTT 訊息接收回調
+        mqtt_as 連線狀態變化回調（wifi_coro），斷線時改由佇列暫存
         """
-        msg_str = msg.decode() if isinstance(msg, bytes) else msg
-        topic_str = topic.decode() if isinstance(topic, bytes) else topic
+        if not state:
+            self._pinned = None
+        if not state and self._connected:
+            self._connected = False
+            self._connected_event.clear()
+            self._lost_event.set()
+            print("[MQTT] 連線中斷")
+    
+    
+    def route(self, topic_filter, handler, decode=False):
+        """
+        註冊主題處理器（不會自動訂閱，請另外呼叫 subscribe）
         
-        # 印出來，這樣我們才知道有沒有收到！
-        print(f"[MQTT IN] 收到: {topic_str} = {msg_str}")
+        參數:
+            topic_filter: 主題過濾器（str 或 bytes），可含 + 與 #
+            handler: handler(topic, msg, retained)，可為 async 函式
+            decode: True 時以 str 傳入，否則直接傳入原始 bytes
+        """
+        self.router.add(topic_filter, handler, decode)
+    
+    
+    async def on_message(self, topic, msg, retained, properties=None):
+        """
+        MQTT 訊息接收回調：匹配後排入工作池（滿載時最多等待 MQTT_HANDLER_WAIT_MS），沒有處理器的主題直接丟棄
         
-        # 2. 關鍵修改：如果有設定外部處理器，就執行它
+        本次連線尚未通過憑證指紋比對時一律丟棄
+        """
+        if self._pinned is not True:
+            self.unverified_dropped += 1
+            return
+        entries = self.router.match(topic)
+        if entries:
+            self.router.dispatched += 1
+            await self.workers.put(entries, topic, msg, retained, self._handler_wait_ms)
+            return
+        self.router.unmatched += 1
         if self.external_handler:
-            await self.external_handler(topic, msg, retained, properties)
+            try:
+                await self.external_handler(topic, msg, retained, properties)
+            except Exception as e:
+                print(f"[MQTT] 訊息處理失敗: {e}")
     
     
     def is_connected(self):
@@ -174,4 +583,22 @@ class MqttManager:
         返回: True 已連線，False 未連線
         """
         return self._connected
+    
+    
+    def conn_stats(self):
+        """
+        取得連線統計
+        
+        返回: dict（connected, attempts, reconnects, last_connect_ms, subs）
+        """
+        return {
+            'connected': self._connected,
+            'attempts': self.connect_attempts,
+            'reconnects': self.reconnects,
+            'last_connect_ms': self.last_connect_ms,
+            'last_connect_heap': self.last_connect_heap,
+            'pin_failures': self.pin_failures,
+            'unverified_dropped': self.unverified_dropped,
+            'subs': len(self._subs),
+        }
 
@@ -0,0 +1,177 @@
+"""
+mqtt_queue.py - 離線發佈佇列
+斷線期間暫存待發佈訊息，RAM 環形緩衝區滿載時可溢出到 Flash 環形檔
+"""
+
+import struct
+from ringbuf import RingBuffer, DROP_OLDEST, DROP_NEWEST
+
+
+# 檔案開頭的中繼資料：head, count
+_META_FMT = '<HH'
+_META_SIZE = struct.calcsize(_META_FMT)
+
+# 每個槽位的記錄標頭：qos, retain, topic 長度, 訊息長度
+_REC_FMT = '<BBHH'
+_REC_SIZE = struct.calcsize(_REC_FMT)
+
+
+class FileRing:
+    """
+    Flash 上的固定槽位環形檔
+
+    每筆記錄佔一個 slot_size 大小的槽位，重開機後可從中繼資料接續
+    """
+
+    def __init__(self, path, slots, slot_size=128):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.overflow = 0
+        self._head = 0
+        self._count = 0
+        self._open()
+
+    def _open(self):
+        try:
+            with open(self.path, 'rb') as f:
+                head, count = struct.unpack(_META_FMT, f.read(_META_SIZE))
+            if head < self.slots and count <= self.slots:
+                self._head, self._count = head, count
+                return
+        except (OSError, ValueError):
+            pass
+        # 檔案不存在或損毀 → 重新建立
+        with open(self.path, 'wb') as f:
+            f.write(struct.pack(_META_FMT, 0, 0))
+        self._head, self._count = 0, 0
+
+    def _write_meta(self, f):
+        f.seek(0)
+        f.write(struct.pack(_META_FMT, self._head, self._count))
+
+    def __len__(self):
+        return self._count
+
+    def is_full(self):
+        return self._count == self.slots
+
+    def fits(self, topic, msg):
+        return _REC_SIZE + len(topic) + len(msg) <= self.slot_size
+
+    def push(self, item):
+        """
+        寫入一筆記錄
+
+        返回: True 已寫入，False 槽位已滿或記錄過大
+        """
+        topic, msg, qos, retain = item
+        if self._count == self.slots or not self.fits(topic, msg):
+            self.overflow += 1
+            return False
+        pos = (self._head + self._count) % self.slots
+        with open(self.path, 'r+b') as f:
+            f.seek(_META_SIZE + pos * self.slot_size)
+            f.write(struct.pack(_REC_FMT, qos, 1 if retain else 0, len(topic), len(msg)))
+            f.write(topic)
+            f.write(msg)
+            self._count += 1
+            self._write_meta(f)
+        return True
+
+    def peek(self):
+        items = self.peek_many(1)
+        return items[0] if items else None
+
+    def peek_many(self, n):
+        """由舊到新讀出最多 n 筆但不移除"""
+        items = []
+        if not self._count:
+            return items
+        with open(self.path, 'rb') as f:
+            for k in range(min(n, self._count)):
+                f.seek(_META_SIZE + (self._head + k) % self.slots * self.slot_size)
+                qos, retain, tlen, mlen = struct.unpack(_REC_FMT, f.read(_REC_SIZE))
+                topic = f.read(tlen)
+                msg = f.read(mlen)
+                items.append((topic, msg, qos, bool(retain)))
+        return items
+
+    def pop(self):
+        item = self.peek()
+        if item is None:
+            return None
+        self._head = (self._head + 1) % self.slots
+        self._count -= 1
+        with open(self.path, 'r+b') as f:
+            self._write_meta(f)
+        return item
+
+
+class PublishQueue:
+    """
+    待發佈訊息佇列（先進先出）
+
+    順序保證：一旦 Flash 溢出區有資料，新訊息一律排在 Flash 之後，
+    直到溢出區清空為止；出列時先取 RAM 再取 Flash。
+    """
+
+    def __init__(self, capacity, policy=DROP_OLDEST, spill_path=None, spill_slots=0, slot_size=128):
+        self.policy = policy
+        self.ram = RingBuffer(capacity, policy)
+        self.spill = FileRing(spill_path, spill_slots, slot_size) if spill_path else None
+
+    def __len__(self):
+        return len(self.ram) + (len(self.spill) if self.spill is not None else 0)
+
+    def push(self, topic, msg, qos=0, retain=False):
+        """
+        放入一筆待發佈訊息（topic/msg 需為 bytes）
+
+        返回: True 已保存，False 因滿載（或溢出區有資料時訊息超過槽大小）被丟棄
+        """
+        item = (topic, msg, qos, retain)
+        spill = self.spill
+        if spill is not None and len(spill) and not spill.fits(topic, msg):
+            # 放進 RAM 會插隊到 Flash 裡較舊的訊息之前（DROP_OLDEST 還會擠掉一筆），只能丟棄
+            spill.overflow += 1
+            return False
+        if spill is not None and (self.ram.is_full() or len(spill)) and spill.fits(topic, msg):
+            if spill.is_full():
+                if self.policy == DROP_NEWEST:
+                    spill.overflow += 1
+                    return False
+                # DROP_OLDEST：丟掉全域最舊的一筆（RAM 開頭），Flash 開頭補進 RAM
+                if self.ram.is_full():
+                    self.ram.pop()
+                    self.ram.overflow += 1
+                self.ram.push(spill.pop())
+            return spill.push(item)
+        return self.ram.push(item) is not item
+
+    def peek(self):
+        if len(self.ram):
+            return self.ram.peek()
+        return self.spill.peek() if self.spill is not None else None
+
+    def peek_many(self, n):
+        """依出列順序（先 RAM 再 Flash）取得最多 n 筆但不移除"""
+        items = self.ram.peek_many(n)
+        if self.spill is not None and len(items) < n:
+            items += self.spill.peek_many(n - len(items))
+        return items
+
+    def pop(self):
+        if len(self.ram):
+            return self.ram.pop()
+        return self.spill.pop() if self.spill is not None else None
+
+    def stats(self):
+        """回傳佇列深度與溢位計數器"""
+        return {
+            'depth': len(self),
+            'ram_depth': len(self.ram),
+            'flash_depth': len(self.spill) if self.spill is not None else 0,
+            'high_water': self.ram.high_water,
+            'overflow': self.ram.overflow + (self.spill.overflow if self.spill is not None else 0),
+        }
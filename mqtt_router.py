@@ -0,0 +1,131 @@
+"""
+mqtt_router.py - MQTT 主題路由器
+以主題樹（trie）預先編譯訂閱過濾器，支援 + / # 萬用字元
+"""
+
+# 節點結構：[子節點 dict, 本層處理器 list, '#' 處理器 list]
+_CHILDREN = 0
+_HANDLERS = 1
+_MULTI = 2
+
+_PLUS = b'+'
+_HASH = b'#'
+_SEP = b'/'
+
+
+def _new_node():
+    return [{}, [], []]
+
+
+class TopicRouter:
+    """
+    依主題過濾器分派訊息
+
+    處理器簽章: handler(topic, msg, retained)，可為一般函式或 async 函式。
+    預設直接傳入原始 bytes（不解碼、不複製）；註冊時 decode=True 才轉成 str。
+    """
+
+    def __init__(self):
+        self._root = _new_node()
+        self.dispatched = 0   # 有處理器接收的訊息數
+        self.unmatched = 0    # 沒有任何處理器的訊息數
+
+    def add(self, topic_filter, handler, decode=False):
+        """
+        註冊處理器
+
+        參數:
+            topic_filter: 主題過濾器（str 或 bytes），可含 + 與 #
+            handler: 處理函式
+            decode: True 時以 str 傳入 topic/msg
+        """
+        if isinstance(topic_filter, str):
+            topic_filter = topic_filter.encode()
+        levels = topic_filter.split(_SEP)
+        node = self._root
+        entry = (handler, decode)
+        for i, level in enumerate(levels):
+            if level == _HASH:
+                if i != len(levels) - 1:
+                    raise ValueError("'#' 只能出現在過濾器最後一層")
+                node[_MULTI].append(entry)
+                return
+            node = node[_CHILDREN].setdefault(level, _new_node())
+        node[_HANDLERS].append(entry)
+
+    def remove(self, topic_filter, handler):
+        """移除處理器（節點保留，不影響其他過濾器）"""
+        if isinstance(topic_filter, str):
+            topic_filter = topic_filter.encode()
+        node = self._root
+        levels = topic_filter.split(_SEP)
+        for level in levels[:-1]:
+            node = node[_CHILDREN].get(level)
+            if node is None:
+                return
+        last = levels[-1]
+        if last == _HASH:
+            bucket = node[_MULTI]
+        else:
+            node = node[_CHILDREN].get(last)
+            if node is None:
+                return
+            bucket = node[_HANDLERS]
+        bucket[:] = [e for e in bucket if e[0] is not handler]
+
+    def match(self, topic):
+        """
+        找出符合主題的所有處理器
+
+        返回: [(handler, decode), ...]
+        """
+        levels = topic.split(_SEP)
+        last = len(levels)
+        # '$' 開頭的系統主題不被第一層萬用字元匹配
+        sys_topic = topic[:1] == b'$'
+        found = []
+        stack = [(self._root, 0)]
+        while stack:
+            node, i = stack.pop()
+            if node[_MULTI] and not (sys_topic and i == 0):
+                found.extend(node[_MULTI])
+            if i == last:
+                found.extend(node[_HANDLERS])
+                continue
+            children = node[_CHILDREN]
+            child = children.get(levels[i])
+            if child is not None:
+                stack.append((child, i + 1))
+            if not (sys_topic and i == 0):
+                child = children.get(_PLUS)
+                if child is not None:
+                    stack.append((child, i + 1))
+        return found
+
+    async def dispatch(self, topic, msg, retained=False):
+        """
+        分派一則訊息
+
+        返回: 執行的處理器數量（0 表示無人訂閱，訊息直接丟棄）
+        """
+        entries = self.match(topic)
+        if not entries:
+            self.unmatched += 1
+            return 0
+        self.dispatched += 1
+        return await self.run_entries(entries, topic, msg, retained)
+
+    async def run_entries(self, entries, topic, msg, retained=False):
+        """依 match() 的結果依序執行處理器"""
+        topic_str = msg_str = None
+        for handler, decode in entries:
+            if decode:
+                if topic_str is None:
+                    topic_str = topic.decode()
+                    msg_str = bytes(msg).decode()
+                res = handler(topic_str, msg_str, retained)
+            else:
+                res = handler(topic, msg, retained)
+            if res is not None:
+                await res
+        return len(entries)
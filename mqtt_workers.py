@@ -0,0 +1,102 @@
+"""
+mqtt_workers.py - MQTT 訊息處理工作池
+收到的訊息先放入有界佇列，由固定數量的處理協程消化，
+避免慢速處理器卡住 mqtt_as 的接收迴圈與 keepalive
+"""
+
+import uasyncio
+from ringbuf import RingBuffer, DROP_OLDEST
+
+
+class WorkerPool:
+    """
+    每個處理協程擁有自己的環形佇列；同一主題固定雜湊到同一個協程，
+    因此同主題的訊息會依到達順序處理（不同主題之間則可並行）
+    """
+
+    def __init__(self, router, workers=2, capacity=32, policy=DROP_OLDEST):
+        self.router = router
+        self.workers = workers
+        per_worker = max(1, capacity // workers)
+        self._rings = [RingBuffer(per_worker, policy) for _ in range(workers)]
+        self._events = [uasyncio.Event() for _ in range(workers)]
+        self._tasks = []
+        self.on_drop = None     # 可選：on_drop(topic, msg, retained)，因滿載被丟棄的訊息（DROP_OLDEST 時是被擠掉的舊訊息）
+
+        # === 統計計數器 ===
+        self.waited = 0         # put() 因佇列滿載而等待的次數
+        self.submitted = 0
+        self.processed = 0
+        self.errors = 0
+
+    def start(self):
+        """啟動處理協程（重複呼叫無作用）"""
+        if not self._tasks:
+            self._tasks = [uasyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    def submit(self, entries, topic, msg, retained):
+        """
+        放入一則已匹配的訊息（不會等待處理完成）
+
+        返回: True 已排入，False 佇列滿載被丟棄（DROP_NEWEST）
+        """
+        i = hash(topic) % self.workers
+        self.submitted += 1
+        item = (entries, topic, msg, retained)
+        dropped = self._rings[i].push(item)
+        self._events[i].set()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped[1], dropped[2], dropped[3])
+        return dropped is not item
+
+    async def put(self, entries, topic, msg, retained, wait_ms=0):
+        """
+        與 submit 相同，但該主題的佇列已滿時先等待最多 wait_ms 毫秒讓處理協程騰出空間（背壓：
+        接收迴圈暫停讀取，訊息留在 socket / Broker 端），仍然滿載才依策略丟棄
+
+        返回: True 已排入，False 被丟棄（DROP_NEWEST）
+        """
+        ring = self._rings[hash(topic) % self.workers]
+        if ring.is_full() and wait_ms:
+            self.waited += 1
+            for _ in range(wait_ms):
+                await uasyncio.sleep_ms(1)
+                if not ring.is_full():
+                    break
+        return self.submit(entries, topic, msg, retained)
+
+    async def _worker(self, i):
+        ring = self._rings[i]
+        event = self._events[i]
+        run_entries = self.router.run_entries
+        while True:
+            item = ring.pop()
+            if item is None:
+                event.clear()
+                await event.wait()
+                continue
+            try:
+                await run_entries(*item)
+            except Exception as e:
+                self.errors += 1
+                print(f"[MQTT] 處理器錯誤: {e}")
+            self.processed += 1
+
+    def depth(self):
+        return sum(len(r) for r in self._rings)
+
+    def stats(self):
+        """
+        取得工作池統計
+
+        返回: dict（depth, high_water, overflow, waited, submitted, processed, errors）
+        """
+        return {
+            'depth': self.depth(),
+            'high_water': max(r.high_water for r in self._rings),
+            'overflow': sum(r.overflow for r in self._rings),
+            'waited': self.waited,
+            'submitted': self.submitted,
+            'processed': self.processed,
+            'errors': self.errors,
+        }
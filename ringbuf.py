@@ -0,0 +1,79 @@
+"""
+ringbuf.py - 固定容量環形緩衝區
+預先配置槽位，滿載時依策略丟棄最舊或最新的一筆
+"""
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+
+class RingBuffer:
+    def __init__(self, capacity, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError("未知的溢位策略: {}".format(policy))
+        self.capacity = capacity
+        self.policy = policy
+
+        # === 預先配置槽位，避免執行期反覆配置記憶體 ===
+        self._buf = [None] * capacity
+        self._head = 0      # 最舊一筆的位置
+        self._count = 0     # 目前筆數
+
+        # === 統計計數器 ===
+        self.overflow = 0   # 因滿載而丟棄的筆數
+        self.high_water = 0 # 曾經達到的最大深度
+
+    def __len__(self):
+        return self._count
+
+    def is_full(self):
+        return self._count == self.capacity
+
+    def push(self, item):
+        """
+        放入一筆資料
+
+        返回: 被擠出的舊資料（DROP_OLDEST），或 None；
+              DROP_NEWEST 滿載時拒收並回傳 item 本身
+        """
+        if self._count == self.capacity:
+            self.overflow += 1
+            if self.policy == DROP_NEWEST:
+                return item
+            # DROP_OLDEST：覆寫最舊一筆並前移 head
+            dropped = self._buf[self._head]
+            self._buf[self._head] = item
+            self._head = (self._head + 1) % self.capacity
+            return dropped
+
+        self._buf[(self._head + self._count) % self.capacity] = item
+        self._count += 1
+        if self._count > self.high_water:
+            self.high_water = self._count
+        return None
+
+    def peek(self):
+        """取得最舊一筆但不移除，空的時候回傳 None"""
+        if not self._count:
+            return None
+        return self._buf[self._head]
+
+    def peek_many(self, n):
+        """由舊到新取得最多 n 筆但不移除"""
+        return [self._buf[(self._head + k) % self.capacity] for k in range(min(n, self._count))]
+
+    def pop(self):
+        """移除並回傳最舊一筆，空的時候回傳 None"""
+        if not self._count:
+            return None
+        item = self._buf[self._head]
+        self._buf[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        return item
+
+    def clear(self):
+        for i in range(self.capacity):
+            self._buf[i] = None
+        self._head = 0
+        self._count = 0
@@ -0,0 +1,221 @@
+"""
+sensor.py - DHT 溫濕度取樣服務
+依自己的排程讀取感測器，時序失敗時有限次重試，以中位數剔除突波後再做 EMA 平滑；
+每次取樣的時間、數值與品質旗標存在 array 環形緩衝區，
+OLED / HTTP / MQTT 只讀最新的濾波值，不直接碰感測器
+"""
+
+from array import array
+import time
+
+try:
+    import uasyncio as asyncio
+    from time import ticks_us, ticks_diff
+    sleep_ms = asyncio.sleep_ms
+except ImportError:
+    # 電腦端 CPython（tools/sensor_sim.py）
+    import asyncio
+
+    def ticks_us():
+        return int(time.perf_counter() * 1000000)
+
+    def ticks_diff(a, b):
+        return a - b
+
+    def sleep_ms(ms):
+        return asyncio.sleep(ms / 1000)
+
+# 品質旗標（可組合）
+Q_OK = 0
+Q_RETRIED = 1       # 重試後才讀到
+Q_OUTLIER = 2       # 與近期中位數差距過大，以中位數代替
+Q_FAILED = 4        # 重試用盡，沿用上次的濾波值
+
+TEMP_RANGE = (-40, 80)      # 超出範圍視為讀取錯誤（DHT11 / DHT22 的規格範圍）
+HUMI_RANGE = (0, 100)
+
+
+class SensorHistory:
+    """
+    固定容量的取樣紀錄（array 儲存，滿了覆寫最舊一筆）
+    溫濕度以 0.1 為單位存成 16 位元整數
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.ts = array('L', [0] * capacity)       # time.time() 秒
+        self.temp = array('h', [0] * capacity)     # 0.1 °C
+        self.humi = array('h', [0] * capacity)     # 0.1 %
+        self.flags = array('B', [0] * capacity)
+        self._head = 0      # 下一筆寫入的位置
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def push(self, ts, temp, humi, flags):
+        i = self._head
+        self.ts[i] = int(ts)
+        self.temp[i] = int(round(temp * 10))
+        self.humi[i] = int(round(humi * 10))
+        self.flags[i] = flags
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+
+    def items(self):
+        """由舊到新產生 (ts, temp, humi, flags)"""
+        start = (self._head - self._count) % self.capacity
+        for k in range(self._count):
+            i = (start + k) % self.capacity
+            yield self.ts[i], self.temp[i] / 10, self.humi[i] / 10, self.flags[i]
+
+    def rows(self, since=0):
+        """由舊到新產生 ts >= since 的 (ts, temp, humi, flags)，溫濕度維持 0.1 單位的整數"""
+        start = (self._head - self._count) % self.capacity
+        for k in range(self._count):
+            i = (start + k) % self.capacity
+            if self.ts[i] >= since:
+                yield self.ts[i], self.temp[i], self.humi[i], self.flags[i]
+
+    def nbytes(self):
+        return self.capacity * (self.ts.itemsize + self.temp.itemsize + self.humi.itemsize + self.flags.itemsize)
+
+
+class _Filter:
+    """近 N 筆原始值的中位數剔除突波，再做指數移動平均"""
+
+    def __init__(self, window, alpha, max_jump):
+        self.raw = [0.0] * window
+        self.n = 0
+        self.i = 0
+        self.alpha = alpha
+        self.max_jump = max_jump
+        self.rejects = 0    # 連續判定為突波的次數
+        self.value = None
+
+    def update(self, x):
+        """
+        返回: (濾波值, 是否判定為突波)
+        """
+        outlier = False
+        if self.n >= 3:
+            median = sorted(self.raw[:self.n])[self.n // 2]
+            if abs(x - median) > self.max_jump:
+                if self.rejects < 2:
+                    self.rejects += 1
+                    x = median
+                    outlier = True
+                else:
+                    # 連續三筆都偏離：視為真的變化（例如感測器換了位置），以新值重建視窗
+                    self.n = self.i = 0
+        if not outlier:
+            self.rejects = 0
+            self.raw[self.i] = x
+            self.i = (self.i + 1) % len(self.raw)
+            if self.n < len(self.raw):
+                self.n += 1
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value, outlier
+
+
+class DhtService:
+    """
+    參數:
+        sensor: 具 measure() / temperature() / humidity() 的 DHT 物件（measure() 可為協程）
+        interval_sec: 取樣間隔（DHT11 兩次讀取至少相隔 1 秒）
+        retries: 讀取失敗時的重試次數
+        retry_delay_ms: 重試前等待
+        window / alpha: 中位數視窗筆數與 EMA 係數
+        max_jump: (溫度, 濕度) 與中位數相差超過此值視為突波
+        history: 環形緩衝區筆數
+        stale_sec: 超過此秒數沒有成功讀取即視為過期
+    """
+
+    def __init__(self, sensor, interval_sec=2, retries=2, retry_delay_ms=1100, window=5, alpha=0.3,
+                 max_jump=(5, 15), history=180, stale_sec=30):
+        self.sensor = sensor
+        self.interval_sec = interval_sec
+        self.retries = retries
+        self.retry_delay_ms = retry_delay_ms
+        self.stale_sec = stale_sec
+        self._temp = _Filter(window, alpha, max_jump[0])
+        self._humi = _Filter(window, alpha, max_jump[1])
+        self.history = SensorHistory(history)
+        # 每次取樣（含失敗）後的脈衝事件：set() 喚醒所有等待者後立即 clear()，可有多個消費者
+        self.updated = asyncio.Event()
+        self.observe = None                # 可選：observe(微秒)，每次 measure() 佔用迴圈的時間（metrics 直方圖）
+
+        # === 最新狀態（消費者只讀這些） ===
+        self.temp = None        # 濾波後溫度（°C），尚未成功讀取時為 None
+        self.humi = None
+        self.flags = Q_FAILED
+        self.last_ok = None     # 最後一次成功讀取的 time.time()
+
+        # === 統計計數器 ===
+        self.reads = 0          # 呼叫 measure() 的次數
+        self.retried = 0
+        self.failed = 0         # 重試用盡的取樣次數
+        self.outliers = 0
+
+    def stale(self, now=None):
+        if self.last_ok is None:
+            return True
+        return (time.time() if now is None else now) - self.last_ok > self.stale_sec
+
+    async def _measure(self):
+        self.reads += 1
+        t0 = ticks_us()
+        try:
+            r = self.sensor.measure()
+            if r is not None:
+                await r         # 不阻塞的讀取器（dht_async.DhtAsync）
+            t, h = self.sensor.temperature(), self.sensor.humidity()
+        finally:
+            if self.observe:
+                # 回報佔用事件迴圈的時間：阻塞式驅動是整段，DhtAsync 自行統計同步執行的部分
+                stall = getattr(self.sensor, "stall_us", None)
+                self.observe(ticks_diff(ticks_us(), t0) if stall is None else stall)
+        if not (TEMP_RANGE[0] <= t <= TEMP_RANGE[1] and HUMI_RANGE[0] <= h <= HUMI_RANGE[1]):
+            raise OSError("讀值超出範圍: {} {}".format(t, h))
+        return t, h
+
+    async def read(self):
+        """
+        讀取一次，失敗時最多重試 retries 次
+
+        返回: (溫度, 濕度, 旗標)；重試用盡時溫濕度為 None
+        """
+        for attempt in range(self.retries + 1):
+            try:
+                t, h = await self._measure()
+                return t, h, Q_RETRIED if attempt else Q_OK
+            except OSError:
+                if attempt < self.retries:
+                    self.retried += 1
+                    await sleep_ms(self.retry_delay_ms)
+        return None, None, Q_FAILED
+
+    def update(self, t, h, flags, now):
+        """套用一次讀取結果（None 表示失敗），更新濾波值與紀錄"""
+        if t is None:
+            self.failed += 1
+            flags = Q_FAILED
+        else:
+            self.temp, out_t = self._temp.update(t)
+            self.humi, out_h = self._humi.update(h)
+            if out_t or out_h:
+                self.outliers += 1
+                flags |= Q_OUTLIER
+            self.last_ok = now
+        self.flags = flags
+        if self.temp is not None:
+            self.history.push(now, self.temp, self.humi, flags)
+        self.updated.set()
+        self.updated.clear()
+
+    async def run(self):
+        while True:
+            t, h, flags = await self.read()
+            self.update(t, h, flags, time.time())
+            await sleep_ms(int(self.interval_sec * 1000))
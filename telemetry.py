@@ -0,0 +1,42 @@
+"""
+telemetry.py - 例外回報（report-by-exception）遙測
+數值變化超過死區才發佈，並以心跳間隔保證最長靜默時間
+"""
+
+
+class ChangeReporter:
+    def __init__(self, deadbands, heartbeat_sec):
+        """
+        參數:
+            deadbands: {欄位: 死區}，變化量 >= 死區才回報
+            heartbeat_sec: 最長靜默秒數，超過即使沒變化也回報
+        """
+        self.deadbands = deadbands
+        self.heartbeat_sec = heartbeat_sec
+        self._last = {}      # 欄位 → 上次回報的值
+        self._last_at = {}   # 欄位 → 上次回報的時間（秒）
+        self.reported = 0
+        self.suppressed = 0
+
+    def should_report(self, field, value, now):
+        """
+        判斷此欄位是否需要回報（不會更新狀態，回報成功後請呼叫 mark）
+
+        參數:
+            now: 目前時間（秒）
+        """
+        last = self._last.get(field)
+        if last is None:
+            return True
+        if now - self._last_at[field] >= self.heartbeat_sec:
+            return True
+        if abs(value - last) >= self.deadbands.get(field, 0):
+            return True
+        self.suppressed += 1
+        return False
+
+    def mark(self, field, value, now):
+        """記錄已回報的值與時間"""
+        self._last[field] = value
+        self._last_at[field] = now
+        self.reported += 1
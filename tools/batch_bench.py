@@ -0,0 +1,209 @@
+"""
+tools/batch_bench.py - 量測載入整份鬧鐘排程的時間（於電腦端 CPython 執行）
+
+比較三種方式寫入 N 筆鬧鐘：
+    /add × N            逐筆 GET（keep-alive），每筆各寫一次檔案
+    POST /alarms/batch  一次送出 N 個 add 操作
+    PUT /alarms         一次送出整份排程
+並量測 GET /alarms/export 串流匯出的時間
+
+用法:
+    python tools/batch_bench.py --local -n 500                 # 本機以相同 handler 邏輯量測
+    python tools/batch_bench.py --host 192.168.1.50 -n 500     # 實機（結束時還原原本的排程）
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+import http_server as http  # noqa: E402
+from alarm_ops import apply_ops  # noqa: E402
+
+
+class Client:
+    """單一 keep-alive 連線的極簡 HTTP 客戶端"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        head = f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n'
+        if body:
+            head += 'Content-Type: application/json\r\n'
+        self.writer.write(head.encode() + b'\r\n' + body)
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if headers.get('transfer-encoding') == 'chunked':
+            data = bytearray()
+            while True:
+                size = int(await self.reader.readline(), 16)
+                data += await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+                del data[-2:]
+            data = bytes(data[:-2])
+        else:
+            data = await self.reader.readexactly(int(headers.get('content-length', 0)))
+        if headers.get('connection') == 'close':
+            self.close()
+        return status, data
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+def make_schedule(n, seed=43):
+    rnd = random.Random(seed)
+    return [{'h': rnd.randrange(24), 'm': rnd.randrange(60), 'repeat': rnd.randrange(2),
+             'music': rnd.randrange(4), 'enabled': True} for _ in range(n)]
+
+
+# ==================== 本機伺服器（與 alarm_clock 相同的處理邏輯） ====================
+
+def local_server():
+    state = {'alarms': [], 'gen': 0, 'saves': 0, 'save_sec': 0.0}
+    path = os.path.join(tempfile.mkdtemp(), 'alarm.txt')
+
+    def mutate(ops):
+        state['alarms'] = apply_ops(state['alarms'], ops)
+        t0 = time.perf_counter()
+        with open(path, 'w') as f:            # save_alarms：整份重寫
+            f.write(json.dumps(state['alarms']))
+        state['save_sec'] += time.perf_counter() - t0
+        state['saves'] += 1
+        state['gen'] += 1
+
+    async def add(req, writer):
+        q = req.query
+        mutate([{'op': 'add', 'h': q['h'], 'm': q['m'], 'repeat': q['repeat'], 'music': q['music']}])
+        await http.reply(req, writer, 200, 'OK')
+
+    async def apply(req, writer, ops_of):
+        try:
+            mutate(ops_of(json.loads(req.body)))
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            return await http.reply(req, writer, 400, json.dumps({'ok': False, 'error': str(e)}))
+        await http.reply(req, writer, 200, json.dumps({'ok': True, 'gen': state['gen'],
+                                                       'count': len(state['alarms'])}))
+
+    async def batch(req, writer):
+        await apply(req, writer, lambda doc: doc['ops'] if isinstance(doc, dict) else doc)
+
+    async def put(req, writer):
+        await apply(req, writer, lambda doc: [{'op': 'replace', 'alarms': doc['alarms']}])
+
+    def parts(gen, items):
+        yield '{"gen":%d,"alarms":[' % gen
+        for i, a in enumerate(items):
+            yield (',' if i else '') + json.dumps(a)
+        yield ']}'
+
+    async def export(req, writer):
+        await http.send_chunked(req, writer, parts(state['gen'], state['alarms'][:]))
+
+    routes = http.Router()
+    routes.max_body = config.HTTP_MAX_BODY
+    routes.add('/add', add)
+    routes.add('/alarms', put, ('PUT',))
+    routes.add('/alarms/batch', batch, ('POST',))
+    routes.add('/alarms/export', export)
+
+    async def handler(reader, writer):
+        try:
+            await routes.serve(reader, writer, 5, 10 ** 6)
+        except asyncio.CancelledError:
+            pass        # 結束時仍開著的 keep-alive 連線會被取消
+        finally:
+            writer.close()
+    return handler, state
+
+
+# ==================== 量測 ====================
+
+async def bench(client, schedule, state=None):
+    def saves():
+        return f'  寫檔 {state["saves"]} 次 {state["save_sec"] * 1000:.1f} ms' if state else ''
+
+    async def reset():
+        await client.request('PUT', '/alarms', json.dumps({'alarms': []}).encode())
+        if state:
+            state['saves'] = 0
+            state['save_sec'] = 0.0
+
+    n = len(schedule)
+    await reset()
+    t0 = time.perf_counter()
+    for a in schedule:
+        status, _ = await client.request('GET', '/add?h={h}&m={m}&repeat={repeat}&music={music}'.format(**a))
+        assert status == 200, status
+    print(f'/add × {n:<5}       {(time.perf_counter() - t0) * 1000:9.1f} ms  請求 {n}{saves()}')
+
+    await reset()
+    ops = [{'op': 'add', 'h': a['h'], 'm': a['m'], 'repeat': a['repeat'], 'music': a['music']} for a in schedule]
+    body = json.dumps({'ops': ops}).encode()
+    t0 = time.perf_counter()
+    status, data = await client.request('POST', '/alarms/batch', body)
+    print(f'POST /alarms/batch   {(time.perf_counter() - t0) * 1000:9.1f} ms  請求 1  {len(body):,} B{saves()}  '
+          f'→ {status} {data.decode()}')
+
+    await reset()
+    body = json.dumps({'alarms': schedule}).encode()
+    t0 = time.perf_counter()
+    status, data = await client.request('PUT', '/alarms', body)
+    print(f'PUT /alarms          {(time.perf_counter() - t0) * 1000:9.1f} ms  請求 1  {len(body):,} B{saves()}  '
+          f'→ {status} {data.decode()}')
+
+    t0 = time.perf_counter()
+    status, data = await client.request('GET', '/alarms/export')
+    doc = json.loads(data)
+    assert doc['alarms'] == schedule, '匯出內容與匯入不符'
+    print(f'GET /alarms/export   {(time.perf_counter() - t0) * 1000:9.1f} ms  {len(data):,} B，內容與匯入一致')
+
+
+async def main(args):
+    schedule = make_schedule(args.n)
+    if args.local:
+        handler, state = local_server()
+        server = await asyncio.start_server(handler, '127.0.0.1', 0)
+        client = Client('127.0.0.1', server.sockets[0].getsockname()[1])
+        await bench(client, schedule, state)
+        client.close()
+        server.close()
+        return
+    client = Client(args.host, args.port)
+    status, original = await client.request('GET', '/alarms/export')
+    try:
+        await bench(client, schedule)
+    finally:
+        if status == 200:
+            await client.request('PUT', '/alarms', json.dumps({'alarms': json.loads(original)['alarms']}).encode())
+            print('已還原原本的排程')
+        client.close()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=80)
+    ap.add_argument('-n', type=int, default=500, help='鬧鐘筆數')
+    ap.add_argument('--local', action='store_true', help='不連實機，在本機以相同邏輯量測')
+    asyncio.run(main(ap.parse_args()))
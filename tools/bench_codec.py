@@ -0,0 +1,48 @@
+"""
+tools/bench_codec.py - 訊息編碼成本與大小比較（於電腦端 CPython 執行）
+
+用法: python tools/bench_codec.py [次數]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from codec import CODECS  # noqa: E402
+
+SAMPLES = {
+    '溫度單值': 26,
+    '溫濕度': {'temp': 26, 'humi': 61},
+    '指令(bulk 5)': {'id': 42, 'reply': 'fleet/ack', 'op': 'bulk',
+                     'ops': [{'op': 'add', 'h': 7, 'm': k * 5, 'repeat': 1, 'music': 2} for k in range(5)]},
+}
+
+
+def bench(codec, body, n):
+    data = codec.encode(body, 'iot001', 123456, 1760000000)
+    start = time.perf_counter()
+    for i in range(n):
+        codec.encode(body, 'iot001', i, 1760000000)
+    enc = (time.perf_counter() - start) / n
+    start = time.perf_counter()
+    for _ in range(n):
+        codec.decode(data)
+    dec = (time.perf_counter() - start) / n
+    return len(data), enc, dec
+
+
+def main(n):
+    print(f'{"內容":<14}{"編碼":<10}{"bytes":>7}{"encode us":>11}{"decode us":>11}')
+    for label, body in SAMPLES.items():
+        for name, codec in CODECS.items():
+            if name == 'struct' and isinstance(body, dict) and 'op' in body:
+                continue   # struct 只支援遙測數值
+            if name == 'raw' and isinstance(body, dict):
+                continue
+            size, enc, dec = bench(codec, body, n)
+            print(f'{label:<14}{name:<10}{size:>7}{enc * 1e6:>11.2f}{dec * 1e6:>11.2f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,111 @@
+"""
+tools/bench_router.py - 主題路由器效能測試（於電腦端 CPython 執行）
+
+50 個過濾器（精確、+、# 混合），分派 10k 則訊息，
+並與「逐一解碼再比對字串」的舊做法比較
+
+用法: python tools/bench_router.py [訊息數]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from mqtt_router import TopicRouter  # noqa: E402
+
+N_FILTERS = 50
+NS = 'nuu/csie/iot1133'
+
+
+def build_filters():
+    filters = []
+    for i in range(N_FILTERS):
+        kind = i % 5
+        if kind == 0:
+            filters.append(f'{NS}/dev{i:02d}/cmd')
+        elif kind == 1:
+            filters.append(f'{NS}/+/grp{i:02d}')
+        elif kind == 2:
+            filters.append(f'{NS}/dev{i:02d}/#')
+        elif kind == 3:
+            filters.append(f'M{i:07d}/bedroom/temp')
+        else:
+            filters.append(f'M{i:07d}/+/humi')
+    return filters
+
+
+def build_topics(n):
+    rnd = random.Random(1133)
+    topics = []
+    for _ in range(n):
+        i = rnd.randrange(N_FILTERS * 2)   # 約一半的主題沒有人訂閱
+        kind = rnd.randrange(5)
+        if kind == 0:
+            t = f'{NS}/dev{i:02d}/cmd'
+        elif kind == 1:
+            t = f'{NS}/dev{i:02d}/grp{i:02d}'
+        elif kind == 2:
+            t = f'{NS}/dev{i:02d}/status/extra'
+        elif kind == 3:
+            t = f'M{i:07d}/bedroom/temp'
+        else:
+            t = f'M{i:07d}/kitchen/humi'
+        topics.append(t.encode())
+    return topics
+
+
+def naive_match(filters, topic):
+    """舊做法：解碼後逐一比對每個過濾器"""
+    levels = topic.split('/')
+    hits = 0
+    for f in filters:
+        fl = f.split('/')
+        ok = True
+        for j, part in enumerate(fl):
+            if part == '#':
+                break
+            if j >= len(levels) or (part != '+' and part != levels[j]):
+                ok = False
+                break
+        else:
+            ok = len(fl) == len(levels)
+        hits += ok
+    return hits
+
+
+async def main(n):
+    filters = build_filters()
+    topics = build_topics(n)
+    payload = b'23'
+    hits = [0]
+
+    def handler(topic, msg, retained):
+        hits[0] += 1
+
+    router = TopicRouter()
+    for f in filters:
+        router.add(f, handler)
+
+    start = time.perf_counter()
+    for t in topics:
+        await router.dispatch(t, payload, False)
+    trie_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    naive_hits = 0
+    for t in topics:
+        naive_hits += naive_match(filters, t.decode())
+        payload.decode()
+    naive_s = time.perf_counter() - start
+
+    assert naive_hits == hits[0], (naive_hits, hits[0])
+    print(f'訊息數: {n}, 過濾器: {len(filters)}, 命中處理器: {hits[0]}, 無人訂閱: {router.unmatched}')
+    print(f'trie 路由 : {trie_s * 1e3:8.2f} ms ({trie_s / n * 1e6:.2f} us/則)')
+    print(f'逐一比對  : {naive_s * 1e3:8.2f} ms ({naive_s / n * 1e6:.2f} us/則)')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,119 @@
+"""
+tools/build_assets.py - 產生網頁資源的 gzip 壓縮版（於電腦端 CPython 執行）
+
+對 web/ 下的 .html / .css / .js 產生同名 .gz，與原檔一起上傳到裝置；
+http_server.StaticFile 會在瀏覽器接受 gzip 時改送 .gz。
+壓縮時固定 mtime=0，內容相同就產生相同檔案
+
+用法:
+    python tools/build_assets.py            # 產生 .gz 並列出大小
+    python tools/build_assets.py --bench    # 另外在本機量測各種傳送方式的位元組與伺服器耗時
+"""
+
+import argparse
+import asyncio
+import gzip
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+WEB_DIR = os.path.join(ROOT, 'web')
+EXTS = ('.html', '.css', '.js')
+
+
+def build(web_dir=WEB_DIR):
+    results = []
+    for name in sorted(os.listdir(web_dir)):
+        if not name.endswith(EXTS):
+            continue
+        src = os.path.join(web_dir, name)
+        with open(src, 'rb') as f:
+            data = f.read()
+        packed = gzip.compress(data, compresslevel=9, mtime=0)
+        with open(src + '.gz', 'wb') as f:
+            f.write(packed)
+        results.append((name, len(data), len(packed)))
+        print(f'{name:<16}{len(data):8d} B → {len(packed):7d} B ({len(packed) / len(data):.0%})')
+    return results
+
+
+# ==================== 本機量測 ====================
+
+async def legacy_index(reader, writer):
+    """舊版：逐行寫出文字檔，無 Content-Length，送完即關閉"""
+    while (await reader.readline()) not in (b'\r\n', b''):
+        pass
+    writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n\r\n')
+    with open(os.path.join(WEB_DIR, 'index.html')) as f:
+        for line in f:
+            writer.write(line.encode())
+    await writer.drain()
+    writer.close()
+
+
+async def fetch(port, headers=''):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET / HTTP/1.1\r\nHost: bench\r\n{headers}Connection: close\r\n\r\n'.encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return data
+
+
+async def bench(n):
+    sys.path.insert(0, ROOT)
+    import http_server as http
+
+    page = http.StaticFile(os.path.join(WEB_DIR, 'index.html'), 'text/html; charset=utf-8')
+    routes = http.Router()
+    routes.add('/', page.handler)
+    busy = [0.0]
+
+    def timed(handler):
+        async def wrapped(reader, writer):
+            t0 = time.perf_counter()
+            try:
+                await handler(reader, writer)
+            finally:
+                busy[0] += time.perf_counter() - t0
+                writer.close()
+        return wrapped
+
+    async def routed(reader, writer):
+        await routes.serve(reader, writer)
+
+    etag = None
+    cases = [('逐行（舊版）', legacy_index, ''),
+             ('StaticFile', routed, ''),
+             ('StaticFile+gzip', routed, 'Accept-Encoding: gzip, deflate\r\n'),
+             ('304 Not Modified', routed, 'Accept-Encoding: gzip, deflate\r\n')]
+    for label, handler, headers in cases:
+        if label.startswith('304'):
+            headers += f'If-None-Match: {etag}\r\n'
+        server = await asyncio.start_server(timed(handler), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        busy[0] = 0.0
+        total = 0
+        for _ in range(n):
+            data = await fetch(port, headers)
+            total += len(data)
+        head, _, _ = data.partition(b'\r\n\r\n')
+        lines = head.split(b'\r\n')
+        for line in lines:
+            if line.lower().startswith(b'etag:'):
+                etag = line.split(b':', 1)[1].strip().decode()
+        print(f'{label:<18}每次 {total / n:8,.0f} B（含標頭）  伺服器 {busy[0] / n * 1000:6.3f} ms/次  '
+              f'{lines[0].decode()}')
+        server.close()
+        await server.wait_closed()
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--bench', action='store_true')
+    ap.add_argument('-n', type=int, default=200, help='量測時的請求次數')
+    args = ap.parse_args()
+    build()
+    if args.bench:
+        asyncio.run(bench(args.n))
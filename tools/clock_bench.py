@@ -0,0 +1,121 @@
+"""
+tools/clock_bench.py - 統計 alarm_clock 每分鐘呼叫 time.localtime() 的次數（於電腦端 CPython 執行）
+
+與 http_harness.py 相同的方式匯入真正的 alarm_clock（硬體模組以替身取代，不啟動裝置主程式），
+把 time.localtime 換成計數版本（time.time 取整數秒，與 MicroPython 相同），再跑裝置上會持續
+讀時間的協程：畫面（每 200 ms）、鬧鐘檢查、SSE 時鐘推播，以及 clock.run()（若存在）；
+同時開一個 /events 分頁、一個每 500 ms 輪詢 /state 的分頁（不支援 EventSource 的瀏覽器）
+與每 5 秒一次的 /time，最後依呼叫端列出每分鐘的 localtime 次數，
+以及 /events 每分鐘收到的 time 事件（確認推播頻率不變）
+
+--root 可指向另一份程式碼（例如以 git worktree 取出的舊版本）做前後比較
+
+用法:
+    python tools/clock_bench.py --duration 30
+    git worktree add /tmp/old HEAD~1 && python tools/clock_bench.py --root /tmp/old
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from http_harness import install_stubs
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def count_localtime(counts):
+    real_time, real_localtime = time.time, time.localtime
+
+    def localtime(secs=None):
+        f = sys._getframe(1)
+        counts['{} ← {}'.format(f.f_code.co_name, f.f_back.f_code.co_name)] += 1
+        return real_localtime(secs)
+
+    time.time = lambda: int(real_time())
+    time.localtime = localtime
+
+
+async def get(port, path):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write('GET {} HTTP/1.1\r\nHost: b\r\nConnection: close\r\n\r\n'.format(path).encode())
+    await writer.drain()
+    await reader.read()
+    writer.close()
+
+
+async def poll(port, path, every):
+    while True:
+        await get(port, path)
+        await asyncio.sleep(every)
+
+
+async def sse(port, seen):
+    """計算收到的 time 事件，確認推播頻率沒有改變"""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(b'GET /events HTTP/1.1\r\nHost: b\r\n\r\n')
+    await writer.drain()
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if line.startswith(b'event: time'):
+            seen['time'] += 1
+
+
+async def main(args):
+    root = os.path.abspath(args.root)
+    work = tempfile.mkdtemp()
+    os.symlink(os.path.join(root, 'web'), os.path.join(work, 'web'))
+    os.chdir(work)
+    sys.path.insert(0, root)
+    install_stubs()
+    counts = Counter()
+    seen = Counter()
+    count_localtime(counts)
+    import alarm_clock as ac
+
+    ac.load_alarms()
+    ac.add_alarm(7, 30, 0, 0)
+
+    async def handler(reader, writer):
+        try:
+            await ac.handle_client(reader, writer)
+        except asyncio.CancelledError:
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handler, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    coros = [ac.ui_display_task(), ac.check_alarm_task(), ac.sse_clock_task(),
+             sse(port, seen), poll(port, '/state', 0.5), poll(port, '/time', 5)]
+    if hasattr(ac, 'clock'):
+        coros.append(ac.clock.run())
+    tasks = [asyncio.create_task(c) for c in coros]
+    await asyncio.sleep(0.5)
+    counts.clear()
+    seen.clear()
+    await asyncio.sleep(args.duration)
+    total = sum(counts.values())
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    server.close()
+
+    scale = 60 / args.duration
+    print('{}：{:.0f} 秒內 time.localtime() {} 次 → 每分鐘 {:.0f} 次'.format(root, args.duration, total, total * scale))
+    for name, n in counts.most_common():
+        print('  {:<36}{:>6.0f} 次/分鐘'.format(name, n * scale))
+    print('  SSE time 事件 {:.0f} 次/分鐘'.format(seen['time'] * scale))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--duration', type=float, default=30)
+    ap.add_argument('--root', default=ROOT, help='要量測的程式碼目錄')
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,88 @@
+"""
+tools/cmd_load_test.py - 遠端鬧鐘指令壓力測試（於電腦端 CPython 執行）
+
+經由本機 Broker 對裝置的指令主題送出批次指令，量測「送出 → 收到回覆」延遲
+
+用法:
+    python tools/cmd_load_test.py --host 127.0.0.1 --count 200 --batch 10 --inflight 4
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mqtt_lite import MqttLite  # noqa: E402
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def make_request(i, batch, reply):
+    if i % 2:
+        # 奇數請求清空，避免裝置上的鬧鐘無限增加
+        return {"id": i, "reply": reply, "op": "replace", "alarms": []}
+    ops = [{"op": "add", "h": (i + k) % 24, "m": k % 60, "repeat": k % 2, "music": k % 4}
+           for k in range(batch)]
+    return {"id": i, "reply": reply, "op": "bulk", "ops": ops}
+
+
+async def main(args):
+    reply = f'loadtest/{os.getpid()}/ack'
+    sent = {}
+    latencies = []
+    failures = []
+    done = asyncio.Event()
+    window = asyncio.Semaphore(args.inflight)
+
+    def on_message(topic, payload, retained):
+        res = json.loads(payload)
+        start = sent.pop(res.get("id"), None)
+        if start is None:
+            return
+        latencies.append((time.perf_counter() - start) * 1000)
+        if not res.get("ok"):
+            failures.append(res)
+        window.release()
+        if len(latencies) == args.count:
+            done.set()
+
+    client = MqttLite(f'cmd-load-{os.getpid()}')
+    client.on_message = on_message
+    await client.connect(args.host, args.port)
+    await client.subscribe(reply)
+
+    start = time.perf_counter()
+    for i in range(args.count):
+        await window.acquire()
+        sent[i] = time.perf_counter()
+        await client.publish(args.topic, json.dumps(make_request(i, args.batch, reply)))
+    try:
+        await asyncio.wait_for(done.wait(), args.timeout)
+    except asyncio.TimeoutError:
+        print(f'逾時：{len(sent)} 筆未收到回覆')
+    total = time.perf_counter() - start
+    await client.close()
+
+    if latencies:
+        print(f'請求 {len(latencies)} 筆（每批 {args.batch} 個異動），失敗 {len(failures)} 筆')
+        print(f'吞吐量 {len(latencies) / total:.1f} req/s')
+        print(f'延遲 p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms, '
+              f'max {max(latencies):.1f} ms')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=1883)
+    ap.add_argument('--topic', default='nuu/csie/iot1133/cmd01')
+    ap.add_argument('--count', type=int, default=200)
+    ap.add_argument('--batch', type=int, default=10)
+    ap.add_argument('--inflight', type=int, default=4)
+    ap.add_argument('--timeout', type=float, default=60)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,235 @@
+"""
+tools/dht_check.py - dht_async 的解碼檢查與迴圈停頓比較（於電腦端 CPython 執行）
+
+1. 解碼：依 DHT11 規格時序（回應 80/80 µs、每位元低 50 µs + 高 26-28 / 70 µs）產生邊緣時間戳記，
+   每個邊緣加上中斷延遲（固定 + 常態分布抖動），檢查 decode_pulses 在不同抖動下的正確率；
+   另外檢查漏掉開頭邊緣、波形被截斷（ETIMEDOUT）與位元錯誤（EIO）
+2. --capture FILE：解碼裝置上擷取的波形，FILE 為 JSON 陣列，每筆是一次讀取的時間戳記，
+   在裝置上以 list(dht_sensor.edges[:dht_sensor._n]) 取得
+3. 迴圈停頓：同一個事件迴圈上放一個每 1 ms 醒來的探針，分別以阻塞式驅動
+   （忙碌等待 18 ms 起始訊號 + 資料時間，等同內建 dht 模組）與 DhtAsync（假腳位在資料時間結束後
+   依序觸發中斷）經 sensor.DhtService 讀取，比較每次讀取時探針的最大延遲與 DhtService 回報的停頓
+
+用法:
+    python tools/dht_check.py --frames 2000 --reads 20
+    python tools/dht_check.py --capture captures.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import dht_async  # noqa: E402
+from dht_async import DhtAsync, decode_pulses, convert, EDGES, ETIMEDOUT, EIO  # noqa: E402
+from sensor import DhtService  # noqa: E402
+
+IRQ_LATENCY_US = 12     # 中斷進入到讀取 ticks_us 的固定延遲（抖動另外加）
+
+
+def frame(temp, humi):
+    b = bytearray([humi, 0, temp, 0, 0])
+    b[4] = sum(b[:4]) & 0xFF
+    return bytes(b)
+
+
+def synth(buf, rnd, jitter_us, t0=1000):
+    """依規格時序產生 85 個邊緣的時間戳記（µs）"""
+    durations = [rnd.uniform(20, 40), rnd.uniform(75, 85), rnd.uniform(75, 85)]
+    for k in range(40):
+        bit = buf[k >> 3] & (0x80 >> (k & 7))
+        durations.append(rnd.uniform(48, 55))                                   # 低電位
+        durations.append(rnd.uniform(68, 75) if bit else rnd.uniform(24, 30))   # 高電位
+    durations.append(rnd.uniform(48, 55))
+    edges, t = [], t0
+    edges.append(t)
+    for d in durations:
+        t += d
+        edges.append(t)
+    return [int(e + IRQ_LATENCY_US + max(-IRQ_LATENCY_US, rnd.gauss(0, jitter_us))) for e in edges]
+
+
+def check_decoder(args):
+    rnd = random.Random(args.seed)
+    print('== 解碼（合成波形，中斷延遲 {} µs + 抖動） =='.format(IRQ_LATENCY_US))
+    print('  {:>10}{:>10}{:>12}{:>12}'.format('抖動 σ', '正確', '檢查碼擋下', '錯值通過'))
+    ok = True
+    for jitter in (0, 3, 6, 10, 15):
+        good = caught = wrong = 0
+        for _ in range(args.frames):
+            temp, humi = rnd.randint(0, 50), rnd.randint(20, 90)
+            edges = synth(frame(temp, humi), rnd, jitter)
+            try:
+                t, h = convert(decode_pulses(edges))
+            except OSError:
+                caught += 1
+                continue
+            if (t, h) == (temp, humi):
+                good += 1
+            else:
+                wrong += 1
+        print('  {:>8} µs{:>9.1%}{:>12}{:>12}'.format(jitter, good / args.frames, caught, wrong))
+        if jitter <= 3 and good != args.frames:
+            ok = False
+
+    buf = frame(23, 61)
+    edges = synth(buf, rnd, 0)
+    cases = [('完整 85 個邊緣', edges, None),
+             ('漏掉開頭 3 個回應邊緣', edges[3:], None),
+             ('截斷（只有 60 個邊緣）', edges[:60], ETIMEDOUT)]
+    flipped = list(edges)
+    i = len(edges) - 81                 # 第 0 位元（61 的最高位元為 0）的高電位拉長成 1
+    flipped[i + 1] = flipped[i] + 70
+    cases.append(('位元錯誤', flipped, EIO))
+    for label, e, err in cases:
+        try:
+            got = convert(decode_pulses(e))
+            res = '{} °C / {} %'.format(*got)
+            passed = err is None and got == (23, 61)
+        except OSError as ex:
+            res = 'OSError({})'.format(ex.args[0])
+            passed = ex.args[0] == err
+        ok &= passed
+        print('  {:<24}{:<20}{}'.format(label, res, '通過' if passed else '失敗'))
+    return ok
+
+
+def check_captures(path):
+    with open(path) as f:
+        caps = json.load(f)
+    print('== 裝置擷取 {}（{} 筆） =='.format(path, len(caps)))
+    good = 0
+    for k, edges in enumerate(caps):
+        try:
+            buf = decode_pulses(edges)
+            t, h = convert(buf)
+            highs = [edges[i + 1] - edges[i] for i in range(len(edges) - 81, len(edges) - 1, 2)]
+            print('  #{:<3}{} 個邊緣  {} °C / {} %  高電位 {}–{} µs'.format(
+                k, len(edges), t, h, min(highs), max(highs)))
+            good += 1
+        except OSError as ex:
+            print('  #{:<3}{} 個邊緣  OSError({})'.format(k, len(edges), ex.args[0]))
+    return good == len(caps)
+
+
+# ==================== 迴圈停頓 ====================
+
+def busy(us):
+    end = time.perf_counter() + us / 1e6
+    while time.perf_counter() < end:
+        pass
+
+
+class BlockingDht:
+    """內建 dht 模組的行為：起始訊號與資料讀取都在同一個呼叫內忙碌等待"""
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+
+    def measure(self):
+        edges = synth(frame(23, 61), self.rnd, 0)
+        busy(18000 + edges[-1] - edges[0])
+
+    def temperature(self):
+        return 23
+
+    def humidity(self):
+        return 61
+
+
+class FakePin:
+    """machine.Pin 的替身：釋放資料線後，在資料時間結束時依序以合成的時間戳記觸發中斷"""
+
+    OUT, IN, PULL_UP = 1, 0, 1
+    IRQ_RISING, IRQ_FALLING = 1, 2
+
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.handler = None
+
+    def init(self, mode, pull=None, value=None):
+        if mode == self.IN and self.handler:
+            edges = synth(frame(23, 61), self.rnd, 3)
+            asyncio.get_running_loop().call_later((edges[-1] - edges[0]) / 1e6, self._play, edges)
+
+    def irq(self, handler=None, trigger=0, hard=False):
+        self.handler = handler
+
+    def _play(self, edges):
+        real = dht_async.ticks_us
+        try:
+            for ts in edges:
+                if not self.handler:
+                    break
+                dht_async.ticks_us = lambda ts=ts: ts
+                self.handler(self)
+        finally:
+            dht_async.ticks_us = real
+
+
+async def stall(sensor, reads):
+    """回傳每次讀取的 (探針最大延遲 ms, DhtService 回報的停頓 µs, 讀值)"""
+    svc = DhtService(sensor, retries=0)
+    reported = []
+    svc.observe = reported.append
+    state = {'max': 0.0}
+
+    async def probe():
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(0.001)
+            state['max'] = max(state['max'], (time.perf_counter() - t) * 1000 - 1)
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    rows = []
+    for _ in range(reads):
+        state['max'] = 0.0
+        t, h, _ = await svc.read()
+        await asyncio.sleep(0.002)
+        rows.append((state['max'], reported[-1], (t, h)))
+    task.cancel()
+    return rows
+
+
+def summary(label, rows):
+    lag = sorted(r[0] for r in rows)
+    rep = sorted(r[1] for r in rows)
+    ok = sum(1 for r in rows if r[2] == (23, 61))
+    print('  {:<14}探針延遲 p50 {:6.2f} / max {:6.2f} ms   回報停頓 p50 {:8.0f} / max {:8.0f} µs   讀值正確 {}/{}'.format(
+        label, lag[len(lag) // 2], lag[-1], rep[len(rep) // 2], rep[-1], ok, len(rows)))
+    return lag[-1], ok == len(rows)
+
+
+async def check_stall(args):
+    rnd = random.Random(args.seed)
+    print('\n== 每次讀取的迴圈停頓（{} 次，探針每 1 ms） =='.format(args.reads))
+    old, _ = summary('dht（阻塞）', await stall(BlockingDht(rnd), args.reads))
+    new, ok = summary('DhtAsync', await stall(DhtAsync(FakePin(rnd)), args.reads))
+    print('  最大停頓 {:.1f} ms → {:.1f} ms；中斷處理本身（裝置上約 {} 次 / 讀取）不在主機量測範圍內'.format(
+        old, new, EDGES))
+    return ok and new < old / 4
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--frames', type=int, default=2000, help='每種抖動合成的波形數')
+    ap.add_argument('--reads', type=int, default=20)
+    ap.add_argument('--capture', help='裝置擷取的時間戳記（JSON）')
+    ap.add_argument('--seed', type=int, default=49)
+    args = ap.parse_args()
+    if args.capture:
+        ok = check_captures(args.capture)
+    else:
+        ok = check_decoder(args)
+        ok &= asyncio.run(check_stall(args))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,300 @@
+"""
+tools/fleet_aggregator.py - 多台鬧鐘遙測彙整服務（於電腦端 CPython 執行）
+
+訂閱所有裝置的溫濕度與鬧鐘快照主題，以欄式 array 保存最新狀態與降採樣歷史，
+並提供簡易 HTTP 查詢 API：
+
+    GET /stats                      吞吐量、裝置數、記憶體用量
+    GET /devices                    所有裝置的最新狀態
+    GET /device/<id>                單一裝置最新狀態 + 歷史（min/avg/max）
+
+記憶體上限 = max_devices × buckets，所有陣列在裝置首次出現時一次配置
+
+用法:
+    python tools/fleet_aggregator.py --host 127.0.0.1 --http 8080
+    python tools/fleet_aggregator.py --bench 500000      # 不連 Broker，直接量測匯入速度
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from codec import CODECS, SCHEMA_VERSION  # noqa: E402
+
+# 目前的主題格式：{MY_ID}/bedroom/temp、{MY_ID}/bedroom/humi（raw 十進位字串或 codec 編碼）
+# 以及 {ALARM_SYNC_PREFIX}/dev/{DEVICE_ID} 的鬧鐘快照
+DEFAULT_FILTERS = ['+/bedroom/temp', '+/bedroom/humi', 'nuu/csie/iot1133/alarmset/dev/+']
+FIELDS = {b'temp': 0, b'humi': 1}
+NAN = float('nan')
+
+
+def decode_value(payload):
+    """自動辨識 raw / struct / cbor / json 編碼的數值"""
+    first = payload[:1]
+    if first.isdigit() or first == b'-':
+        return float(payload)
+    if payload[0] == SCHEMA_VERSION:
+        body = CODECS['struct'].decode(payload)[0]
+    elif payload[0] == 0x85:
+        body = CODECS['cbor'].decode(payload)[0]
+    else:
+        body = CODECS['json'].decode(payload)[0]
+    return float(body['value'] if isinstance(body, dict) and 'value' in body else body)
+
+
+class FleetStore:
+    """
+    欄式儲存：每個欄位一個 array，第 row 個元素屬於第 row 台裝置；
+    歷史為每台裝置 buckets 個時間桶（環狀），每桶保存 min / sum / max / count
+    """
+
+    def __init__(self, max_devices=10000, bucket_sec=900, buckets=96):
+        self.max_devices = max_devices
+        self.bucket_sec = bucket_sec
+        self.buckets = buckets
+        self.ids = []
+        self.rows = {}
+        self.rejected_devices = 0
+
+        # 最新狀態
+        self.latest = [array('f'), array('f')]     # temp, humi
+        self.last_seen = array('d')
+        self.msg_count = array('I')
+        self.alarm_count = array('h')
+
+        # 降採樣歷史（row * buckets + slot）
+        self.h_epoch = array('i')                  # 此桶對應的時間桶編號
+        self.h_min = [array('f'), array('f')]
+        self.h_max = [array('f'), array('f')]
+        self.h_sum = [array('f'), array('f')]
+        self.h_cnt = [array('H'), array('H')]
+
+        self._topic_cache = {}
+        self.messages = 0
+        self.errors = 0
+
+    def _row(self, device_id):
+        row = self.rows.get(device_id)
+        if row is not None:
+            return row
+        if len(self.ids) >= self.max_devices:
+            self.rejected_devices += 1
+            return None
+        row = self.rows[device_id] = len(self.ids)
+        self.ids.append(device_id)
+        for a in self.latest:
+            a.append(NAN)
+        self.last_seen.append(0)
+        self.msg_count.append(0)
+        self.alarm_count.append(-1)
+        n = self.buckets
+        self.h_epoch.extend(array('i', [-1]) * n)
+        for f in range(2):
+            self.h_min[f].extend(array('f', [0.0]) * n)
+            self.h_max[f].extend(array('f', [0.0]) * n)
+            self.h_sum[f].extend(array('f', [0.0]) * n)
+            self.h_cnt[f].extend(array('H', [0]) * n)
+        return row
+
+    def _route(self, topic):
+        """主題 → (row, 欄位)，結果快取避免每則訊息重新切字串"""
+        hit = self._topic_cache.get(topic)
+        if hit is None:
+            parts = topic.split(b'/')
+            if parts[-1] in FIELDS and len(parts) == 3:
+                row = self._row(parts[0].decode())
+                hit = (row, FIELDS[parts[-1]])
+            elif len(parts) > 2 and parts[-2] == b'dev':
+                hit = (self._row(parts[-1].decode()), -1)
+            else:
+                hit = (None, None)
+            if hit[0] is not None:
+                self._topic_cache[topic] = hit
+        return hit
+
+    def ingest(self, topic, payload, now):
+        self.messages += 1
+        row, field = self._route(topic)
+        if row is None:
+            return
+        self.msg_count[row] += 1
+        self.last_seen[row] = now
+        try:
+            if field < 0:
+                snap = json.loads(payload)
+                self.alarm_count[row] = len(snap.get('alarms', ()))
+                return
+            value = decode_value(payload)
+        except (ValueError, KeyError, TypeError, IndexError):
+            self.errors += 1
+            return
+        self.latest[field][row] = value
+
+        epoch = int(now // self.bucket_sec)
+        i = row * self.buckets + epoch % self.buckets
+        cnt = self.h_cnt[field]
+        if self.h_epoch[i] != epoch:
+            # 桶子過期 → 重設（兩個欄位共用同一個時間桶）
+            self.h_epoch[i] = epoch
+            for f in range(2):
+                self.h_cnt[f][i] = 0
+        if cnt[i] == 0:
+            self.h_min[field][i] = self.h_max[field][i] = self.h_sum[field][i] = value
+        else:
+            if value < self.h_min[field][i]:
+                self.h_min[field][i] = value
+            if value > self.h_max[field][i]:
+                self.h_max[field][i] = value
+            self.h_sum[field][i] += value
+        if cnt[i] < 0xFFFF:
+            cnt[i] += 1
+
+    # ==================== 查詢 ====================
+
+    @staticmethod
+    def _num(v):
+        return None if math.isnan(v) else round(v, 2)
+
+    def device_state(self, row):
+        return {
+            'id': self.ids[row],
+            'temp': self._num(self.latest[0][row]),
+            'humi': self._num(self.latest[1][row]),
+            'last_seen': self.last_seen[row],
+            'messages': self.msg_count[row],
+            'alarms': self.alarm_count[row] if self.alarm_count[row] >= 0 else None,
+        }
+
+    def history(self, row, now):
+        out = []
+        cur = int(now // self.bucket_sec)
+        for epoch in range(cur - self.buckets + 1, cur + 1):
+            i = row * self.buckets + epoch % self.buckets
+            if self.h_epoch[i] != epoch:
+                continue
+            item = {'t': epoch * self.bucket_sec}
+            for f, name in enumerate(('temp', 'humi')):
+                c = self.h_cnt[f][i]
+                if c:
+                    item[name] = [round(self.h_min[f][i], 2), round(self.h_sum[f][i] / c, 2),
+                                  round(self.h_max[f][i], 2)]
+            out.append(item)
+        return out
+
+    def memory_bytes(self):
+        arrays = [self.last_seen, self.msg_count, self.alarm_count, self.h_epoch,
+                  *self.latest, *self.h_min, *self.h_max, *self.h_sum, *self.h_cnt]
+        return sum(a.itemsize * len(a) for a in arrays)
+
+
+class Aggregator:
+    def __init__(self, store):
+        self.store = store
+        self.started = time.time()
+        self._rate = 0.0
+        self._last_count = 0
+
+    def on_message(self, topic, payload, retained):
+        self.store.ingest(topic, payload, time.time())
+
+    async def rate_task(self):
+        while True:
+            await asyncio.sleep(5)
+            n = self.store.messages
+            self._rate = (n - self._last_count) / 5
+            self._last_count = n
+
+    def stats(self):
+        s = self.store
+        return {'devices': len(s.ids), 'messages': s.messages, 'msgs_per_sec': self._rate,
+                'errors': s.errors, 'rejected_devices': s.rejected_devices,
+                'memory_bytes': s.memory_bytes(), 'uptime': int(time.time() - self.started)}
+
+    def query(self, path):
+        s = self.store
+        if path == '/stats':
+            return 200, self.stats()
+        if path == '/devices':
+            return 200, [s.device_state(r) for r in range(len(s.ids))]
+        if path.startswith('/device/'):
+            row = s.rows.get(path[8:])
+            if row is None:
+                return 404, {'error': 'not found'}
+            state = s.device_state(row)
+            state['history'] = s.history(row, time.time())
+            return 200, state
+        return 404, {'error': 'not found'}
+
+    async def handle_http(self, reader, writer):
+        try:
+            line = await asyncio.wait_for(reader.readline(), 5)
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = line.decode().split()
+            status, body = self.query(parts[1].split('?')[0] if len(parts) > 1 else '/')
+            data = json.dumps(body).encode()
+            reason = 'OK' if status == 200 else 'Not Found'
+            writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n'
+                         f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode() + data)
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+
+async def serve(args):
+    from mqtt_lite import MqttLite
+    agg = Aggregator(FleetStore(args.max_devices, args.bucket_sec, args.buckets))
+    client = MqttLite(f'fleet-aggregator-{os.getpid()}')
+    client.on_message = agg.on_message
+    await client.connect(args.host, args.port)
+    await client.subscribe(args.filters)
+    print(f'[Aggregator] 已訂閱 {args.filters}')
+    server = await asyncio.start_server(agg.handle_http, '0.0.0.0', args.http)
+    print(f'[Aggregator] 查詢 API: http://0.0.0.0:{args.http}/stats')
+    asyncio.create_task(agg.rate_task())
+    async with server:
+        await server.serve_forever()
+
+
+def bench(args):
+    """不經網路，直接量測單核心匯入速度"""
+    store = FleetStore(args.max_devices, args.bucket_sec, args.buckets)
+    n_dev = min(args.max_devices, 5000)
+    topics = [(f'M{i:07d}/bedroom/temp'.encode(), f'M{i:07d}/bedroom/humi'.encode()) for i in range(n_dev)]
+    now = time.time()
+    start = time.perf_counter()
+    for k in range(args.bench):
+        t, h = topics[k % n_dev]
+        if k & 1:
+            store.ingest(h, b'61', now + k / 1000)
+        else:
+            store.ingest(t, b'26', now + k / 1000)
+    elapsed = time.perf_counter() - start
+    print(f'{args.bench} 則 / {n_dev} 台裝置: {args.bench / elapsed:,.0f} msgs/s, '
+          f'陣列記憶體 {store.memory_bytes() / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=1883)
+    ap.add_argument('--http', type=int, default=8080)
+    ap.add_argument('--filters', nargs='+', default=DEFAULT_FILTERS)
+    ap.add_argument('--max-devices', type=int, default=10000)
+    ap.add_argument('--bucket-sec', type=int, default=900)
+    ap.add_argument('--buckets', type=int, default=96)
+    ap.add_argument('--bench', type=int, default=0)
+    args = ap.parse_args()
+    if args.bench:
+        bench(args)
+    else:
+        asyncio.run(serve(args))
@@ -0,0 +1,73 @@
+"""
+tools/fleet_loadgen.py - 模擬多台鬧鐘發佈遙測（於電腦端 CPython 執行）
+
+以目前的主題格式 {MY_ID}/bedroom/temp、{MY_ID}/bedroom/humi 發佈 raw 十進位字串，
+可選擇同時發佈鬧鐘快照到 {prefix}/dev/{DEVICE_ID}
+
+用法:
+    python tools/fleet_loadgen.py --devices 2000 --rate 10000 --duration 30 --conns 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+from mqtt_lite import MqttLite  # noqa: E402
+
+SNAPSHOT_PREFIX = 'nuu/csie/iot1133/alarmset/dev'
+
+
+async def publisher(idx, args, devices, sent):
+    client = MqttLite(f'loadgen-{os.getpid()}-{idx}')
+    await client.connect(args.host, args.port)
+    rnd = random.Random(idx)
+    rate = args.rate / args.conns          # 每條連線的目標速率
+    temps = {d: rnd.randint(22, 30) for d in devices}
+    start = time.perf_counter()
+    n = 0
+    while time.perf_counter() - start < args.duration:
+        # 以 10 ms 為一個批次送出，維持目標速率
+        due = int((time.perf_counter() - start) * rate) - n
+        for _ in range(max(0, due)):
+            dev = devices[n % len(devices)]
+            if args.snapshot_every and n % args.snapshot_every == 0:
+                snap = {"by": dev, "vv": {dev: n}, "alarms": [{"h": 7, "m": 0, "repeat": 1, "music": 0,
+                                                               "enabled": True}]}
+                await client.publish(f'{SNAPSHOT_PREFIX}/{dev}', json.dumps(snap), retain=True)
+            elif (n // len(devices)) & 1:
+                await client.publish(f'{dev}/bedroom/humi', str(rnd.randint(40, 80)))
+            else:
+                temps[dev] += rnd.choice((-1, 0, 0, 1))
+                await client.publish(f'{dev}/bedroom/temp', str(temps[dev]))
+            n += 1
+        await asyncio.sleep(0.01)
+    sent[idx] = n
+    await client.close()
+
+
+async def main(args):
+    ids = [f'M{i:07d}' for i in range(args.devices)]
+    shards = [ids[i::args.conns] for i in range(args.conns)]
+    sent = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(publisher(i, args, shards[i], sent) for i in range(args.conns) if shards[i]))
+    elapsed = time.perf_counter() - start
+    total = sum(sent.values())
+    print(f'{args.devices} 台裝置 / {args.conns} 條連線：送出 {total} 則，{total / elapsed:,.0f} msgs/s')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=1883)
+    ap.add_argument('--devices', type=int, default=1000)
+    ap.add_argument('--rate', type=float, default=1000, help='總發佈速率 (msgs/s)')
+    ap.add_argument('--duration', type=float, default=10)
+    ap.add_argument('--conns', type=int, default=4)
+    ap.add_argument('--snapshot-every', type=int, default=0, help='每 N 則改送一次鬧鐘快照，0 表示不送')
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,172 @@
+"""
+tools/fleet_sync_sim.py - 多台鬧鐘同步模擬（於電腦端 CPython 執行）
+
+以行程內模擬的 Broker（含 retain 與傳遞延遲）跑 N 台裝置的 AlarmSync，
+量測收斂時間與傳輸位元組數
+
+情境:
+    1. 一台裝置推送整份排程（replace）
+    2. 多台裝置同時各自異動（產生衝突）
+    3. 新開機的裝置從 retain 快照取得最新狀態
+
+用法: python tools/fleet_sync_sim.py [裝置數]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from alarm_ops import apply_ops  # noqa: E402
+from alarm_sync import AlarmSync  # noqa: E402
+
+SNAP = 'alarmset/grp/sim'
+DELTA = SNAP + '/delta'
+LATENCY_MS = (5, 30)          # 每一跳的傳遞延遲範圍
+SNAPSHOT_DELAY = 0.2          # 對應 ALARM_SYNC_SNAPSHOT_DELAY_SEC（縮短以加快模擬）
+
+
+class SimBroker:
+    def __init__(self, rnd):
+        self.rnd = rnd
+        self.subs = {}
+        self.retained = {}
+        self.bytes_out = 0     # 裝置 → Broker
+        self.bytes_in = 0      # Broker → 裝置
+        self.messages = 0
+        self.inflight = 0
+
+    def subscribe(self, topic, dev):
+        self.subs.setdefault(topic, []).append(dev)
+        if topic in self.retained:
+            self._deliver(dev, topic, self.retained[topic], True)
+
+    def publish(self, topic, payload, retain=False):
+        self.bytes_out += len(payload)
+        self.messages += 1
+        if retain:
+            self.retained[topic] = payload
+        for dev in self.subs.get(topic, ()):
+            self._deliver(dev, topic, payload, False)
+
+    def _deliver(self, dev, topic, payload, retained):
+        self.bytes_in += len(payload)
+        self.inflight += 1
+        delay = self.rnd.uniform(*LATENCY_MS) / 1000
+        asyncio.get_running_loop().call_later(delay, self._arrive, dev, topic, payload, retained)
+
+    def _arrive(self, dev, topic, payload, retained):
+        self.inflight -= 1
+        dev.on_message(topic, payload, retained)
+
+
+class SimDevice:
+    def __init__(self, device_id, broker):
+        self.id = device_id
+        self.broker = broker
+        self.sync = AlarmSync(device_id)
+        self.alarms = []
+        self._snapshot_pending = False
+
+    def join(self):
+        self.broker.subscribe(SNAP, self)
+        self.broker.subscribe(DELTA, self)
+
+    def mutate(self, ops):
+        self.alarms = apply_ops(self.alarms, ops)
+        delta = self.sync.local_change(ops)
+        self.broker.publish(DELTA, json.dumps(delta).encode())
+        self.schedule_snapshot()
+
+    def schedule_snapshot(self):
+        if not self._snapshot_pending:
+            self._snapshot_pending = True
+            asyncio.get_running_loop().call_later(SNAPSHOT_DELAY, self._publish_snapshot)
+
+    def _publish_snapshot(self):
+        self._snapshot_pending = False
+        payload = json.dumps(self.sync.snapshot(self.alarms)).encode()
+        self.broker.publish(SNAP, payload, retain=True)
+
+    def on_message(self, topic, payload, retained):
+        msg = json.loads(payload)
+        if topic == DELTA:
+            new = self.sync.on_delta(self.alarms, msg)
+            if new is not None:
+                self.alarms = new
+        else:
+            new, republish = self.sync.on_snapshot(self.alarms, msg, retained)
+            if new is not None:
+                self.alarms = new
+            if republish:
+                self.schedule_snapshot()
+
+
+def converged(devices):
+    ref = devices[0]
+    return all(d.alarms == ref.alarms and d.sync.vv == ref.sync.vv for d in devices)
+
+
+async def wait_converged(devices, broker, timeout=10):
+    """等到所有裝置狀態一致（收斂時間），再等訊息全部送達才回傳"""
+    start = time.perf_counter()
+    elapsed = None
+    while time.perf_counter() - start < timeout:
+        await asyncio.sleep(0.005)
+        same = converged(devices)
+        if same and elapsed is None:
+            elapsed = time.perf_counter() - start
+        elif not same:
+            elapsed = None
+        if same and not broker.inflight and not any(d._snapshot_pending for d in devices):
+            return elapsed
+    return None
+
+
+def random_alarm(rnd):
+    return {"h": rnd.randrange(24), "m": rnd.randrange(60), "repeat": rnd.randrange(2),
+            "music": rnd.randrange(4), "enabled": True}
+
+
+async def run_case(label, broker, devices, action):
+    b_out, b_in, msgs = broker.bytes_out, broker.bytes_in, broker.messages
+    action()
+    elapsed = await wait_converged(devices, broker)
+    result = f'{elapsed * 1000:8.1f} ms' if elapsed is not None else '  未收斂'
+    print(f'{label:<22}{result}  發佈 {broker.messages - msgs:5d} 則  '
+          f'上行 {broker.bytes_out - b_out:8d} B  下行 {broker.bytes_in - b_in:9d} B')
+
+
+async def main(n):
+    rnd = random.Random(33)
+    broker = SimBroker(rnd)
+    devices = [SimDevice(f'iot{i:03d}', broker) for i in range(n)]
+    for d in devices:
+        d.join()
+    print(f'裝置數: {n}，傳遞延遲 {LATENCY_MS[0]}~{LATENCY_MS[1]} ms，快照延遲 {SNAPSHOT_DELAY * 1000:.0f} ms')
+
+    schedule = [random_alarm(rnd) for _ in range(10)]
+    await run_case('1. 推送整份排程', broker, devices,
+                   lambda: devices[0].mutate([{"op": "replace", "alarms": schedule}]))
+
+    await run_case('   單一異動 (toggle)', broker, devices,
+                   lambda: devices[1].mutate([{"op": "toggle", "idx": 0}]))
+
+    def concurrent_edits():
+        for d in rnd.sample(devices, 5):
+            d.mutate([{"op": "add", **random_alarm(rnd)}])
+    await run_case('2. 5 台同時異動', broker, devices, concurrent_edits)
+
+    fresh = SimDevice('iot-new', broker)
+    devices.append(fresh)
+    await run_case('3. 新裝置開機', broker, devices, fresh.join)
+
+    conflicts = sum(d.sync.conflicts for d in devices)
+    print(f'最終鬧鐘數: {len(devices[0].alarms)}，衝突處理次數: {conflicts}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100))
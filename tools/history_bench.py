@@ -0,0 +1,190 @@
+"""
+tools/history_bench.py - 溫濕度分層歷史的量測（於電腦端 CPython 執行）
+
+以合成的溫濕度（日夜變化 + 雜訊）每 2 秒一筆灌入 history.TieredHistory 一個月，
+依 HISTORY_CHECKPOINT_SEC 定期寫入檢查點，並列出：
+    1. 記憶體預算（以 MicroPython 32 位元 array 的元素大小計算）
+    2. 檢查點成本：每次寫入的記錄數 / 位元組、耗時，以及每天寫入 Flash 的量
+    3. 重開機還原：耗時，以及還原後的內容是否與寫入前一致
+    4. /history 查詢：1h / 24h / 30d × json / bin 經 http_server.send_chunked 送出的
+       耗時、回應大小與送出過程的記憶體峰值（tracemalloc）
+
+電腦的檔案系統與 CPU 都比裝置快得多，耗時只供相對比較；實機請看 /metrics 的
+task_run_ms{task="history_checkpoint"} 與 http_handler_ms{path="/history"}
+
+用法:
+    python tools/history_bench.py --days 31
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+import http_server as http  # noqa: E402
+from history import TieredHistory, parse_range  # noqa: E402
+from sensor import SensorHistory  # noqa: E402
+
+DEVICE_ITEMSIZE = {'L': 4, 'h': 2, 'B': 1}     # MicroPython（32 位元）array 的元素大小
+START = 820454400                              # 2026-01-01 00:00（MicroPython 的 2000 年紀元）
+
+
+class FakeWriter:
+    def __init__(self):
+        self.size = 0
+        self.data = bytearray()
+
+    def write(self, b):
+        self.size += len(b)
+        self.data += b
+
+    async def drain(self):
+        pass
+
+
+def make(path):
+    interval = config.DHT11_POLL_INTERVAL_SEC
+    raw = SensorHistory(config.DHT_HISTORY)
+    return TieredHistory(raw, config.DHT_HISTORY * interval, config.HISTORY_MINUTE_SLOTS,
+                         config.HISTORY_QUARTER_SLOTS, path)
+
+
+def array_bytes(*arrays):
+    return sum(len(a) * DEVICE_ITEMSIZE[a.typecode] for a in arrays)
+
+
+def dechunk(raw):
+    head, _, data = bytes(raw).partition(b'\r\n\r\n')
+    out = bytearray()
+    while data:
+        size, _, data = data.partition(b'\r\n')
+        size = int(size, 16)
+        if not size:
+            break
+        out += data[:size]
+        data = data[size + 2:]
+    return head.decode(), bytes(out)
+
+
+def fill(h, days, rnd):
+    """回傳 (結束時間, 各次檢查點 [(記錄數, 秒)])"""
+    interval = config.DHT11_POLL_INTERVAL_SEC
+    every = config.HISTORY_CHECKPOINT_SEC
+    cps = []
+    ts = START
+    end = START + int(days * 86400)
+    while ts < end:
+        day = (ts - START) / 86400 * 2 * math.pi
+        temp = 24 + 3 * math.sin(day) + rnd.gauss(0, 0.2)
+        humi = 60 - 8 * math.sin(day) + rnd.gauss(0, 0.5)
+        h.raw.push(ts, temp, humi, 0)
+        h.add(ts, temp, humi)
+        ts += interval
+        if (ts - START) % every == 0:
+            t0 = time.perf_counter()
+            n = h.checkpoint()
+            cps.append((n, time.perf_counter() - t0))
+    return ts, cps
+
+
+async def query(h, rng, fmt, now):
+    seconds = parse_range(rng)
+    req = http.Request('GET', '/history', {'range': rng}, 'HTTP/1.1', {}, b'')
+    w = FakeWriter()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if fmt == 'bin':
+        name, step, row_fmt, fields = h.bin_format(seconds)
+        await http.send_chunked(req, w, h.bin_parts(seconds, now), 'application/octet-stream',
+                                {'X-Tier': name, 'X-Format': row_fmt})
+    else:
+        await http.send_chunked(req, w, h.json_parts(seconds, now))
+    dt = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    head, body = dechunk(w.data)
+    if fmt == 'bin':
+        row_fmt = head.split('X-Format: ')[1].split('\r\n')[0]
+        rows = len(body) // struct.calcsize(row_fmt)
+        assert len(body) % struct.calcsize(row_fmt) == 0
+    else:
+        rows = len(json.loads(body)['rows'])
+    tier = head.split('X-Tier: ')[1].split('\r\n')[0] if fmt == 'bin' else json.loads(body)['tier']
+    # 扣掉 FakeWriter 自己保存整份回應的 bytearray
+    return tier, rows, len(body), dt, max(0, peak - len(w.data))
+
+
+async def main(args):
+    rnd = random.Random(args.seed)
+    tmp = tempfile.mkdtemp()
+    path = os.path.join(tmp, 'history.bin')
+    h = make(path)
+
+    print('== 記憶體預算（裝置上的 array，開機時一次配置） ==')
+    raw = h.raw
+    rows = [('raw（{} 筆 × {} 秒）'.format(raw.capacity, config.DHT11_POLL_INTERVAL_SEC),
+             array_bytes(raw.ts, raw.temp, raw.humi, raw.flags))]
+    for t in h.tiers:
+        rows.append(('{}（{} 筆，涵蓋 {:g} 天）'.format(t.name, t.capacity, t.span / 86400), array_bytes(t.ts, t.vals)))
+    for label, n in rows:
+        print(f'  {label:<28}{n:>8,} B')
+    print(f'  {"合計":<28}{sum(n for _, n in rows):>8,} B；檢查點檔 {h.file_size:,} B（固定大小）')
+
+    t0 = time.perf_counter()
+    now, cps = fill(h, args.days, rnd)
+    print(f'\n灌入 {args.days:g} 天（{(now - START) // config.DHT11_POLL_INTERVAL_SEC:,} 筆）'
+          f'耗時 {time.perf_counter() - t0:.1f} 秒')
+
+    print(f'\n== 檢查點（每 {config.HISTORY_CHECKPOINT_SEC} 秒） ==')
+    recs = [n for n, _ in cps]
+    secs = sorted(s for _, s in cps)
+    per_day = sum(recs) / args.days * 20
+    print(f'  {len(cps)} 次，每次 {min(recs)}–{max(recs)} 筆（平均 {sum(recs) / len(recs):.1f}，'
+          f'每筆 20 B）；耗時 p50 {secs[len(secs) // 2] * 1000:.3f} ms / max {secs[-1] * 1000:.3f} ms')
+    print(f'  每天寫入 Flash {per_day:,.0f} B（約 {per_day / 4096:.2f} 個 4 KB 區塊），只寫新增的記錄')
+
+    print('\n== 重開機還原 ==')
+    h.checkpoint()
+    h2 = make(path)
+    t0 = time.perf_counter()
+    n = h2.restore()
+    dt = time.perf_counter() - t0
+    same = all(list(a.rows(partial=False)) == list(b.rows(partial=False)) for a, b in zip(h.tiers, h2.tiers))
+    print(f'  還原 {n:,} 筆，耗時 {dt * 1000:.1f} ms；與寫入前{"一致" if same else "不一致"}')
+    # 還原後繼續寫入：新記錄要接在最新一筆之後，再還原一次仍一致
+    for k in range(3):
+        h2.add(now + k * 900, 24, 60)
+    written = h2.checkpoint()
+    h3 = make(path)
+    h3.restore()
+    resumed = all(list(a.rows(partial=False)) == list(b.rows(partial=False)) for a, b in zip(h2.tiers, h3.tiers))
+    print(f'  還原後續寫 {written} 筆再還原：{"一致" if resumed else "不一致"}')
+
+    print('\n== /history 查詢（經 send_chunked，FakeWriter） ==')
+    print(f'  {"range":<6}{"格式":<6}{"層級":<6}{"列數":>6}{"內容":>10}{"耗時":>10}{"峰值記憶體":>12}')
+    for rng in ('1h', '24h', '30d'):
+        for fmt in ('json', 'bin'):
+            tier, nrows, size, dt, peak = await query(h, rng, fmt, now)
+            print(f'  {rng:<6}{fmt:<6}{tier:<6}{nrows:>6}{size:>9,} B{dt * 1000:>8.1f} ms{peak:>10,} B')
+
+    os.remove(path)
+    os.rmdir(tmp)
+    if not same or not resumed:
+        print('失敗：還原內容與寫入前不一致，或還原後續寫位置錯誤')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--days', type=float, default=31)
+    ap.add_argument('--seed', type=int, default=48)
+    asyncio.run(main(ap.parse_args()))
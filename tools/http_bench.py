@@ -0,0 +1,191 @@
+"""
+tools/http_bench.py - HTTP 請求速率量測（於電腦端 CPython 執行）
+
+以 asyncio 同時開多條連線反覆發送請求，統計 requests/sec、延遲分佈與
+新建 TCP 連線數（對應 lwIP 的 socket 建立 / 回收次數）
+
+用法:
+    python tools/http_bench.py --host 192.168.1.50 --paths /env /time /alarms   # 量測實機
+    python tools/http_bench.py --host 192.168.1.50 --keepalive                  # 實機，重用連線
+    python tools/http_bench.py --local                                          # 本機比較新舊路由與 keep-alive
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import http_server as http  # noqa: E402
+
+# 模擬瀏覽器送出的標頭（Referer 為首頁上的 /env 輪詢，會誤觸舊版子字串路由）
+HEADERS = ('Host: {host}\r\nUser-Agent: Mozilla/5.0 (X11; Linux x86_64) http_bench\r\n'
+           'Accept: */*\r\nAccept-Language: zh-TW,zh;q=0.9,en;q=0.8\r\n'
+           'Referer: http://{host}/env\r\nConnection: {conn}\r\n\r\n')
+
+
+async def read_response(reader):
+    """讀取一個回應；有 Content-Length 時只讀該長度（連線可重用），否則讀到連線關閉"""
+    status = await reader.readline()
+    if not status:
+        raise ConnectionError('連線已關閉')
+    length, close = None, False
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        name = name.strip().lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection' and value.strip().lower() == 'close':
+            close = True
+    body = await reader.readexactly(length) if length is not None else await reader.read()
+    return status, body, close or length is None
+
+
+async def worker(args, stats, deadline):
+    conn = 'keep-alive' if args.keepalive else 'close'
+    reader = writer = None
+    i = 0
+    while time.perf_counter() < deadline:
+        path = args.paths[i % len(args.paths)]
+        i += 1
+        t0 = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(args.host, args.port)
+                stats['connects'] += 1
+            writer.write(('GET {} HTTP/1.1\r\n'.format(path) + HEADERS.format(host=args.host, conn=conn)).encode())
+            await writer.drain()
+            status, _, close = await read_response(reader)
+        except (ConnectionError, OSError, asyncio.IncompleteReadError):
+            stats['errors'] += 1
+            close, status = True, b''
+        if close:
+            writer.close()
+            reader = writer = None
+        if status.startswith(b'HTTP/1.1 200'):
+            stats['latencies'].append(time.perf_counter() - t0)
+        elif status:
+            stats['errors'] += 1
+    if writer is not None:
+        writer.close()
+
+
+async def run(args):
+    stats = {'latencies': [], 'errors': 0, 'connects': 0}
+    deadline = time.perf_counter() + args.duration
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(args, stats, deadline) for _ in range(args.conns)))
+    elapsed = time.perf_counter() - start
+    latencies = sorted(stats['latencies'])
+    n = len(latencies)
+    pct = (lambda q: latencies[min(n - 1, int(n * q))] * 1000) if n else (lambda q: 0)
+    return {'requests': n, 'errors': stats['errors'], 'rps': n / elapsed,
+            'p50_ms': pct(0.5), 'p99_ms': pct(0.99),
+            'connects': stats['connects'], 'connects_per_sec': stats['connects'] / elapsed}
+
+
+def report(label, r):
+    print(f'{label:<14}{r["rps"]:9,.0f} req/s  p50 {r["p50_ms"]:6.2f} ms  p99 {r["p99_ms"]:6.2f} ms  '
+          f'新連線 {r["connects_per_sec"]:8,.1f}/s ({r["connects"] / max(1, r["requests"]):.2f}/請求)  '
+          f'錯誤 {r["errors"]}')
+
+
+# ==================== 本機比較 ====================
+
+STATE = {'env': {'temp': 26, 'humi': 61, 'ip': '127.0.0.1'}, 'alarms': [{'h': 7, 'm': 0}]}
+
+
+async def legacy_handler(reader, writer):
+    """舊版：讀一次 1 KB，以子字串判斷路由"""
+    try:
+        req = (await reader.read(1024)).decode()
+        if '/env' in req:
+            res = json.dumps(STATE['env'])
+        elif '/time' in req:
+            res = json.dumps({'s': int(time.time())})
+        elif '/alarms' in req:
+            res = json.dumps({'alarms': STATE['alarms']})
+        else:
+            res = ''
+        writer.write(('HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n\r\n' + res).encode())
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+def make_router():
+    routes = http.Router()
+
+    async def env(req, writer):
+        await http.reply(req, writer, 200, json.dumps(STATE['env']))
+
+    async def now(req, writer):
+        await http.reply(req, writer, 200, json.dumps({'s': int(time.time())}))
+
+    async def alarms(req, writer):
+        await http.reply(req, writer, 200, json.dumps({'alarms': STATE['alarms']}))
+
+    routes.add('/env', env)
+    routes.add('/time', now)
+    routes.add('/alarms', alarms)
+    return routes
+
+
+def make_handler(routes):
+    async def handler(reader, writer):
+        try:
+            await routes.serve(reader, writer, idle_timeout=5, max_requests=100)
+        finally:
+            writer.close()
+    return handler
+
+
+async def check_routing(args):
+    """確認 Referer 含 /env 時，/alarms 仍回傳鬧鐘清單"""
+    reader, writer = await asyncio.open_connection(args.host, args.port)
+    writer.write(('GET /alarms HTTP/1.1\r\n' + HEADERS.format(host=args.host, conn='close')).encode())
+    await writer.drain()
+    data = await reader.read()
+    writer.close()
+    return b'"alarms"' in data
+
+
+async def local(args):
+    args.host = '127.0.0.1'
+    cases = (('舊版', legacy_handler, False),
+             ('路由表', make_handler(make_router()), False),
+             ('路由表+keep-alive', make_handler(make_router()), True))
+    for label, handler, keepalive in cases:
+        server = await asyncio.start_server(handler, args.host, 0)
+        args.port = server.sockets[0].getsockname()[1]
+        args.keepalive = keepalive
+        ok = await check_routing(args)
+        r = await run(args)
+        report(label, r)
+        print(f'{"":<14}Referer 含 /env 時 /alarms 路由 {"正確" if ok else "錯誤"}')
+        server.close()
+        await server.wait_closed()
+
+
+async def main(args):
+    if args.local:
+        await local(args)
+    else:
+        report(args.host, await run(args))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=80)
+    ap.add_argument('--paths', nargs='+', default=['/env', '/time', '/alarms'])
+    ap.add_argument('--conns', type=int, default=4, help='同時連線數')
+    ap.add_argument('--duration', type=float, default=5)
+    ap.add_argument('--keepalive', action='store_true', help='重用連線（HTTP/1.1 keep-alive）')
+    ap.add_argument('--local', action='store_true', help='不連實機，在本機比較舊版與路由表')
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,380 @@
+"""
+tools/http_harness.py - alarm_clock HTTP 伺服器的本機負載測試（於電腦端 CPython 執行）
+
+以子行程匯入真正的 alarm_clock（硬體模組以 sys.modules 替身取代，不啟動裝置主程式），
+用 handle_client 與 config 中相同的 admission / 期限 / 連線上限在 localhost 開 socket，
+再以真實的 asyncio 連線重播各種流量：
+    pollers     8 個分頁：載入 index.html 後每 100 ms 抓一次 /state（帶 If-None-Match）
+    mutations   4 個分頁輪詢 + 4 個客戶端連續異動（/add、/switch、/delete、POST /alarms/batch）
+    slow        4 個分頁輪詢 + 40 個慢速 / 閒置連線
+    oversized   4 個分頁輪詢 + 不斷送出過大內容、過長標頭、過多標頭與格式錯誤的請求
+每個情境統計正常請求的 p50 / p99 延遲、吞吐量、狀態碼分佈與伺服器端記憶體峰值
+（tracemalloc，對應裝置的 gc.mem_alloc），結果寫成 JSON；給 --baseline 時與舊結果比對，
+有退步則以非零狀態結束
+
+用法:
+    python tools/http_harness.py                               # 全部情境，結果寫到 http_harness.json
+    python tools/http_harness.py --baseline old.json            # 與先前結果比對
+    python tools/http_harness.py --scenarios pollers slow -d 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SCENARIOS = ('pollers', 'mutations', 'slow', 'oversized')
+
+# 退步判定：p99 超過基準 × 1.5 + 5 ms、吞吐量低於基準 × 0.7、記憶體峰值超過基準 × 1.25
+P99_FACTOR, P99_SLACK_MS = 1.5, 5
+RPS_FACTOR = 0.7
+MEM_FACTOR = 1.25
+
+
+# ==================== 伺服器（子行程） ====================
+
+class Stub:
+    """硬體替身：任何屬性與呼叫都回傳替身本身"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __call__(self, *args, **kwargs):
+        return Stub()
+
+    def __getattr__(self, name):
+        return Stub()
+
+
+def install_stubs():
+    import types
+    import asyncio as real
+
+    ua = types.ModuleType('uasyncio')
+    ua.__dict__.update({k: getattr(real, k) for k in dir(real) if not k.startswith('__')})
+    ua.sleep_ms = lambda ms: real.sleep(ms / 1000)
+    ua.wait_for_ms = lambda aw, ms: real.wait_for(aw, ms / 1000)
+    ua.run = lambda coro: coro.close()      # alarm_clock 匯入時會執行 asyncio.run(main())：不啟動裝置主程式
+    sys.modules['uasyncio'] = ua
+    sys.modules['ujson'] = json
+    for name in ('network', 'dht', 'machine', 'ssd1306', 'bitmap_font_tool', 'DebounceButton', 'mqtt_as'):
+        mod = types.ModuleType(name)
+        mod.__getattr__ = lambda attr: Stub()
+        sys.modules[name] = mod
+    sys.modules['mqtt_as'].config = {}
+
+
+async def serve():
+    import tracemalloc
+
+    # 在暫存目錄執行：alarm.txt 寫在這裡，web/ 指向專案內的網頁
+    work = tempfile.mkdtemp()
+    os.symlink(os.path.join(ROOT, 'web'), os.path.join(work, 'web'))
+    os.chdir(work)
+    sys.path.insert(0, ROOT)
+    install_stubs()
+    import alarm_clock as ac
+
+    ac.load_alarms()
+    ac.notify_alarms()
+    ac.notify_env()
+
+    async def handler(reader, writer):
+        try:
+            await ac.handle_client(reader, writer)
+        except asyncio.CancelledError:
+            pass        # 結束時仍開著的 keep-alive 連線會被取消
+        finally:
+            writer.close()      # handle_client 以 writer.aclose() 關閉，CPython 的 StreamWriter 沒有這個方法
+
+    lag = asyncio.create_task(ac.loop_lag.run())
+    server = await asyncio.start_server(handler, '127.0.0.1', 0, backlog=256)
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    print('PORT', server.sockets[0].getsockname()[1], flush=True)
+
+    await asyncio.get_running_loop().run_in_executor(None, sys.stdin.read)   # 主行程關閉 stdin 即結束
+    current, peak = tracemalloc.get_traced_memory()
+    stats = {
+        'cpu_sec': round(time.process_time() - cpu0, 3),
+        'wall_sec': round(time.perf_counter() - wall0, 3),
+        'peak_kb': round((peak - base) / 1024, 1),
+        'end_kb': round((current - base) / 1024, 1),
+        'requests': ac.routes.requests,
+        'connections': ac.routes.connections,
+        'peak_open': ac.routes.peak_open,
+        'refused': ac.routes.refused,
+        'timeouts': ac.routes.timeouts,
+        'admission_rejected': ac.admission.rejected,
+        'admission_shed': ac.admission.shed,
+        'loop_lag_max_ms': ac.loop_lag.max_ms,
+        'alarms': len(ac.alarms),
+    }
+    lag.cancel()
+    server.close()
+    print('STATS', json.dumps(stats), flush=True)
+
+
+# ==================== 客戶端 ====================
+
+class Client:
+    """單一 keep-alive 連線；伺服器要求關閉時自動重連"""
+
+    def __init__(self, port, stats):
+        self.port = port
+        self.stats = stats
+        self.reader = self.writer = None
+
+    async def request(self, method, path, body=b'', headers=''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        t0 = time.perf_counter()
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: harness\r\nContent-Length: {len(body)}\r\n'
+                          f'{headers}\r\n'.encode() + body)
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            self.close()
+            raise ConnectionResetError('伺服器關閉連線')
+        status = int(line.split()[1])
+        hdrs = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode().partition(':')
+            hdrs[name.strip().lower()] = value.strip()
+        if hdrs.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int(await self.reader.readline(), 16)
+                await self.reader.readexactly(size + 2)
+                if not size:
+                    break
+        else:
+            await self.reader.readexactly(int(hdrs.get('content-length', 0)))
+        self.stats.record(status, time.perf_counter() - t0)
+        if hdrs.get('connection') == 'close':
+            self.close()
+        return status, hdrs
+
+    def close(self):
+        if self.writer:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Stats:
+    def __init__(self):
+        self.latency = []
+        self.status = {}
+        self.errors = 0
+
+    def record(self, status, sec):
+        self.status[status] = self.status.get(status, 0) + 1
+        if status in (200, 304):
+            self.latency.append(sec)
+
+
+async def until(deadline, body, pause=0.05):
+    """重複執行 body 直到期限；連線錯誤記一次並稍後重試"""
+    while time.perf_counter() < deadline:
+        try:
+            await body()
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+            await asyncio.sleep(pause)
+
+
+async def poller(port, deadline, stats, poll_sec):
+    c = Client(port, stats)
+    etag = [None]
+
+    async def page():
+        await c.request('GET', '/', headers='Accept-Encoding: gzip\r\n')
+        for _ in range(10):
+            cond = f'If-None-Match: {etag[0]}\r\n' if etag[0] else ''
+            status, hdrs = await c.request('GET', '/state', headers=cond)
+            if status == 200:
+                etag[0] = hdrs.get('etag')
+            await asyncio.sleep(poll_sec)
+    await until(deadline, page)
+    c.close()
+
+
+async def mutator(port, deadline, stats, k):
+    c = Client(port, stats)
+    n = [0]
+
+    async def burst():
+        for i in range(20):
+            n[0] += 1
+            if i % 5 == 4:
+                ops = [{'op': 'add', 'h': (k + j) % 24, 'm': j, 'repeat': 0, 'music': 0} for j in range(10)]
+                await c.request('POST', '/alarms/batch', json.dumps({'ops': ops}).encode(),
+                                'Content-Type: application/json\r\n')
+            elif i % 5 == 3:
+                await c.request('GET', '/delete?id=0')
+            elif i % 5 == 2:
+                await c.request('GET', '/switch?id=0')
+            else:
+                await c.request('GET', f'/add?h={k % 24}&m={n[0] % 60}&repeat=1&music=0')
+        await asyncio.sleep(0.3)
+    await until(deadline, burst)
+    c.close()
+
+
+async def slow_client(port, deadline, k):
+    async def hold():
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        try:
+            if k % 2:
+                writer.write(b'GET /state HTTP/1.1\r\n')          # slowloris：標頭一個位元組一個位元組送
+                while time.perf_counter() < deadline and not reader.at_eof():
+                    writer.write(b'X')
+                    await writer.drain()
+                    await asyncio.sleep(0.2)
+            else:
+                await asyncio.wait_for(reader.read(), max(0.01, deadline - time.perf_counter()))   # 閒置
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            writer.close()
+        await asyncio.sleep(0.2)
+    await until(deadline, hold, 0.2)
+
+
+BAD_REQUESTS = (
+    b'POST /alarms/batch HTTP/1.1\r\nHost: h\r\nContent-Length: 200000\r\n\r\n' + b'x' * 1024,   # 內容過大
+    b'GET /state HTTP/1.1\r\nHost: h\r\nX-Big: ' + b'a' * 4096 + b'\r\n\r\n',                   # 標頭過長
+    b'GET /state HTTP/1.1\r\n' + b''.join(b'X-%d: 1\r\n' % i for i in range(64)) + b'\r\n',      # 標頭過多
+    b'\x16\x03\x01garbage\r\n\r\n',                                                              # 非 HTTP（TLS 握手）
+    b'GET /' + b'a' * 4096 + b' HTTP/1.1\r\n\r\n',                                                  # 請求列過長
+)
+
+
+async def bad_client(port, deadline, stats, k):
+    async def send_bad():
+        data = BAD_REQUESTS[(stats.errors + k) % len(BAD_REQUESTS)]
+        stats.errors += 1
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(data)
+        try:
+            await writer.drain()
+            line = await asyncio.wait_for(reader.readline(), 2)
+            code = int(line.split()[1]) if line else 0
+        except (asyncio.TimeoutError, ConnectionError):
+            code = 0
+        stats.status[code] = stats.status.get(code, 0) + 1
+        writer.close()
+        await asyncio.sleep(0.02)
+    await until(deadline, send_bad)
+
+
+# ==================== 執行 ====================
+
+def pct(sorted_ms, q):
+    return sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))] if sorted_ms else None
+
+
+async def run_scenario(name, args):
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve'],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    line = ''
+    while not line.startswith('PORT'):          # alarm_clock 匯入時的 print 也會出現在 stdout
+        line = proc.stdout.readline()
+        if not line:
+            raise RuntimeError('伺服器子行程啟動失敗')
+    port = int(line.split()[1])
+    good, bad = Stats(), Stats()
+    deadline = time.perf_counter() + args.duration
+    pollers = 8 if name == 'pollers' else 4
+    tasks = [poller(port, deadline, good, args.poll_ms / 1000) for _ in range(pollers)]
+    if name == 'mutations':
+        tasks += [mutator(port, deadline, good, k) for k in range(4)]
+    elif name == 'slow':
+        tasks += [slow_client(port, deadline, k) for k in range(40)]
+    elif name == 'oversized':
+        tasks += [bad_client(port, deadline, bad, k) for k in range(4)]
+    t0 = time.perf_counter()
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - t0
+    out, _ = proc.communicate('')
+    server = json.loads([x for x in out.splitlines() if x.startswith('STATS')][-1][6:])
+
+    ms = sorted(x * 1000 for x in good.latency)
+    result = {
+        'requests': len(ms),
+        'rps': round(len(ms) / elapsed, 1),
+        'p50_ms': round(pct(ms, 0.5), 2) if ms else None,
+        'p99_ms': round(pct(ms, 0.99), 2) if ms else None,
+        'max_ms': round(ms[-1], 2) if ms else None,
+        'status': {str(k): v for k, v in sorted(good.status.items())},
+        'server': server,
+    }
+    if bad.status:
+        result['bad_status'] = {str(k): v for k, v in sorted(bad.status.items())}
+    return result
+
+
+def compare(results, baseline):
+    problems = []
+    for name, r in results.items():
+        b = baseline.get('scenarios', {}).get(name)
+        if not b or not b.get('p99_ms') or not r.get('p99_ms'):
+            continue
+        if r['p99_ms'] > b['p99_ms'] * P99_FACTOR + P99_SLACK_MS:
+            problems.append(f'{name}: p99 {b["p99_ms"]} → {r["p99_ms"]} ms')
+        if r['rps'] < b['rps'] * RPS_FACTOR:
+            problems.append(f'{name}: 吞吐量 {b["rps"]} → {r["rps"]} req/s')
+        if r['server']['peak_kb'] > b['server']['peak_kb'] * MEM_FACTOR:
+            problems.append(f'{name}: 記憶體峰值 {b["server"]["peak_kb"]} → {r["server"]["peak_kb"]} KB')
+    return problems
+
+
+async def main(args):
+    results = {}
+    print(f'每個情境 {args.duration:.1f} 秒，輪詢間隔 {args.poll_ms} ms')
+    for name in args.scenarios:
+        r = results[name] = await run_scenario(name, args)
+        s = r['server']
+        print(f'{name:<10} p50 {r["p50_ms"]:6.2f} ms  p99 {r["p99_ms"]:7.2f} ms  {r["rps"]:7.1f} req/s  '
+              f'峰值 {s["peak_kb"]:7.1f} KB  CPU {s["cpu_sec"]:5.2f} s  狀態 {r["status"]}'
+              + (f'  惡意請求 {r["bad_status"]}' if 'bad_status' in r else ''))
+        print(f'{"":<10} 連線 {s["connections"]} (峰值 {s["peak_open"]})  滿載拒絕 {s["refused"]}  '
+              f'逾時 {s["timeouts"]}  admission 拒絕 {s["admission_rejected"]}/{s["admission_shed"]}  '
+              f'迴圈延遲 max {s["loop_lag_max_ms"]} ms')
+
+    doc = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'duration_sec': args.duration,
+           'python': sys.version.split()[0], 'scenarios': results}
+    with open(args.out, 'w') as f:
+        json.dump(doc, f, indent=2, ensure_ascii=False)
+    print(f'結果已寫入 {args.out}')
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(results, json.load(f))
+        for p in problems:
+            print('退步:', p)
+        if problems:
+            sys.exit(1)
+        print(f'與 {args.baseline} 比較：沒有退步')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    ap.add_argument('-d', '--duration', type=float, default=1.5, help='每個情境的秒數')
+    ap.add_argument('--poll-ms', type=int, default=100, help='分頁輪詢 /state 的間隔')
+    ap.add_argument('--out', default='http_harness.json', help='結果 JSON 檔')
+    ap.add_argument('--baseline', help='先前的結果 JSON，用來判定退步')
+    ap.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.serve:
+        asyncio.run(serve())
+    else:
+        asyncio.run(main(args))
@@ -0,0 +1,186 @@
+"""
+tools/http_stress.py - HTTP 過載壓力測試（於電腦端 CPython 執行）
+
+在同一個事件迴圈上同時執行 http_server 與模擬鬧鐘排程，兩種情境：
+    slow   200 個慢速客戶端：slowloris（送出請求列後每 200 ms 才送一個標頭位元組）
+           與 idle（連上後什麼都不送）各半
+    busy   50 個 keep-alive 客戶端連續請求 /alarms（handler 模擬裝置上的序列化耗時）
+每個情境比較「不設限」與「config 的 admission / 期限 / 連線上限 / 迴圈延遲預算」，
+統計鬧鐘觸發時間的延遲分佈；保護模式的 p99 延遲超過門檻時以非零狀態結束
+
+用法:
+    python tools/http_stress.py --clients 200 --busy 50 --duration 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+import http_server as http  # noqa: E402
+from looplag import LagMonitor  # noqa: E402
+
+ALARM_PERIOD = 0.25        # 每 250 ms 安排一次「鬧鐘」
+REQ = b'GET /alarms HTTP/1.1\r\nHost: stress\r\n\r\n'
+
+
+def burn(ms):
+    """模擬裝置上 json.dumps 等純 CPU 工作"""
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+async def alarm_task(stop, lateness):
+    """依固定時刻觸發，記錄每次比預定時間晚多少（對應 check_alarm_task / ring_alarm 的時序）"""
+    start = time.perf_counter()
+    k = 0
+    while not stop.is_set():
+        k += 1
+        target = start + k * ALARM_PERIOD
+        await asyncio.sleep(max(0, target - time.perf_counter()))
+        lateness.append(time.perf_counter() - target)
+
+
+# ==================== 客戶端 ====================
+
+async def slowloris(port, stop):
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /alarms HTTP/1.1\r\n')
+            while not stop.is_set() and not reader.at_eof():
+                writer.write(b'X')
+                await writer.drain()
+                await asyncio.sleep(0.2)
+            writer.close()
+        except (ConnectionError, OSError):
+            pass
+        await asyncio.sleep(0.2)
+
+
+async def idle(port, stop):
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            await reader.read()           # 等伺服器關閉
+            writer.close()
+        except (ConnectionError, OSError):
+            pass
+        await asyncio.sleep(0.2)
+
+
+async def hammer(port, stop, counts):
+    while not stop.is_set():
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            while not stop.is_set():
+                writer.write(REQ)
+                await writer.drain()
+                status = await reader.readline()
+                if not status:
+                    break
+                length = 0
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b''):
+                        break
+                    if line.lower().startswith(b'content-length:'):
+                        length = int(line.split(b':')[1])
+                await reader.readexactly(length)
+                code = status.split()[1]
+                counts[code] = counts.get(code, 0) + 1
+                if code == b'503':
+                    await asyncio.sleep(0.05)   # 瀏覽器會依 Retry-After 退避；這裡只稍等
+                    break
+            writer.close()
+        except (ConnectionError, OSError, asyncio.IncompleteReadError, IndexError):
+            await asyncio.sleep(0.05)
+
+
+# ==================== 執行 ====================
+
+async def run_case(args, scenario, protected):
+    routes = http.Router()
+    lag = LagMonitor(config.LOOP_LAG_INTERVAL_MS, config.LOOP_LAG_BUDGET_MS)
+    admission = http.Admission(config.HTTP_MAX_ACTIVE, config.HTTP_MAX_WAITING,
+                               config.HTTP_QUEUE_WAIT_SEC, lag) if protected else None
+
+    async def alarms(req, writer):
+        burn(args.cost_ms / 2)
+        await asyncio.sleep(0)
+        burn(args.cost_ms / 2)
+        await http.reply(req, writer, 200, '{"alarms": []}')
+
+    routes.add('/alarms', alarms)
+
+    async def handler(reader, writer):
+        try:
+            if protected:
+                await routes.serve(reader, writer, config.HTTP_IDLE_TIMEOUT_SEC, config.HTTP_MAX_REQUESTS,
+                                   config.HTTP_HEADER_TIMEOUT_SEC, config.HTTP_WRITE_TIMEOUT_SEC,
+                                   config.HTTP_MAX_CONNECTIONS, admission)
+            else:
+                await routes.serve(reader, writer, 3600, 10 ** 9)
+        except (ConnectionError, OSError, asyncio.CancelledError):
+            pass        # 結束時仍開著的連線會被取消
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handler, '127.0.0.1', 0, backlog=512)
+    port = server.sockets[0].getsockname()[1]
+    stop = asyncio.Event()
+    lateness, counts = [], {}
+    tasks = [asyncio.create_task(lag.run()), asyncio.create_task(alarm_task(stop, lateness))]
+    if scenario == 'slow':
+        tasks += [asyncio.create_task(slowloris(port, stop)) for _ in range(args.clients // 2)]
+        tasks += [asyncio.create_task(idle(port, stop)) for _ in range(args.clients - args.clients // 2)]
+    else:
+        tasks += [asyncio.create_task(hammer(port, stop, counts)) for _ in range(args.busy)]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    server.close()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    lateness.sort()
+    ms = [x * 1000 for x in lateness]
+    p = lambda q: ms[min(len(ms) - 1, int(len(ms) * q))]   # noqa: E731
+    label = scenario + (' 保護' if protected else ' 不設限')
+    ok = counts.get(b'200', 0)
+    print(f'{label:<10}鬧鐘延遲 p50 {p(0.5):7.1f} ms  p99 {p(0.99):7.1f} ms  max {ms[-1]:7.1f} ms  '
+          f'迴圈延遲 max {lag.max_ms} ms  連線峰值 {routes.peak_open}  成功 {ok / args.duration:,.0f} req/s  503 {counts.get(b"503", 0)}')
+    if protected:
+        print(f'{"":<10}同時執行峰值 {admission.peak}  排隊逾時/滿載拒絕 {admission.rejected}  '
+              f'延遲超標拒絕 {admission.shed}  連線滿載拒絕 {routes.refused}  逾時中斷 {routes.timeouts}')
+    return p(0.99)
+
+
+async def main(args):
+    print(f'slow {args.clients} 個 / busy {args.busy} 個客戶端，每個請求模擬 {args.cost_ms} ms CPU，'
+          f'鬧鐘每 {ALARM_PERIOD * 1000:.0f} ms 一次，各跑 {args.duration:.0f} 秒')
+    failed = False
+    for scenario in ('slow', 'busy'):
+        await run_case(args, scenario, protected=False)
+        p99 = await run_case(args, scenario, protected=True)
+        if p99 > args.max_p99_ms:
+            print(f'失敗：{scenario} 保護模式鬧鐘延遲 p99 {p99:.1f} ms > {args.max_p99_ms} ms')
+            failed = True
+    if failed:
+        sys.exit(1)
+    print(f'通過：保護模式鬧鐘延遲 p99 皆 <= {args.max_p99_ms} ms')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--clients', type=int, default=200, help='slow 情境的客戶端數')
+    ap.add_argument('--busy', type=int, default=50, help='busy 情境的客戶端數')
+    ap.add_argument('--duration', type=float, default=10)
+    ap.add_argument('--cost-ms', type=float, default=5, help='每個請求的 CPU 耗時（模擬裝置）')
+    ap.add_argument('--max-p99-ms', type=float, default=config.LOOP_LAG_BUDGET_MS * 2,
+                    help='保護模式允許的鬧鐘延遲 p99')
+    asyncio.run(main(ap.parse_args()))
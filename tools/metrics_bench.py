@@ -0,0 +1,192 @@
+"""
+tools/metrics_bench.py - 量測 metrics.py 本身的成本（於電腦端 CPython 執行）
+
+1. 單次操作成本：Histogram.observe、Timer（with）、on_lag、輸出 /metrics
+2. 模擬 alarm_clock 的協程節奏（畫面 200 ms、按鈕 20 ms、鬧鐘 1 s、迴圈延遲 50 ms、
+   每秒數個 HTTP 請求），比較開 / 關指標時的每秒 CPU 時間，並讀取 Metrics 自行估計的占比；
+   占比超過 --max-ratio 時以非零狀態結束
+
+實機上請直接讀 /metrics 的 clock_metrics_overhead_ratio（同樣的估計方式，以裝置上校準的單次成本計算）
+
+用法:
+    python tools/metrics_bench.py --duration 10
+"""
+
+import argparse
+import asyncio
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+import http_server as http  # noqa: E402
+from looplag import LagMonitor  # noqa: E402
+from metrics import Metrics, CONTENT_TYPE  # noqa: E402
+
+# 每秒各種記錄的次數（對應 alarm_clock 的協程節奏）
+RATES = {'buttons': 50, 'ui_display': 5, 'i2c_flush': 5, 'check_alarm': 1, 'loop_lag': 1000 // config.LOOP_LAG_INTERVAL_MS}
+PROM_LINE = re.compile(r'^(# (HELP|TYPE) .+|[a-z0-9_]+(\{[^}]*\})? [0-9.+Inf-]+)$')
+
+
+def burn(ms):
+    end = time.perf_counter() + ms / 1000
+    while time.perf_counter() < end:
+        pass
+
+
+def micro(n=200000):
+    m = Metrics()
+    h = m.histogram('x', 'x')
+    timer = m.timer('t', 't', 'task', 'a')
+    rows = []
+    for label, fn in (('Histogram.observe', lambda: h.observe(3500)),
+                      ('Timer（with）', lambda: timer.__enter__() and timer.__exit__()),
+                      ('on_lag', lambda: m.on_lag(2))):
+        t0 = time.perf_counter()
+        for _ in range(n):
+            fn()
+        rows.append((label, (time.perf_counter() - t0) / n * 1e6))
+    t0 = time.perf_counter()
+    size = len(''.join(m.prometheus()))
+    rows.append((f'輸出 /metrics（{size:,} B）', (time.perf_counter() - t0) * 1e6))
+    for label, us in rows:
+        print(f'{label:<20}{us:8.2f} µs/次')
+    rate = sum(RATES.values())
+    per_sec = rate * rows[1][1]
+    print(f'依裝置節奏每秒約 {rate} 次記錄 → {per_sec:.0f} µs/s（本機 {per_sec / 1e4:.3f}%）；'
+          f'單次記錄需低於 {10000 / rate:.0f} µs 才能維持 < 1%')
+    return m
+
+
+async def simulate(duration, enabled):
+    """回傳 (每秒 CPU 秒數, Metrics 或 None, /metrics 內容)"""
+    m = Metrics() if enabled else None
+    lag = LagMonitor(config.LOOP_LAG_INTERVAL_MS, config.LOOP_LAG_BUDGET_MS)
+    routes = http.Router()
+
+    class Null:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    def timer(task):
+        return m.timer('task_run_ms', 'run', 'task', task) if m else Null()
+
+    async def handler(req, writer):
+        burn(2)
+        await http.reply(req, writer, 200, '{"alarms": []}')
+
+    async def prom(req, writer):
+        await http.send_chunked(req, writer, m.prometheus(), CONTENT_TYPE)
+
+    routes.add('/alarms', handler)
+    routes.add('/metrics', prom)
+    if m:
+        lag.observe = m.on_lag
+        routes.observe = m.observer('http_handler_ms', 'handler', 'path')
+        i2c = m.timer('i2c_flush_ms', 'flush')
+    else:
+        i2c = Null()
+
+    async def every(ms, t, work):
+        while True:
+            with t:
+                work()
+            await asyncio.sleep(ms / 1000)
+
+    def ui():
+        burn(3)
+        with i2c:
+            burn(2)
+
+    async def client(port):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        while True:
+            writer.write(b'GET /alarms HTTP/1.1\r\nHost: b\r\n\r\n')
+            await writer.drain()
+            while (await reader.readline()) != b'\r\n':
+                pass
+            await reader.readexactly(14)
+            await asyncio.sleep(0.25)
+
+    async def serve(reader, writer):
+        try:
+            await routes.serve(reader, writer, 5, 10 ** 6)
+        except asyncio.CancelledError:
+            pass        # 結束時仍開著的 keep-alive 連線會被取消
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(serve, '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    tasks = [asyncio.create_task(lag.run()),
+             asyncio.create_task(every(20, timer('buttons'), lambda: burn(0.05))),
+             asyncio.create_task(every(200, timer('ui_display'), ui)),
+             asyncio.create_task(every(1000, timer('check_alarm'), lambda: burn(0.2))),
+             asyncio.create_task(client(port))]
+    if m:
+        m.started = int(time.perf_counter() * 1000)
+    c0 = time.process_time()
+    await asyncio.sleep(duration)
+    cpu = (time.process_time() - c0) / duration
+    body = b''
+    if m:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'GET /metrics HTTP/1.1\r\nHost: b\r\nConnection: close\r\n\r\n')
+        await writer.drain()
+        body = await reader.read()
+        writer.close()
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    server.close()
+    return cpu, m, body
+
+
+def dechunk(raw):
+    head, _, data = raw.partition(b'\r\n\r\n')
+    out = bytearray()
+    while data:
+        size, _, data = data.partition(b'\r\n')
+        size = int(size, 16)
+        if not size:
+            break
+        out += data[:size]
+        data = data[size + 2:]
+    return head.decode(), out.decode()
+
+
+async def main(args):
+    print('== 單次操作成本 ==')
+    micro()
+    print(f'\n== 模擬協程節奏 {args.duration:.0f} 秒 ==')
+    off, _, _ = await simulate(args.duration, False)
+    on, m, raw = await simulate(args.duration, True)
+    ratio = m.overhead_ratio()
+    print(f'不記錄指標  CPU {off * 1000:6.1f} ms/s')
+    print(f'記錄指標    CPU {on * 1000:6.1f} ms/s（差 {(on - off) * 1000:+.1f} ms/s，含量測雜訊）')
+    print(f'Metrics 自行估計的占比 {ratio:.4%}（{m.records()} 次記錄 × {m.record_us:.2f} µs）')
+
+    head, text = dechunk(raw)
+    bad = [line for line in text.splitlines() if not PROM_LINE.match(line)]
+    print(f'/metrics {len(text):,} B，{len(text.splitlines())} 行，格式不符 {len(bad)} 行  [{head.splitlines()[0]}]')
+    for line in bad[:5]:
+        print('   ', line)
+    s = m.summary()
+    for key in ('loop_lag_ms', 'task_run_ms:ui_display', 'i2c_flush_ms', 'http_handler_ms:/alarms'):
+        print(f'  {key:<24} count/p50/p99/max(ms) {s.get(key)}')
+    if ratio > args.max_ratio or bad:
+        print(f'失敗：占比 {ratio:.4%} 超過 {args.max_ratio:.2%} 或輸出格式錯誤')
+        sys.exit(1)
+    print(f'通過：指標本身耗時 < {args.max_ratio:.2%}')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--duration', type=float, default=10)
+    ap.add_argument('--max-ratio', type=float, default=0.01, help='允許的指標耗時占比')
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,148 @@
+"""
+tools/mqtt_lite.py - 電腦端極簡 asyncio MQTT 3.1.1 客戶端
+只實作工具程式需要的部分：CONNECT / SUBSCRIBE / PUBLISH(QoS 0/1) / PINGREQ，
+不需額外安裝套件
+"""
+
+import asyncio
+import struct
+
+
+def _encode_len(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        out.append(b | 0x80 if n else b)
+        if not n:
+            return bytes(out)
+
+
+def _str(s):
+    if isinstance(s, str):
+        s = s.encode()
+    return struct.pack('!H', len(s)) + s
+
+
+class MqttLite:
+    def __init__(self, client_id, keepalive=60):
+        self.client_id = client_id
+        self.keepalive = keepalive
+        self.on_message = None      # on_message(topic: bytes, payload: bytes, retained: bool)
+        self._reader = None
+        self._writer = None
+        self._pid = 0
+        self._acks = {}
+        self._tasks = []
+
+    async def connect(self, host='127.0.0.1', port=1883, clean=True):
+        self._reader, self._writer = await asyncio.open_connection(host, port)
+        var = _str('MQTT') + bytes([4, 0x02 if clean else 0]) + struct.pack('!H', self.keepalive)
+        body = var + _str(self.client_id)
+        self._writer.write(b'\x10' + _encode_len(len(body)) + body)
+        await self._writer.drain()
+        head = await self._reader.readexactly(4)
+        if head[0] != 0x20 or head[3] != 0:
+            raise ConnectionError(f'CONNACK 失敗: {head!r}')
+        self._tasks = [asyncio.create_task(self._read_loop()),
+                       asyncio.create_task(self._ping_loop())]
+
+    async def close(self):
+        for t in self._tasks:
+            t.cancel()
+        if self._writer:
+            try:
+                self._writer.write(b'\xe0\x00')
+                await self._writer.drain()
+                self._writer.close()
+            except (ConnectionError, OSError):
+                pass
+
+    def _next_pid(self):
+        self._pid = self._pid % 65535 + 1
+        return self._pid
+
+    async def subscribe(self, topics, qos=0):
+        """訂閱一或多個主題，等待 SUBACK"""
+        if isinstance(topics, (str, bytes)):
+            topics = [topics]
+        pid = self._next_pid()
+        body = struct.pack('!H', pid) + b''.join(_str(t) + bytes([qos]) for t in topics)
+        fut = self._acks[pid] = asyncio.get_running_loop().create_future()
+        self._writer.write(b'\x82' + _encode_len(len(body)) + body)
+        await self._writer.drain()
+        await fut
+
+    async def publish(self, topic, payload, qos=0, retain=False):
+        """發佈訊息；QoS 1 時等待 PUBACK"""
+        if isinstance(payload, str):
+            payload = payload.encode()
+        flags = 0x30 | (qos << 1) | (1 if retain else 0)
+        body = _str(topic)
+        fut = None
+        if qos:
+            pid = self._next_pid()
+            body += struct.pack('!H', pid)
+            fut = self._acks[pid] = asyncio.get_running_loop().create_future()
+        body += payload
+        self._writer.write(bytes([flags]) + _encode_len(len(body)) + body)
+        await self._writer.drain()
+        if fut:
+            await fut
+
+    def _handle(self, first, body):
+        kind = first & 0xF0
+        if kind == 0x30:
+            tlen = (body[0] << 8) | body[1]
+            topic = bytes(body[2:2 + tlen])
+            pos = 2 + tlen
+            if first & 0x06:
+                self._writer.write(b'\x40\x02' + bytes(body[pos:pos + 2]))
+                pos += 2
+            if self.on_message:
+                return self.on_message(topic, bytes(body[pos:]), bool(first & 1))
+        elif kind in (0x40, 0x90):
+            fut = self._acks.pop((body[0] << 8) | body[1], None)
+            if fut and not fut.done():
+                fut.set_result(True)
+        return None
+
+    async def _read_loop(self):
+        """以大塊讀取後在緩衝區內切封包，減少每則訊息的系統呼叫"""
+        buf = bytearray()
+        try:
+            while True:
+                chunk = await self._reader.read(65536)
+                if not chunk:
+                    raise ConnectionError('連線關閉')
+                buf += chunk
+                pos, end = 0, len(buf)
+                view = memoryview(buf)
+                while pos + 2 <= end:
+                    mult, length, i = 1, 0, pos + 1
+                    while i < end:
+                        b = buf[i]
+                        length += (b & 0x7F) * mult
+                        mult <<= 7
+                        i += 1
+                        if not b & 0x80:
+                            break
+                    else:
+                        break
+                    if i + length > end:
+                        break
+                    res = self._handle(buf[pos], view[i:i + length])
+                    if asyncio.iscoroutine(res):
+                        await res
+                    pos = i + length
+                view.release()
+                del buf[:pos]
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            for fut in self._acks.values():
+                if not fut.done():
+                    fut.set_exception(ConnectionError('連線中斷'))
+
+    async def _ping_loop(self):
+        while True:
+            await asyncio.sleep(self.keepalive / 2)
+            self._writer.write(b'\xc0\x00')
@@ -0,0 +1,274 @@
+"""
+tools/mqtt_outage_sim.py - Broker 重啟 / 斷線期間的離線佇列模擬（於電腦端 CPython 執行）
+
+以替身取代 mqtt_as（與 http_harness.py 相同的 sys.modules 替身），匯入真正的 mqtt_client.MqttManager，
+再換上 FakeClient：行為比照 mqtt_as——斷線時 publish 會等到重新連上再送出，連線成功後以 task 呼叫
+connect_coro，斷線時呼叫 wifi_coro(False)。生產端每 PERIOD_MS 以遞增序號發佈一筆，期間讓 FakeBroker
+停機，統計 Broker 收到的序號是否依序、是否重複，以及遺失的筆數是否不超過佇列溢位計數
+（補發途中被 drop_oldest 擠掉的開頭訊息可能已經送出，溢位計數會比實際遺失多幾筆）：
+
+    restart     停機 0.5 秒（未超過 RAM 佇列容量）→ 應全數依序送達
+    outage      停機 3 秒（超過容量，drop_oldest）→ 依序送達，遺失 ≤ 溢位計數
+    spill       停機 3 秒，RAM 16 筆 + Flash 溢出檔 → 全數依序送達
+    reboot      Flash 溢出檔補發到一半 Broker 再次停機，接著以同一個檔案重建佇列（模擬重開機）
+                → 已送達 + 檔案中剩下的序號必須連續，沒有訊息在補發途中遺失
+                （RAM 內的部分重開機後本來就不在，只確認它們不是從 Flash 提前移除的）
+
+mqtt_client 的 [MQTT] 記錄照常輸出，可用 grep -v '^\[MQTT\]' 只看結果
+
+用法:
+    python tools/mqtt_outage_sim.py
+    python tools/mqtt_outage_sim.py --scenarios restart reboot
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tempfile
+import time
+
+from http_harness import install_stubs, ROOT
+
+SCENARIOS = ('restart', 'outage', 'spill', 'reboot')
+PERIOD_MS = 20          # 生產端發佈間隔
+ACK_MS = 5              # Broker 回覆 PUBACK 的延遲
+TOPIC = b'sim/telemetry'
+
+
+def host_shims():
+    """MicroPython 才有的 time.ticks_* 與 gc.mem_free（mqtt_client 用來統計連線耗時）"""
+    if not hasattr(time, 'ticks_ms'):
+        time.ticks_ms = lambda: int(time.perf_counter() * 1000)
+        time.ticks_us = lambda: int(time.perf_counter() * 1000000)
+        time.ticks_diff = lambda a, b: a - b
+    if not hasattr(gc, 'mem_free'):
+        gc.mem_free = lambda: 0
+
+
+class FakeSock:
+    def __init__(self, cert):
+        self.cert = cert
+
+    def getpeercert(self, binary_form=False):
+        return self.cert
+
+
+class FakeBroker:
+    def __init__(self):
+        self.up = True
+        self.received = []          # [(topic, msg)]
+        self.clients = []
+        self.cert = b'broker-cert'
+        self.on_connect = None      # 可選：on_connect(client) 協程，連線建立時以 task 啟動（模擬 Broker 立即送來的訊息）
+        self.yield_in_connect = False   # True 時 connect() 在返回前讓出一次，讓 on_connect 先執行
+
+    def stop(self):
+        self.up = False
+        for c in self.clients:
+            c.lost()
+
+    def start(self):
+        self.up = True
+
+
+class FakeClient:
+    """mqtt_as.MQTTClient 的替身（只模擬 MqttManager 用到的行為）"""
+
+    def __init__(self, broker, cfg):
+        self.broker = broker
+        self.cfg = cfg
+        self.connected = False
+        self._sock = None
+        broker.clients.append(self)
+
+    async def connect(self):
+        await asyncio.sleep(0.005)
+        if not self.broker.up:
+            raise OSError('ECONNREFUSED')
+        self._sock = FakeSock(self.broker.cert)
+        self.connected = True
+        # mqtt_as 在 connect() 內建立收訊 task；Broker 送來的 PUBLISH 會在下一次讓出時派送
+        if self.broker.on_connect:
+            asyncio.create_task(self.broker.on_connect(self))
+        if self.broker.yield_in_connect:
+            await asyncio.sleep(0)
+        asyncio.create_task(self.cfg['connect_coro'](self))
+
+    def lost(self):
+        if self.connected:
+            self.connected = False
+            asyncio.create_task(self.cfg['wifi_coro'](False))
+
+    async def disconnect(self):
+        self.connected = False
+
+    async def subscribe(self, topic, qos=0):
+        pass
+
+    async def publish(self, topic, msg, retain=False, qos=0):
+        # 與 mqtt_as 相同：斷線時等待重新連上後重送
+        while True:
+            while not (self.connected and self.broker.up):
+                await asyncio.sleep(0.005)
+            await asyncio.sleep(ACK_MS / 1000)
+            if self.connected and self.broker.up:
+                self.broker.received.append((topic, bytes(msg)))
+                return
+
+
+def load(spill=None, size=64, **overrides):
+    """匯入 mqtt_client 並套用模擬用的設定（overrides 覆寫其他 config 值），回傳 (mqtt_client 模組, config)"""
+    if 'mqtt_client' not in sys.modules:
+        sys.path.insert(0, ROOT)
+        install_stubs()
+        host_shims()
+    import config
+    import mqtt_client
+    config.MQTT_RECONNECT_INITIAL_DELAY_SEC = 0.05
+    config.MQTT_RECONNECT_MAX_DELAY_SEC = 0.2
+    config.MQTT_DRAIN_INTERVAL_MS = 20
+    config.MQTT_QUEUE_SIZE = size
+    config.MQTT_QUEUE_SPILL_FILE = spill
+    config.MQTT_TLS = False
+    for k, v in overrides.items():
+        setattr(config, k, v)
+    return mqtt_client, config
+
+
+def make_manager(broker, spill=None, size=64, **overrides):
+    mqtt_client, config = load(spill, size, **overrides)
+    mgr = mqtt_client.MqttManager('ssid', 'pw')
+    cfg = sys.modules['mqtt_as'].config
+    mgr.client = FakeClient(broker, cfg)
+    return mgr
+
+
+async def produce(mgr, stop, produced, after=None):
+    """after(seq)：每筆發佈返回後呼叫（在兩次發佈之間停機，生產端才不會卡在 mqtt_as 的 publish 裡）"""
+    seq = 0
+    while not stop.is_set():
+        seq += 1
+        produced.append(seq)
+        await mgr.publish(TOPIC, b'%d' % seq, qos=1)
+        if after:
+            after(seq)
+        await asyncio.sleep(PERIOD_MS / 1000)
+
+
+def shutdown(mgr, sup):
+    """停止連線監控與收訊工作池的協程（它們不會自行結束）"""
+    sup.cancel()
+    for t in mgr.workers._tasks:
+        t.cancel()
+
+
+async def settle(mgr, timeout=10):
+    end = time.perf_counter() + timeout
+    while (len(mgr.queue) or mgr._draining or not mgr.is_connected()) and time.perf_counter() < end:
+        await asyncio.sleep(0.05)
+
+
+def report(name, produced, got, remaining, overflow):
+    ordered = all(a < b for a, b in zip(got, got[1:]))
+    dups = len(got) - len(set(got))
+    lost = len(set(produced) - set(got) - set(remaining))
+    ok = ordered and not dups and lost <= overflow
+    print('  {:<8}發佈 {:>4}  送達 {:>4}  佇列剩 {:>3}  依序 {}  重複 {:>2}  遺失 {:>3}（溢位 {:>3}） {}'.format(
+        name, len(produced), len(got), len(remaining), '是' if ordered else '否', dups, lost, overflow,
+        '通過' if ok else '失敗'))
+    return ok
+
+
+async def run_outage(name, down_sec, spill=None, size=64):
+    broker = FakeBroker()
+    mgr = make_manager(broker, spill, size)
+    sup = asyncio.create_task(mgr.run())
+    await mgr.wait_connected(5)
+    stop, produced, down = asyncio.Event(), [], asyncio.Event()
+
+    def after(seq):
+        if seq == 15:
+            broker.stop()
+            down.set()
+
+    prod = asyncio.create_task(produce(mgr, stop, produced, after))
+    await down.wait()
+    depth = 0
+    end = time.perf_counter() + down_sec
+    while time.perf_counter() < end:
+        depth = max(depth, len(mgr.queue))
+        await asyncio.sleep(0.02)
+    broker.start()
+    t0 = time.perf_counter()
+    await asyncio.sleep(0.3)
+    stop.set()
+    await prod
+    await settle(mgr)
+    drain_s = time.perf_counter() - t0
+    shutdown(mgr, sup)
+    got = [int(m) for _, m in broker.received]
+    overflow = mgr.queue_stats()['overflow']
+    ok = report(name, produced, got, [], overflow)
+    print('  {:<8}佇列最深 {} 筆，恢復後 {:.2f} 秒清空，補發 {} 筆，重連 {} 次'.format(
+        '', depth, drain_s, mgr.drained, mgr.reconnects))
+    return ok
+
+
+async def run_reboot(spill):
+    broker = FakeBroker()
+    mgr = make_manager(broker, spill, 8)
+    sup = asyncio.create_task(mgr.run())
+    await mgr.wait_connected(5)
+    broker.stop()
+    await asyncio.sleep(0.1)
+    produced = []
+    for seq in range(1, 101):
+        produced.append(seq)
+        await mgr.publish(TOPIC, b'%d' % seq, qos=1)
+    broker.start()
+    # 補發出第一批後 Broker 再次停機，接著「重開機」：丟掉 MqttManager，以同一個溢出檔重建佇列
+    while len(broker.received) < 4:
+        await asyncio.sleep(0.001)
+    broker.stop()
+    shutdown(mgr, sup)
+    await asyncio.sleep(0.05)
+    from mqtt_queue import PublishQueue
+    q = PublishQueue(8, 'drop_oldest', spill, 256, 128)
+    remaining = [int(m) for _, m, _, _ in q.spill.peek_many(len(q.spill))]
+    # RAM 部分在重開機時本來就會遺失，只檢查 Flash 內的訊息
+    ram = [int(m) for _, m, _, _ in mgr.queue.ram.peek_many(len(mgr.queue.ram))]
+    got = [int(m) for _, m in broker.received]
+    contiguous = sorted(set(got) | set(remaining) | set(ram)) == produced
+    ok = report('reboot', produced, got, remaining + ram, 0) and contiguous
+    print('  {:<8}重開機前 RAM {} 筆、Flash {} 筆未確認；重建後 Flash 仍有 {} 筆，與已送達的序號{}'.format(
+        '', len(ram), len(mgr.queue.spill), len(remaining), '連續' if contiguous else '有缺口'))
+    return ok
+
+
+async def main(args):
+    tmp = tempfile.mkdtemp()
+    ok = True
+    print('== 離線佇列：Broker 停機模擬（每 {} ms 發佈一筆） =='.format(PERIOD_MS))
+    for name in args.scenarios:
+        spill = os.path.join(tmp, name + '.bin')
+        if name == 'restart':
+            ok &= await run_outage(name, 0.5)
+        elif name == 'outage':
+            ok &= await run_outage(name, 3)
+        elif name == 'spill':
+            ok &= await run_outage(name, 3, spill, 16)
+        elif name == 'reboot':
+            ok &= await run_reboot(spill)
+        if os.path.exists(spill):
+            os.remove(spill)
+    os.rmdir(tmp)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,72 @@
+"""
+tools/rbe_sim.py - 例外回報遙測模擬（於電腦端 CPython 執行）
+
+以一天的溫濕度讀值（每 10 秒一筆）比較「固定週期發佈」與
+ChangeReporter（死區 + 心跳）的訊息數量
+
+用法:
+    python tools/rbe_sim.py                 # 使用合成的 DHT11 整數讀值
+    python tools/rbe_sim.py readings.csv    # CSV 欄位: 秒數,溫度,濕度
+"""
+
+import csv
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+from telemetry import ChangeReporter  # noqa: E402
+
+PERIOD_SEC = 10
+
+
+def synthetic_day(seed=18):
+    """日夜溫差正弦波 + 量測雜訊，四捨五入成 DHT11 的整數讀值"""
+    rnd = random.Random(seed)
+    for i in range(86400 // PERIOD_SEC):
+        now = i * PERIOD_SEC
+        phase = 2 * math.pi * (now / 86400 - 0.25)
+        temp = 26.5 + 2.5 * math.sin(phase) + rnd.gauss(0, 0.3)
+        humi = 62 - 6 * math.sin(phase) + rnd.gauss(0, 0.8)
+        yield now, round(temp), round(humi)
+
+
+def load_csv(path):
+    with open(path) as f:
+        for row in csv.reader(f):
+            if row and row[0][:1].isdigit():
+                yield int(float(row[0])), int(float(row[1])), int(float(row[2]))
+
+
+def simulate(readings, deadbands, heartbeat):
+    reporter = ChangeReporter(deadbands, heartbeat)
+    samples = 0
+    for now, temp, humi in readings:
+        samples += 1
+        for field, value in (('temp', temp), ('humi', humi)):
+            if reporter.should_report(field, value, now):
+                reporter.mark(field, value, now)
+    return samples * 2, reporter.reported
+
+
+def main():
+    source = sys.argv[1] if len(sys.argv) > 1 else None
+    readings = list(load_csv(source) if source else synthetic_day())
+    print(f'資料來源: {source or "合成 DHT11 讀值"}，{len(readings)} 筆')
+    print(f'{"死區(溫/濕)":<14}{"心跳秒":>8}{"固定週期":>10}{"例外回報":>10}{"減少":>9}')
+    cases = [
+        (config.TELEMETRY_DEADBAND, config.TELEMETRY_HEARTBEAT_SEC),
+        ({'temp': 1, 'humi': 1}, 300),
+        ({'temp': 1, 'humi': 3}, 600),
+        ({'temp': 2, 'humi': 5}, 900),
+    ]
+    for deadbands, heartbeat in cases:
+        baseline, reported = simulate(readings, deadbands, heartbeat)
+        label = f'{deadbands["temp"]}/{deadbands["humi"]}'
+        print(f'{label:<14}{heartbeat:>8}{baseline:>10}{reported:>10}{1 - reported / baseline:>9.1%}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+tools/sensor_sim.py - DHT 取樣服務的模擬（於電腦端 CPython 執行）
+
+以假的 DHT11 驅動 sensor.DhtService（模擬時鐘，每 2 秒一筆），感測器會：
+    量化成整數並帶 ±1 雜訊、偶發突波（+20 °C / 濕度 0）、隨機時序錯誤（OSError）、
+    一段連續失敗（拔線）以及一次真的溫度階躍（搬到另一個房間）
+比較原始讀值與濾波值相對真實值的誤差，並列出重試 / 失敗 / 突波 / 過期統計與紀錄的記憶體
+
+用法:
+    python tools/sensor_sim.py --hours 2 --fail-rate 0.1
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import config  # noqa: E402
+from sensor import DhtService, Q_FAILED, Q_OUTLIER, Q_RETRIED  # noqa: E402
+
+DEVICE_ITEMSIZE = {'L': 4, 'h': 2, 'B': 1}     # MicroPython（32 位元）array 的元素大小
+
+
+class FakeDht:
+    def __init__(self, rnd, fail_rate, spike_rate):
+        self.rnd = rnd
+        self.fail_rate = fail_rate
+        self.spike_rate = spike_rate
+        self.now = 0.0
+        self.unplugged = False
+        self.step = 0.0
+        self._t = self._h = None
+
+    def truth(self):
+        temp = 24 + 2 * math.sin(self.now / 3600 * math.pi) + self.step
+        humi = 60 + 5 * math.cos(self.now / 5400 * math.pi)
+        return temp, humi
+
+    def measure(self):
+        if self.unplugged or self.rnd.random() < self.fail_rate:
+            raise OSError(110)       # ETIMEDOUT，與 dht 模組相同
+        temp, humi = self.truth()
+        self._t = round(temp + self.rnd.choice((-1, 0, 0, 0, 1)))
+        self._h = round(humi + self.rnd.choice((-1, 0, 0, 0, 1)))
+        if self.rnd.random() < self.spike_rate:
+            if self.rnd.random() < 0.5:
+                self._t += 20
+            else:
+                self._h = 0
+
+    def temperature(self):
+        return self._t
+
+    def humidity(self):
+        return self._h
+
+
+def rms(xs):
+    return math.sqrt(sum(x * x for x in xs) / len(xs)) if xs else float('nan')
+
+
+async def main(args):
+    rnd = random.Random(args.seed)
+    dht = FakeDht(rnd, args.fail_rate, args.spike_rate)
+    interval = config.DHT11_POLL_INTERVAL_SEC
+    svc = DhtService(dht, interval, config.DHT_RETRIES, 0, config.DHT_FILTER_WINDOW, config.DHT_EMA_ALPHA,
+                     config.DHT_MAX_JUMP, config.DHT_HISTORY, config.DHT_STALE_SEC)
+    steps = int(args.hours * 3600 / interval)
+    unplug = (steps // 3, steps // 3 + 60 // interval)         # 拔線 60 秒
+    step_at = steps * 2 // 3                                    # 溫度階躍 +8 °C
+    raw_err, filt_err, stale_samples, spikes_passed = [], [], 0, 0
+    follow = None
+
+    for k in range(steps):
+        dht.now = k * interval
+        dht.unplugged = unplug[0] <= k < unplug[1]
+        if k == step_at:
+            dht.step = 8.0
+        t, h, flags = await svc.read()
+        svc.update(t, h, flags, dht.now)
+        true_t, true_h = dht.truth()
+        if t is not None:
+            raw_err.append(t - true_t)
+        if svc.temp is not None:
+            e = svc.temp - true_t
+            filt_err.append(e)
+            if abs(e) > 5 and k < step_at:
+                spikes_passed += 1
+            if follow is None and k > step_at and abs(e) < 1:
+                follow = (k - step_at) * interval
+        if svc.stale(dht.now):
+            stale_samples += 1
+
+    print(f'模擬 {args.hours:g} 小時，每 {interval} 秒一筆，共 {steps} 筆；'
+          f'時序錯誤率 {args.fail_rate:.0%}、突波率 {args.spike_rate:.1%}、拔線 60 秒、第 {step_at * interval // 60} 分鐘溫度 +8 °C')
+    print(f'measure() {svc.reads} 次  重試 {svc.retried}  重試用盡 {svc.failed}  判定突波 {svc.outliers}')
+    flags = [f for _, _, _, f in svc.history.items()]
+    print(f'紀錄中 {len(flags)} 筆：重試後成功 {sum(1 for f in flags if f & Q_RETRIED)}  '
+          f'突波 {sum(1 for f in flags if f & Q_OUTLIER)}  失敗 {sum(1 for f in flags if f & Q_FAILED)}')
+    print(f'溫度誤差 RMS  原始 {rms(raw_err):5.2f} °C（max {max(map(abs, raw_err)):4.1f}）  '
+          f'濾波 {rms(filt_err):5.2f} °C（max {max(map(abs, filt_err[:step_at])):4.1f}，階躍前）')
+    print(f'突波穿過濾波（誤差 > 5 °C）{spikes_passed} 次；階躍後 {follow} 秒內跟上（誤差 < 1 °C）')
+    print(f'標示為過期 {stale_samples} 筆（拔線 {60 // interval} 筆，過期門檻 {config.DHT_STALE_SEC} 秒）')
+    h = svc.history
+    per = sum(DEVICE_ITEMSIZE[a.typecode] for a in (h.ts, h.temp, h.humi, h.flags))
+    print(f'環形紀錄 {h.capacity} 筆 × {per} B = {h.capacity * per:,} B（裝置上的 array，執行期不再配置）')
+    if spikes_passed or follow is None:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--hours', type=float, default=2)
+    ap.add_argument('--fail-rate', type=float, default=0.1, help='每次讀取的時序錯誤機率')
+    ap.add_argument('--spike-rate', type=float, default=0.01, help='每次讀取出現突波的機率')
+    ap.add_argument('--seed', type=int, default=47)
+    asyncio.run(main(ap.parse_args()))
@@ -0,0 +1,242 @@
+"""
+tools/sse_sim.py - 比較網頁輪詢與 /events 推播的負載（於電腦端 CPython 執行）
+
+以子行程執行與裝置相同的 http_server 路由（/time、/env、/alarms、/events），
+模擬 N 個瀏覽器分頁：
+    輪詢    每 500 ms 同時抓 /time、/env、/alarms（keep-alive）
+    /state  每 500 ms 抓一次 /state，帶 If-None-Match（沒變時 304）
+    推播    一條 /events 連線；時間每秒、溫濕度每 10 秒、鬧鐘偶爾異動
+統計伺服器每分鐘處理的請求數、送出的位元組、JSON 序列化次數與耗時、CPU 時間
+
+用法:
+    python tools/sse_sim.py --browsers 5 --duration 60
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import http_server as http  # noqa: E402
+
+ENV_INTERVAL = 10          # 對應 dht_mqtt_task 的量測間隔
+ALARM_CHANGE_EVERY = 20    # 模擬每 20 秒有一次鬧鐘異動
+
+
+# ==================== 伺服器（子行程） ====================
+
+class DumpCounter:
+    """統計 json.dumps 的次數與耗時"""
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+
+    def __call__(self, obj):
+        t0 = time.perf_counter()
+        out = json.dumps(obj)
+        self.seconds += time.perf_counter() - t0
+        self.calls += 1
+        return out
+
+
+class CountingWriter:
+    """包住 StreamWriter 統計送出的位元組"""
+
+    def __init__(self, writer, counter):
+        self._w = writer
+        self._c = counter
+
+    def write(self, data):
+        self._c['bytes'] += len(data)
+        self._w.write(data)
+
+    async def drain(self):
+        await self._w.drain()
+
+
+async def serve(port):
+    rnd = random.Random(39)
+    state = {'env': {'temp': '26', 'humi': '61', 'ip': '127.0.0.1'},
+             'alarms': [{'h': 7, 'm': 0, 'repeat': 1, 'music': 0, 'enabled': True}]}
+    events = http.EventHub(max_clients=64)
+    routes = http.Router()
+    counter = {'bytes': 0}
+    dumps = DumpCounter()
+    gen = [0]
+    state_body = http.CachedBody(lambda: dumps({'gen': gen[0], 'env': state['env'], 'alarms': state['alarms']}))
+
+    def time_dict():
+        t = time.localtime()
+        return {'y': t[0], 'M': t[1], 'd': t[2], 'h': t[3], 'm': t[4], 's': t[5]}
+
+    async def env(req, writer):
+        await http.reply(req, writer, 200, dumps(state['env']))
+
+    async def now(req, writer):
+        await http.reply(req, writer, 200, dumps(time_dict()))
+
+    async def alarms(req, writer):
+        await http.reply(req, writer, 200, dumps({'alarms': state['alarms']}))
+
+    routes.add('/env', env)
+    routes.add('/time', now)
+    routes.add('/alarms', alarms)
+    routes.add('/events', events.stream)
+
+    async def state_route(req, writer):
+        t = time.localtime()
+        await state_body.reply(req, writer, gen[0], {'X-Clock': '{},{},{},{},{},{}'.format(*t[:6])})
+
+    routes.add('/state', state_route)
+
+    async def handler(reader, writer):
+        try:
+            await routes.serve(reader, CountingWriter(writer, counter), idle_timeout=5, max_requests=100)
+        except (ConnectionError, OSError, asyncio.CancelledError):
+            pass        # 結束時仍開著的 /events 連線會被取消
+        finally:
+            writer.close()
+
+    async def ticker():
+        # 與 sse_clock_task 相同：每秒推送時間；溫濕度與鬧鐘只在變化時推送
+        events.publish('env', dumps(state['env']))
+        events.publish('alarms', dumps({'alarms': state['alarms']}))
+        n = 0
+        while True:
+            await asyncio.sleep(1)
+            n += 1
+            if events.clients:
+                events.publish('time', dumps(time_dict()))
+            if n % ENV_INTERVAL == 0:
+                state['env']['temp'] = str(26 + rnd.choice((-1, 0, 1)))
+                gen[0] += 1
+                events.publish('env', dumps(state['env']))
+            if n % ALARM_CHANGE_EVERY == 0:
+                state['alarms'][0]['enabled'] = not state['alarms'][0]['enabled']
+                gen[0] += 1
+                events.publish('alarms', dumps({'alarms': state['alarms']}))
+
+    server = await asyncio.start_server(handler, '127.0.0.1', port)
+    asyncio.create_task(ticker())
+    cpu0 = time.process_time()
+    dumps.calls, dumps.seconds = 0, 0.0      # 不計入啟動時的初始推送
+    print('ready', flush=True)
+    # 父行程關閉 stdin 時輸出統計並結束
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, sys.stdin.read)
+    cpu = time.process_time() - cpu0
+    print(json.dumps({'requests': routes.requests, 'connections': routes.connections,
+                      'events': events.sent, 'bytes': counter['bytes'], 'cpu': cpu,
+                      'dumps': dumps.calls, 'dump_sec': dumps.seconds,
+                      'not_modified': state_body.not_modified}), flush=True)
+    server.close()
+
+
+# ==================== 客戶端 ====================
+
+HEADERS = 'Host: sim\r\nAccept: */*\r\nConnection: keep-alive\r\n\r\n'
+
+
+async def read_response(reader):
+    """返回 (狀態碼, 標頭 dict, 內容)"""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode().partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return status, headers, await reader.readexactly(int(headers.get('content-length', 0)))
+
+
+async def polling_browser(port, deadline):
+    conns = [await asyncio.open_connection('127.0.0.1', port) for _ in range(3)]
+    while time.perf_counter() < deadline:
+        for (reader, writer), path in zip(conns, ('/time', '/env', '/alarms')):
+            writer.write(f'GET {path} HTTP/1.1\r\n{HEADERS}'.encode())
+        await asyncio.gather(*(writer.drain() for _, writer in conns))
+        await asyncio.gather(*(read_response(reader) for reader, _ in conns))
+        await asyncio.sleep(0.5)
+    for _, writer in conns:
+        writer.close()
+
+
+async def state_browser(port, deadline):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    etag = None
+    while time.perf_counter() < deadline:
+        cond = f'If-None-Match: {etag}\r\n' if etag else ''
+        writer.write(f'GET /state HTTP/1.1\r\n{cond}{HEADERS}'.encode())
+        await writer.drain()
+        status, headers, _ = await read_response(reader)
+        if status == 200:
+            etag = headers['etag']
+        await asyncio.sleep(0.5)
+    writer.close()
+
+
+async def sse_browser(port, deadline, received):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET /events HTTP/1.1\r\n{HEADERS}'.encode())
+    await writer.drain()
+    while time.perf_counter() < deadline:
+        try:
+            line = await asyncio.wait_for(reader.readline(), max(0.01, deadline - time.perf_counter()))
+        except asyncio.TimeoutError:
+            break
+        if line.startswith(b'event:'):
+            name = line[6:].strip().decode()
+            received[name] = received.get(name, 0) + 1
+    writer.close()
+
+
+async def run_case(args, mode):
+    port = args.port + ('poll', 'state', 'sse').index(mode)
+    proc = subprocess.Popen([sys.executable, __file__, '--serve', str(port)],
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    proc.stdout.readline()
+    deadline = time.perf_counter() + args.duration
+    received = {}
+    if mode == 'poll':
+        await asyncio.gather(*(polling_browser(port, deadline) for _ in range(args.browsers)))
+    elif mode == 'state':
+        await asyncio.gather(*(state_browser(port, deadline) for _ in range(args.browsers)))
+    else:
+        await asyncio.gather(*(sse_browser(port, deadline, received) for _ in range(args.browsers)))
+    out, _ = proc.communicate('')
+    stats = json.loads(out.strip().splitlines()[-1])
+    per_min = 60 / args.duration
+    label = {'poll': '輪詢 500 ms', 'state': '/state+ETag', 'sse': '/events 推播'}[mode]
+    print(f'{label:<12}請求 {stats["requests"] * per_min:8,.0f}/min  連線 {stats["connections"]:3d}  '
+          f'送出 {stats["bytes"] * per_min / 1024:8,.1f} KB/min  '
+          f'序列化 {stats["dumps"] * per_min:6,.0f} 次 {stats["dump_sec"] * per_min * 1000:6.1f} ms/min  '
+          f'伺服器 CPU {stats["cpu"] * per_min:6.3f} s/min'
+          + (f'  304 {stats["not_modified"] * per_min:,.0f}/min' if mode == 'state' else '')
+          + (f'  收到事件 {received}' if received else ''))
+
+
+async def main(args):
+    print(f'{args.browsers} 個瀏覽器分頁，量測 {args.duration:.0f} 秒（換算為每分鐘）')
+    await run_case(args, 'poll')
+    await run_case(args, 'state')
+    await run_case(args, 'sse')
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--browsers', type=int, default=5)
+    ap.add_argument('--duration', type=float, default=60)
+    ap.add_argument('--port', type=int, default=18080)
+    ap.add_argument('--serve', type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+    if args.serve:
+        asyncio.run(serve(args.serve))
+    else:
+        asyncio.run(main(args))
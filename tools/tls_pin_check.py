@@ -0,0 +1,82 @@
+"""
+tools/tls_pin_check.py - 憑證指紋釘選的收訊閘門檢查（於電腦端 CPython 執行）
+
+沿用 mqtt_outage_sim.py 的 FakeBroker / FakeClient，設定 MQTT_TLS_FINGERPRINT 後讓 Broker 在連線建立時
+立即送來一則 PUBLISH，檢查路由處理器是否被呼叫：
+
+    early       connect() 返回前就讓出一次，訊息在比對指紋之前到達 → 丟棄（即使憑證正確）
+    mismatch    憑證與指紋不符 → connect() 失敗、訊息丟棄、pin_failures 只計一次
+    match       憑證正確，訊息在比對之後到達 → 交給處理器
+    reconnect   通過比對後斷線，重連時換成不符的憑證 → 斷線時已清除旗標，新連線的訊息丟棄
+
+用法:
+    python tools/tls_pin_check.py
+"""
+
+import asyncio
+import hashlib
+import sys
+
+from mqtt_outage_sim import FakeBroker, make_manager
+
+CERT = b'broker-cert'
+TOPIC = b'alarm/cmd'
+
+
+async def attempt(broker, mgr, handled):
+    """連線一次（Broker 送來一則訊息），回傳 (connect() 結果, 處理器是否收到)"""
+    before = len(handled)
+    ok = await mgr.connect(1)
+    await asyncio.sleep(0.05)       # 讓收訊 task 與工作池跑完
+    return ok, len(handled) > before
+
+
+async def run_case(name, cert, early=False, reconnect_cert=None):
+    broker = FakeBroker()
+    broker.cert = cert
+    broker.yield_in_connect = early
+
+    async def deliver(client):
+        await client.cfg['subs_cb'](TOPIC, b'{"op": "clear"}', False)
+
+    broker.on_connect = deliver
+    mgr = make_manager(broker, MQTT_TLS=True, MQTT_TLS_FINGERPRINT=hashlib.sha256(CERT).hexdigest())
+    handled = []
+    mgr.route(TOPIC, lambda t, m, r: handled.append(m))
+    mgr.workers.start()
+
+    ok, got = await attempt(broker, mgr, handled)
+    if reconnect_cert is not None:
+        broker.stop()
+        await asyncio.sleep(0.01)
+        broker.start()
+        broker.cert = reconnect_cert
+        mgr.client.connected = False
+        ok, got = await attempt(broker, mgr, handled)
+    for t in mgr.workers._tasks:
+        t.cancel()
+    return ok, got, mgr.pin_failures, mgr.unverified_dropped
+
+
+async def main():
+    # (名稱, 憑證, 提前讓出, 重連時的憑證, 預期 (connect 結果, 處理器收到, pin_failures))
+    cases = [
+        ('early', CERT, True, None, (True, False, 0)),
+        ('mismatch', b'evil-cert', False, None, (False, False, 1)),
+        ('match', CERT, False, None, (True, True, 0)),
+        ('reconnect', CERT, False, b'evil-cert', (False, False, 1)),
+    ]
+    print('== 憑證指紋釘選：比對前到達的訊息 ==')
+    ok = True
+    for name, cert, early, again, want in cases:
+        conn, got, fails, dropped = await run_case(name, cert, early, again)
+        passed = (conn, got, fails) == want
+        ok &= passed
+        print('  {:<10}connect {:<6}處理器{}  pin_failures {}  未驗證丟棄 {}  {}'.format(
+            name, str(conn), '收到' if got else '未收到', fails, dropped, '通過' if passed else '失敗'))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,170 @@
+/*
+ * tools/ui_bench.js - 網頁鬧鐘表格的無頭渲染量測（於電腦端 Node.js 執行）
+ *
+ * 以極簡 DOM 模擬（會真的解析 / 序列化 innerHTML）執行 web/index.html 的 <script>，
+ * 比較舊版「每次以 innerHTML += 重建整張表」與目前「依索引比對、只更新有變的列」
+ * 在 N 筆鬧鐘下的耗時、DOM 異動次數與新建節點數
+ *
+ * 用法:
+ *     node tools/ui_bench.js [鬧鐘筆數=500]
+ */
+
+'use strict';
+const fs = require('fs');
+const path = require('path');
+const vm = require('vm');
+
+const N = Number(process.argv[2] || 500);
+const counters = { created: 0, mutations: 0 };
+
+// ==================== 極簡 DOM ====================
+
+function countingStyle() {
+  return new Proxy({}, { set(t, k, v) { if (t[k] !== v) counters.mutations++; t[k] = v; return true; } });
+}
+
+class El {
+  constructor(tag) {
+    this.tagName = tag.toUpperCase();
+    this.children = [];
+    this.parentNode = null;
+    this.attrs = {};
+    this._text = '';
+    this.style = countingStyle();
+    this.dataset = {};
+    counters.created++;
+  }
+  get firstElementChild() { return this.children[0] || null; }
+  appendChild(c) {
+    if (c.parentNode) c.remove();
+    c.parentNode = this;
+    this.children.push(c);
+    counters.mutations++;
+    return c;
+  }
+  remove() {
+    const p = this.parentNode;
+    if (!p) return;
+    p.children.splice(p.children.indexOf(this), 1);
+    this.parentNode = null;
+    counters.mutations++;
+  }
+  get textContent() { return this.children.length ? this.children.map(c => c.textContent).join('') : this._text; }
+  set textContent(v) { this.children = []; this._text = String(v); counters.mutations++; }
+  get innerHTML() { return this.children.length ? this.children.map(serialize).join('') : this._text; }
+  set innerHTML(html) {
+    for (const c of this.children) c.parentNode = null;
+    this.children = parse(html);
+    for (const c of this.children) c.parentNode = this;
+    this._text = '';
+    counters.mutations++;
+  }
+  addEventListener() {}
+}
+
+function serialize(el) {
+  const attrs = Object.entries(el.attrs).map(([k, v]) => ` ${k}="${v}"`).join('');
+  const tag = el.tagName.toLowerCase();
+  return `<${tag}${attrs}>${el.innerHTML}</${tag}>`;
+}
+
+function parse(html) {
+  const root = new El('root');
+  counters.created--;
+  let cur = root;
+  const re = /<\/(\w+)\s*>|<(\w+)([^>]*)>|([^<]+)/g;
+  let m;
+  while ((m = re.exec(html))) {
+    if (m[1]) {
+      cur = cur.parentNode || root;
+    } else if (m[2]) {
+      const el = new El(m[2]);
+      for (const a of m[3].matchAll(/([\w-]+)="([^"]*)"/g)) el.attrs[a[1]] = a[2];
+      el.parentNode = cur;
+      cur.children.push(el);
+      cur = el;
+    } else if (m[4].trim()) {
+      cur._text += m[4];
+    }
+  }
+  return root.children;
+}
+
+// ==================== 載入頁面腳本 ====================
+
+function makePage() {
+  const ids = {};
+  for (const id of ['time', 'env_temp', 'env_humi', 'alarmBody', 'musicSelect', 'alarmTime', 'repeat']) {
+    ids[id] = new El(id === 'alarmBody' ? 'tbody' : 'div');
+  }
+  ids.alarmBody.innerHTML = '<tr><td colspan="6" class="gray">目前沒有鬧鐘</td></tr>';
+  const ctx = {
+    document: { getElementById: id => ids[id], createElement: tag => new El(tag) },
+    window: {},                                  // 無 EventSource → 走輪詢路徑
+    setInterval: () => 0, clearInterval: () => {},
+    fetch: () => new Promise(() => {}),          // 不送出任何請求
+    confirm: () => true, alert: () => {}, console,
+  };
+  const html = fs.readFileSync(path.join(__dirname, '..', 'web', 'index.html'), 'utf8');
+  const script = html.slice(html.indexOf('<script>') + 8, html.indexOf('</script>'));
+  vm.createContext(ctx);
+  vm.runInContext(script, ctx);
+  return { ctx, body: ids.alarmBody };
+}
+
+// 舊版 renderAlarms（每次清空後以 innerHTML += 逐列重建）
+function legacyRender(body, musicList, aData) {
+  body.innerHTML = aData.alarms.length ? '' : '<tr><td colspan="6" class="gray">目前沒有鬧鐘</td></tr>';
+  aData.alarms.forEach((a, i) => {
+    body.innerHTML += `<tr>
+    <td>${i + 1}</td>
+    <td style="font-weight:bold">${a.h.toString().padStart(2, '0')}:${a.m.toString().padStart(2, '0')}</td>
+    <td>${a.repeat ? '每天' : '單次'}</td>
+    <td>${musicList[a.music]}</td>
+    <td><button onclick="fetch('/switch?id=${i}').then(refreshAll)" style="background:${a.enabled ? '#1b5e20' : '#888'}">${a.enabled ? '開啟' : '關閉'}</button></td>
+    <td><button onclick="if(confirm('確定刪除？'))fetch('/delete?id=${i}').then(refreshAll)" style="background:#c62828;">刪除</button></td></tr>`;
+  });
+}
+
+// ==================== 量測 ====================
+
+function schedule(n) {
+  let seed = 44;
+  const rnd = k => { seed = (seed * 1103515245 + 12345) & 0x7fffffff; return seed % k; };
+  return Array.from({ length: n }, () => ({ h: rnd(24), m: rnd(60), repeat: rnd(2), music: rnd(4), enabled: true }));
+}
+
+function measure(fn, reps = 1) {
+  counters.created = counters.mutations = 0;
+  const t0 = process.hrtime.bigint();
+  for (let i = 0; i < reps; i++) fn();
+  const ms = Number(process.hrtime.bigint() - t0) / 1e6 / reps;
+  return { ms, created: counters.created / reps, mutations: counters.mutations / reps };
+}
+
+const base = schedule(N);
+const toggled = base.map((a, i) => (i === N >> 1 ? { ...a, enabled: false } : { ...a }));
+const deleted = base.filter((_, i) => i !== N >> 1);
+const cases = [
+  ['首次渲染', base, 1],
+  ['相同資料重繪', base, 5],
+  ['切換一筆', toggled, 1],
+  ['刪除中間一筆', deleted, 1],
+];
+
+const legacy = makePage();
+const current = makePage();
+const musicList = vm.runInContext('musicList', legacy.ctx);
+const fmt = r => `${r.ms.toFixed(2).padStart(9)} ms  異動 ${String(Math.round(r.mutations)).padStart(6)}  新節點 ${String(Math.round(r.created)).padStart(6)}`;
+
+console.log(`${N} 筆鬧鐘（每列 6 格 + 2 個按鈕）`);
+for (const [label, data, reps] of cases) {
+  const doc = JSON.parse(JSON.stringify({ alarms: data }));
+  const a = measure(() => legacyRender(legacy.body, musicList, doc), reps);
+  const b = measure(() => current.ctx.renderAlarms(doc), reps);
+  console.log(`${label.padEnd(8, '　')} 舊版 ${fmt(a)}   |  差異更新 ${fmt(b)}`);
+}
+
+// 確認兩者結果一致（文字內容）
+const norm = el => el.children.filter(r => r.style.display !== 'none').map(r => r.children.slice(0, 5).map(c => c.textContent).join('|')).join('\n');
+console.log(norm(legacy.body) === norm(current.body) ? '兩種渲染的表格內容一致' : '警告：表格內容不一致');
@@ -0,0 +1,90 @@
+"""
+tools/window_bench.py - QoS 1 發佈視窗大小的吞吐量量測（於電腦端 CPython 執行）
+
+沿用 mqtt_outage_sim.py 的 FakeBroker / FakeClient 與真正的 mqtt_client.MqttManager，
+FakeClient 改為比照 mqtt_as 的時序：送出封包時持有客戶端鎖（--write-ms），
+放開鎖之後才等待 PUBACK（--ack-ms，模擬網路往返），因此視窗內的多筆發佈可以重疊等待。
+
+對每個 PUBACK 延遲與 MQTT_PUB_WINDOW（1, 2, 4, 8）以 publish_many 發佈 N 筆（預設 200），列出：
+
+    msgs/s、相對視窗 1 的倍數、實際同時等待 PUBACK 的最大筆數（max_inflight）、
+    Broker 收到的序號是否依序、是否全數送達
+
+這是電腦上的時序模擬，數字只用來比較視窗大小，不代表 ESP32 + 實際網路的吞吐量
+
+用法:
+    python tools/window_bench.py
+    python tools/window_bench.py --count 500 --ack-ms 10 50 200 --write-ms 1
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+from mqtt_outage_sim import FakeBroker, FakeClient, make_manager
+
+WINDOWS = (1, 2, 4, 8)
+TOPIC = b'bench/window'
+
+
+class LatencyClient(FakeClient):
+    """送出時持有鎖、放開鎖後等待 PUBACK 的 FakeClient"""
+
+    def __init__(self, broker, cfg, write_ms, ack_ms):
+        super().__init__(broker, cfg)
+        self.write_ms = write_ms
+        self.ack_ms = ack_ms
+        self.lock = asyncio.Lock()
+
+    async def publish(self, topic, msg, retain=False, qos=0):
+        async with self.lock:
+            await asyncio.sleep(self.write_ms / 1000)
+            self.broker.received.append((topic, bytes(msg)))
+        if qos:
+            await asyncio.sleep(self.ack_ms / 1000)
+
+
+async def run(window, ack_ms, args):
+    broker = FakeBroker()
+    mgr = make_manager(broker, MQTT_PUB_WINDOW=window)
+    mgr.client = LatencyClient(broker, mgr.client.cfg, args.write_ms, ack_ms)
+    if not await mgr.connect(1):
+        raise RuntimeError('連線失敗')
+    items = [(TOPIC, b'%d' % seq) for seq in range(args.count)]
+    t0 = time.perf_counter()
+    results = await mgr.publish_many(items, qos=1)
+    elapsed = time.perf_counter() - t0
+    for t in mgr.workers._tasks:
+        t.cancel()
+    got = [int(m) for _, m in broker.received]
+    return {
+        'rate': args.count / elapsed,
+        'max_inflight': mgr.pub_stats()['max_inflight'],
+        'ordered': got == sorted(got),
+        'complete': all(results) and len(got) == args.count,
+    }
+
+
+async def main(args):
+    print('== QoS 1 發佈視窗：{} 筆，送出 {} ms（持有鎖）+ PUBACK 延遲 =='.format(args.count, args.write_ms))
+    ok = True
+    for ack_ms in args.ack_ms:
+        base = None
+        for window in WINDOWS:
+            r = await run(window, ack_ms, args)
+            base = base or r['rate']
+            ok &= r['ordered'] and r['complete']
+            print('  PUBACK {:>4} ms  視窗 {}  {:8.1f} msgs/s  ×{:4.2f}  max_inflight {}  依序 {}  全數送達 {}'.format(
+                ack_ms, window, r['rate'], r['rate'] / base, r['max_inflight'],
+                '是' if r['ordered'] else '否', '是' if r['complete'] else '否'))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--count', type=int, default=200)
+    ap.add_argument('--ack-ms', type=float, nargs='+', default=[5, 20, 50], help='PUBACK 延遲（網路往返）')
+    ap.add_argument('--write-ms', type=float, default=0.5, help='送出一個封包時持有客戶端鎖的時間')
+    asyncio.run(main(ap.parse_args()))
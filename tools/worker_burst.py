@@ -0,0 +1,128 @@
+"""
+tools/worker_burst.py - 收訊工作池的突發量測（於電腦端 CPython 執行）
+
+以 http_harness.py 的 uasyncio 替身匯入真正的 mqtt_router.TopicRouter 與 mqtt_workers.WorkerPool，
+模擬 mqtt_as 接收迴圈一次收到 N 則（預設 1000）訊息，每則經 router.match 後以 put() 排入
+（與 MqttManager.on_message 相同：佇列滿載時最多等待 wait_ms 毫秒），兩種到達方式：
+
+    逐則    兩則之間讓出一次（--gap-us 可加上到達間隔），處理協程有機會跟上
+    整批    整批送完才讓出（訊息已全部在 socket 緩衝區裡的最壞情況）
+
+處理器以忙碌等待模擬解碼耗時（--cost-us），再 await 一段時間模擬回覆發佈 / 寫入 Flash 等 I/O（--io-ms），
+並記錄每則訊息從 submit 到處理器開始執行的延遲。每種工作池設定列出：
+
+    佇列最深（high_water / 取樣最大值）、背壓等待次數、丟棄數（overflow，並核對 on_drop 收到的筆數）、處理數、
+    延遲 p50 / p99 / max、突發送完與全部處理完的時間，以及同主題是否依序處理
+
+用法:
+    python tools/worker_burst.py
+    python tools/worker_burst.py --burst 1000 --topics 8 --cost-us 300 --io-ms 0 --gap-us 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+from http_harness import install_stubs
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# (處理協程數, 總容量, 滿載策略, 背壓等待 ms)；第一列為 config 的預設值
+SETUPS = [
+    (2, 32, 'drop_oldest', 100),
+    (2, 32, 'drop_oldest', 0),
+    (2, 32, 'drop_newest', 0),
+    (4, 64, 'drop_oldest', 0),
+    (2, 1024, 'drop_oldest', 0),
+]
+
+
+def busy(us):
+    end = time.perf_counter() + us / 1e6
+    while time.perf_counter() < end:
+        pass
+
+
+def pct(xs, p):
+    return xs[min(len(xs) - 1, int(len(xs) * p))] if xs else 0.0
+
+
+async def run(setup, batch, args):
+    from mqtt_router import TopicRouter
+    from mqtt_workers import WorkerPool
+    workers, capacity, policy, wait_ms = setup
+    router = TopicRouter()
+    submitted_at = {}
+    latency = []
+    last_seq = {}
+    order = {'bad': 0}
+
+    async def handler(topic, msg, retained):
+        seq = int(msg)
+        latency.append((time.perf_counter() - submitted_at[seq]) * 1000)
+        if seq < last_seq.get(topic, -1):
+            order['bad'] += 1
+        last_seq[topic] = seq
+        busy(args.cost_us)
+        if args.io_ms:
+            await asyncio.sleep(args.io_ms / 1000)
+
+    router.add('dev/+/cmd', handler)
+    topics = [b'dev/%d/cmd' % k for k in range(args.topics)]
+    pool = WorkerPool(router, workers, capacity, policy)
+    dropped = []
+    pool.on_drop = lambda topic, msg, retained: dropped.append(msg)
+    pool.start()
+
+    depth = 0
+    t0 = time.perf_counter()
+    for seq in range(args.burst):
+        topic = topics[seq % len(topics)]
+        submitted_at[seq] = time.perf_counter()
+        await pool.put(router.match(topic), topic, b'%d' % seq, False, wait_ms)
+        depth = max(depth, pool.depth())
+        if args.gap_us:
+            busy(args.gap_us)
+        if not batch:
+            await asyncio.sleep(0)      # mqtt_as 在兩則訊息之間等待 socket
+    sent_ms = (time.perf_counter() - t0) * 1000
+    while pool.processed + pool.stats()['overflow'] < pool.submitted:
+        await asyncio.sleep(0.001)
+    done_ms = (time.perf_counter() - t0) * 1000
+    for t in pool._tasks:
+        t.cancel()
+
+    st = pool.stats()
+    latency.sort()
+    print('  {:<4}{:>2} × {:<5}{:<12}等待 {:>3} ms  最深 {:>4}（取樣 {:>4}）  背壓 {:>4} 次  丟棄 {:>4}  處理 {:>4}'
+          '  延遲 p50 {:7.2f} p99 {:7.2f} max {:7.2f} ms  送完 {:6.1f} / 處理完 {:6.1f} ms  依序 {}'.format(
+              '整批' if batch else '逐則', workers, capacity, policy, wait_ms, st['high_water'], depth, st['waited'],
+              st['overflow'], st['processed'],
+              pct(latency, 0.5), pct(latency, 0.99), latency[-1] if latency else 0, sent_ms, done_ms,
+              '是' if not order['bad'] else '否（{}）'.format(order['bad'])))
+    return (st['submitted'] == st['processed'] + st['overflow'] and len(dropped) == st['overflow']
+            and not order['bad'])
+
+
+async def main(args):
+    install_stubs()
+    print('== 收訊工作池：{} 則突發，{} 個主題，處理器 {} µs CPU + {} ms I/O，到達間隔 {} µs =='.format(
+        args.burst, args.topics, args.cost_us, args.io_ms, args.gap_us))
+    ok = True
+    for batch in (False, True):
+        for setup in SETUPS:
+            ok &= await run(setup, batch, args)
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--burst', type=int, default=1000)
+    ap.add_argument('--topics', type=int, default=8)
+    ap.add_argument('--cost-us', type=int, default=200, help='處理器每則訊息的 CPU 耗時')
+    ap.add_argument('--io-ms', type=float, default=2, help='處理器每則訊息 await 的時間')
+    ap.add_argument('--gap-us', type=int, default=0, help='訊息到達間隔（接收迴圈的 CPU 耗時）')
+    asyncio.run(main(ap.parse_args()))
@@ -4,7 +4,7 @@ communication/wifi.py - WiFi 連線管理（修正版）
 """
 
 import config
-import time
+from clock import clock
 
 
 async def connect_wifi():
@@ -69,33 +69,9 @@ async def sync_time():
 
 def get_current_time():
     """
-    取得格式化的本地當前日期、星期、時間
-    使用 ns_tools 或 aiot_tools 的時間取得函數
+    取得格式化的本地當前日期、星期、時間（讀 clock 的每秒快取）
     
     返回: (date_str, weekday_str, time_str) 元組
     """
-    try:
-        # 優先使用 ns_tools 的 myGetTime()
-        from ns_tools import myGetTime
-        return myGetTime()
-    except ImportError:
-        pass
-    
-    try:
-        # 備選：使用 aiot_tools 的 get_time()
-        from aiot_tools import get_time
-        return get_time()
-    except ImportError:
-        pass
-    
-    # 若兩個庫都不可用，使用內建時間函數
-    import time
-    now = time.localtime()
-    weekdays = ["一", "二", "三", "四", "五", "六", "日"]
-    
-    date_str = '{:04d}/{:02d}/{:02d}'.format(now[0], now[1], now[2])
-    time_str = '{:02d}:{:02d}:{:02d}'.format(now[3], now[4], now[5])
-    weekday_str = weekdays[now[6]]
-    
-    return date_str, weekday_str, time_str
-
+    clock.get()
+    return clock.date_str, clock.weekday_str, clock.time_str